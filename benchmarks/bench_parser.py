@@ -0,0 +1,78 @@
+"""
+Micro-benchmark comparing the streaming Torznab parser with the original
+fromstring/findall implementation.
+
+Usage:
+    python benchmarks/bench_parser.py [num_items ...]
+"""
+import io
+import os
+import sys
+import time
+import tracemalloc
+import xml.etree.ElementTree as ET
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import crawler
+from tests.fake_torznab import make_feed
+
+def legacy_parse(content):
+    """The pre-streaming parser: whole-document tree and one dict per item"""
+    root = ET.fromstring(content)
+    ns = {'torznab': 'http://torznab.com/schemas/2015/feed'}
+    results = []
+    for item in root.findall('.//item'):
+        result = {
+            'title': item.find('title').text if item.find('title') is not None else 'Unknown',
+            'link': item.find('link').text if item.find('link') is not None else '',
+            'size': 0,
+            'seeders': 0,
+            'leechers': 0,
+            'pubDate': item.find('pubDate').text if item.find('pubDate') is not None else '',
+        }
+        for attr in item.findall('./torznab:attr', ns):
+            name = attr.get('name')
+            value = attr.get('value')
+            if name == 'size':
+                result['size'] = int(value)
+            elif name == 'seeders':
+                result['seeders'] = int(value)
+            elif name == 'peers':
+                result['leechers'] = int(value) - result['seeders']
+            elif name == 'downloadvolumefactor':
+                result['downloadFactor'] = float(value)
+            elif name == 'uploadvolumefactor':
+                result['uploadFactor'] = float(value)
+        result['formatted_size'] = crawler.format_size(result['size'])
+        results.append(result)
+    return results
+
+def streaming_parse(content):
+    return list(crawler.parse_torznab(io.BytesIO(content)))
+
+def measure(parse, content, repeat=3):
+    """Return (items per second, peak traced memory in bytes)"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        count = len(parse(content))
+        best = min(best, time.perf_counter() - start)
+    
+    tracemalloc.start()
+    parse(content)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return count / best, peak
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [100, 1000, 10000]
+    print(f"{'items':>8} {'parser':>10} {'items/s':>12} {'peak MB':>9}")
+    for num_items in sizes:
+        content = make_feed(num_items)
+        for name, parse in (("legacy", legacy_parse), ("streaming", streaming_parse)):
+            rate, peak = measure(parse, content)
+            print(f"{num_items:>8} {name:>10} {rate:>12,.0f} {peak / 1024**2:>9.2f}")
+
+if __name__ == "__main__":
+    main()
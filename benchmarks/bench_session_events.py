@@ -0,0 +1,69 @@
+"""
+Benchmark for the session alert loop against per-torrent status() polling.
+
+Hosts N magnet-only torrents (random infohashes, no peers, no DHT) in one
+session and measures the CPU spent keeping their progress up to date each
+second: one handle.status() call per torrent versus one batched
+state_update_alert for all of them (which only carries torrents whose
+status changed).
+
+Usage:
+    python benchmarks/bench_session_events.py [num_torrents] [seconds]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from session_manager import SessionManager
+from tests.local_swarm import LOCAL_SETTINGS
+
+def add_torrents(manager, count, save_path, seed=0):
+    rng = random.Random(seed)
+    return [manager.add(f"magnet:?xt=urn:btih:{rng.getrandbits(160):040x}", save_path) for _ in range(count)]
+
+def bench_polling(manager, infohashes, seconds):
+    """Reference: status() for every torrent once a second, as download_torrent used to do"""
+    start_cpu, deadline = time.process_time(), time.monotonic() + seconds
+    calls = 0
+    while time.monotonic() < deadline:
+        tick = time.monotonic()
+        for infohash in infohashes:
+            manager.handle(infohash).status()
+            calls += 1
+        time.sleep(max(0.0, 1.0 - (time.monotonic() - tick)))
+    return time.process_time() - start_cpu, calls
+
+def bench_alerts(manager, seconds):
+    """Batched state updates and event dispatch on the alert loop thread"""
+    updates = []
+    manager.subscribe(lambda event, torrent: updates.append(event))
+    start_cpu = time.process_time()
+    manager.start()
+    time.sleep(seconds)
+    manager.stop()
+    return time.process_time() - start_cpu, len(updates)
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 5.0
+    settings = dict(LOCAL_SETTINGS, active_downloads=count, active_limit=count)
+
+    with tempfile.TemporaryDirectory() as root:
+        manager = SessionManager(settings=settings, max_torrents=count)
+        infohashes = add_torrents(manager, count, root)
+        time.sleep(1.0)  # let the queue start everything
+
+        poll_cpu, calls = bench_polling(manager, infohashes, seconds)
+        alert_cpu, updates = bench_alerts(manager, seconds)
+        manager.close()
+
+    print(f"{count} torrents, {seconds:.0f}s each")
+    print(f"status() polling: {poll_cpu * 1000 / seconds:8.1f} ms CPU/s  ({calls} status calls)")
+    print(f"alert loop:       {alert_cpu * 1000 / seconds:8.1f} ms CPU/s  ({updates} progress events)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Benchmark of the session settings profiles on a loopback swarm.
+
+Seeds a few synthetic torrents from this process, then downloads them once
+per profile in a fresh child process (so peak RSS is per profile) and
+reports throughput, the child's CPU time and its peak RSS. The default
+profile is also run with every alert category enabled, the way the session
+used to be configured, to show the cost of alerts nobody reads.
+
+Usage:
+    python benchmarks/bench_session_profiles.py [num_torrents] [MB_per_torrent]
+"""
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import libtorrent as lt
+
+from session_manager import PROFILES, SessionManager
+from tests.local_swarm import LOCAL_SETTINGS, make_torrent, wait_for
+
+def run_child(profile, all_alerts, port, torrent_paths):
+    """Download every torrent from the seeder at port and report the cost as JSON"""
+    settings = dict(LOCAL_SETTINGS)
+    if all_alerts:
+        settings['alert_mask'] = lt.alert.category_t.all_categories
+    start_usage = resource.getrusage(resource.RUSAGE_SELF)
+    with tempfile.TemporaryDirectory() as root:
+        manager = SessionManager(settings=settings, profile=profile, active_downloads=len(torrent_paths))
+        start = time.monotonic()
+        infohashes, total = [], 0
+        for path in torrent_paths:
+            params = lt.add_torrent_params()
+            params.ti = lt.torrent_info(path)
+            total += params.ti.total_size()
+            infohash = manager.add(params, root)
+            handle = manager.handle(infohash)
+            wait_for(lambda: not handle.status().paused)
+            handle.connect_peer(('127.0.0.1', port))
+            infohashes.append(infohash)
+        finished = all(manager.wait_until_finished(infohash, timeout=300) for infohash in infohashes)
+        elapsed = time.monotonic() - start
+        manager.close()
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    cpu = (usage.ru_utime - start_usage.ru_utime) + (usage.ru_stime - start_usage.ru_stime)
+    print(json.dumps({
+        'finished': finished,
+        'seconds': elapsed,
+        'mb_per_s': total / (1024 * 1024) / elapsed,
+        'cpu_seconds': cpu,
+        'peak_rss_mb': usage.ru_maxrss / 1024,  # ru_maxrss is in KB on Linux
+    }))
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    size_mb = int(sys.argv[2]) if len(sys.argv) > 2 else 64
+
+    with tempfile.TemporaryDirectory() as root:
+        infos = [make_torrent(f"{root}/seed", {f"bench{i}/bench{i}.mkv": size_mb * 1024 * 1024},
+                              piece_length=1024 * 1024, seed=i) for i in range(count)]
+        paths = []
+        seeder = lt.session(dict(LOCAL_SETTINGS, active_seeds=count, active_limit=count))
+        for i, info in enumerate(infos):
+            path = f"{root}/bench{i}.torrent"
+            with open(path, 'wb') as f:
+                f.write(lt.bencode({'info': lt.bdecode(info.info_section())}))
+            paths.append(path)
+            params = lt.add_torrent_params()
+            params.ti = info
+            params.save_path = f"{root}/seed"
+            params.flags |= lt.torrent_flags.seed_mode
+            handle = seeder.add_torrent(params)
+            wait_for(lambda: handle.status().is_seeding and not handle.status().paused)
+
+        runs = [(profile, False) for profile in PROFILES] + [('default', True)]
+        print(f"{count} torrents x {size_mb} MB over loopback")
+        print(f"{'profile':<22} {'MB/s':>8} {'CPU s':>8} {'peak RSS MB':>12}")
+        for profile, all_alerts in runs:
+            args = [sys.executable, __file__, '--child', profile, str(int(all_alerts)), str(seeder.listen_port())]
+            output = subprocess.run(args + paths, capture_output=True, text=True, check=True).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            label = f"{profile} (all alerts)" if all_alerts else profile
+            if not result['finished']:
+                label += " [timed out]"
+            print(f"{label:<22} {result['mb_per_s']:8.1f} {result['cpu_seconds']:8.2f} {result['peak_rss_mb']:12.1f}")
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == '--child':
+        run_child(sys.argv[2], sys.argv[3] == '1', int(sys.argv[4]), sys.argv[5:])
+    else:
+        main()
@@ -0,0 +1,120 @@
+"""
+Benchmark for the offline title index: build time, hit rate and lookup latency.
+
+Usage:
+    python benchmarks/bench_title_index.py [num_titles]
+    python benchmarks/bench_title_index.py --imdb title.basics.tsv.gz title.ratings.tsv.gz
+
+With --imdb, queries are drawn from the real catalog instead of a synthetic one.
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import title_index
+
+WORDS = ("dark", "night", "return", "last", "king", "city", "blood", "love", "star", "war", "lost",
+         "river", "ghost", "summer", "house", "secret", "iron", "shadow", "black", "red", "golden",
+         "empire", "dream", "storm", "fire", "road", "island", "winter", "silent", "wild", "edge")
+DESCRIPTIVE = (
+    "the movie where a ship hits an iceberg",
+    "that pixar film with the old man and the balloons",
+    "nolan film about dreams inside dreams",
+    "the one with the shark and the small beach town",
+    "space movie where matthew mcconaughey goes through a wormhole",
+)
+
+SYLLABLES = ("ka", "lo", "mer", "sin", "tra", "vel", "do", "ran", "chi", "bel", "nor", "ish", "ta", "qu", "zen")
+
+def make_catalog(count, seed=0):
+    """Synthetic, unique (title, aliases, year, votes) entries with a long-tailed popularity"""
+    rng = random.Random(seed)
+    vocabulary = list(WORDS) + ["".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+                                for _ in range(5000)]
+    entries = []
+    seen = set()
+    while len(entries) < count:
+        title = " ".join(rng.choice(vocabulary).title() for _ in range(rng.randint(1, 4)))
+        # Unique titles, so every wrong answer is the index's fault, not a homonym's
+        if title in seen:
+            continue
+        seen.add(title)
+        entries.append((title, [], rng.randint(1920, 2025), int(rng.paretovariate(0.8) * 50)))
+    return entries
+
+def typo(text, rng):
+    i = rng.randrange(len(text))
+    return text[:i] + text[i + 1:]
+
+def make_queries(entries, count, seed=1):
+    """(query, expected (title, year) or None) pairs across query styles"""
+    rng = random.Random(seed)
+    popular = [entry for entry in entries if entry[3] >= 1000] or entries
+    queries = []
+    for i in range(count):
+        title, _, year, _ = rng.choice(popular)
+        style = i % 5
+        if style == 0:
+            queries.append((title, (title, year)))
+        elif style == 1:
+            queries.append((f"{title.upper()}!", (title, year)))
+        elif style == 2:
+            queries.append((f"{title} ({year})", (title, year)))
+        elif style == 3:
+            queries.append((typo(title, rng), (title, year)))
+        else:
+            queries.append((rng.choice(DESCRIPTIVE), None))
+    return queries
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == '--imdb':
+        entries = list(title_index.read_imdb_titles(sys.argv[2], sys.argv[3] if len(sys.argv) > 3 else None))
+    else:
+        entries = make_catalog(int(sys.argv[1]) if len(sys.argv) > 1 else 200_000)
+    queries = make_queries(entries, 5000)
+
+    with tempfile.TemporaryDirectory() as out_dir:
+        start = time.perf_counter()
+        title_index.build_index(entries, out_dir)
+        build = time.perf_counter() - start
+        size = sum(os.path.getsize(os.path.join(out_dir, name)) for name in os.listdir(out_dir))
+
+        start = time.perf_counter()
+        index = title_index.TitleIndex(out_dir)
+        load = time.perf_counter() - start
+
+        latencies = {"confident": [], "deferred": []}
+        correct = wrong = deferred = 0
+        for query, expected in queries:
+            start = time.perf_counter()
+            match = index.lookup(query)
+            elapsed = time.perf_counter() - start
+            confident = match is not None and match.confident
+            latencies["confident" if confident else "deferred"].append(elapsed)
+            if not confident:
+                deferred += 1
+            elif expected is not None and (match.title, match.year) == expected:
+                correct += 1
+            else:
+                wrong += 1
+
+    def percentile(values, fraction):
+        values = sorted(values)
+        return values[min(len(values) - 1, int(fraction * len(values)))] * 1e6 if values else float('nan')
+
+    print(f"titles:               {len(entries):,}")
+    print(f"build:                {build:8.2f} s   ({size / 2**20:.1f} MiB on disk)")
+    print(f"open (mmap):          {load * 1000:8.2f} ms")
+    print(f"queries:              {len(queries):,}")
+    print(f"answered offline:     {correct / len(queries):8.1%}")
+    print(f"wrong answers:        {wrong / len(queries):8.1%}")
+    print(f"deferred to LLM:      {deferred / len(queries):8.1%}")
+    for kind, values in latencies.items():
+        print(f"{kind + ' latency:':<22}p50 {percentile(values, 0.5):7.1f} us   p99 {percentile(values, 0.99):7.1f} us")
+
+if __name__ == "__main__":
+    main()
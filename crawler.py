@@ -1,8 +1,19 @@
 import requests
 import xml.etree.ElementTree as ET
-from operator import itemgetter
+from operator import attrgetter
+from dataclasses import dataclass
+import base64
+import heapq
+import re
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from requests.adapters import HTTPAdapter
 import os
+import threading
 from dotenv import load_dotenv
+from search_cache import SearchCache, make_cache_key
+from scoring import top_scored
+from indexer_stats import IndexerTelemetry
 import logging
 import sys
 from urllib.parse import quote
@@ -21,15 +32,135 @@ load_dotenv()
 # Get Jackett configuration from environment variables
 JACKETT_URL = os.getenv("JACKETT_URL")
 API_KEY = os.getenv("JACKETT_API_KEY")
-INDEXERS = "all"  # Use "all" or specify comma-separated indexer IDs
+INDEXERS = os.getenv("JACKETT_INDEXERS", "all")  # Use "all" or specify comma-separated indexer IDs
+
+# Per-request timeout and overall deadline (seconds) for a fan-out search
+SEARCH_TIMEOUT = float(os.getenv("JACKETT_TIMEOUT", "15"))
+# Upper bound on simultaneous Jackett requests (and pooled connections)
+MAX_CONCURRENT_SEARCHES = int(os.getenv("JACKETT_MAX_CONCURRENCY", "8"))
+
+# Search result cache: seconds results stay fresh, seconds stale results may
+# be served while refreshing in the background, and the on-disk store
+# (empty for memory-only). A TTL of 0 disables caching.
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", "300"))
+SEARCH_CACHE_STALE_TTL = float(os.getenv("SEARCH_CACHE_STALE_TTL", "3600"))
+SEARCH_CACHE_PATH = os.getenv("SEARCH_CACHE_PATH", "search_cache.sqlite3")
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "256"))
+
+# Where per-indexer latency/error statistics persist between runs (empty to disable)
+INDEXER_STATS_PATH = os.getenv("INDEXER_STATS_PATH", "indexer_stats.json")
+
+_http_session = None
+_shared_state_lock = threading.Lock()
+_search_cache = None
+_indexer_telemetry = None
+
+# The namespace used in Torznab responses
+TORZNAB_ATTR = '{http://torznab.com/schemas/2015/feed}attr'
 
 # Movie details from your file
 title = "Batman Begins"
 year = 2005
 
-def search_movie(query, year=None, limit=100):
-    """Search for movie torrents using Jackett's Torznab API"""
-    url = f"{JACKETT_URL}/api/v2.0/indexers/{INDEXERS}/results/torznab/api"
+@dataclass(slots=True)
+class TorrentResult:
+    """A single Torznab search result"""
+    title: str = 'Unknown'
+    link: str = ''
+    size: int = 0
+    seeders: int = 0
+    leechers: int = 0
+    pub_date: str = ''
+    download_factor: float = 1.0
+    upload_factor: float = 1.0
+    infohash: str = ''
+    magnet_url: str = ''
+    fetched_at: float = 0.0
+
+    @property
+    def formatted_size(self):
+        """Size formatted for display"""
+        return format_size(self.size)
+
+def get_http_session():
+    """Return the shared, connection-pooled HTTP session used for Jackett requests"""
+    global _http_session
+    with _shared_state_lock:
+        if _http_session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=MAX_CONCURRENT_SEARCHES,
+                                  pool_maxsize=MAX_CONCURRENT_SEARCHES)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _http_session = session
+        return _http_session
+
+def get_search_cache():
+    """Return the shared search result cache"""
+    global _search_cache
+    with _shared_state_lock:
+        if _search_cache is None:
+            _search_cache = SearchCache(
+                path=SEARCH_CACHE_PATH or None,
+                ttl=SEARCH_CACHE_TTL,
+                stale_ttl=SEARCH_CACHE_STALE_TTL,
+                max_entries=SEARCH_CACHE_SIZE,
+                record_type=TorrentResult,
+            )
+        return _search_cache
+
+def get_indexer_telemetry():
+    """Return the shared per-indexer telemetry used for scheduling"""
+    global _indexer_telemetry
+    with _shared_state_lock:
+        if _indexer_telemetry is None:
+            _indexer_telemetry = IndexerTelemetry(path=INDEXER_STATS_PATH or None)
+        return _indexer_telemetry
+
+def get_indexers(indexers=None):
+    """
+    Split an indexer specification into the list of Jackett indexer IDs to query
+    
+    Args:
+        indexers (str): "all" or comma-separated indexer IDs (default: INDEXERS)
+        
+    Returns:
+        list: Indexer IDs, e.g. ["all"] or ["1337x", "yts"]
+    """
+    spec = INDEXERS if indexers is None else indexers
+    return [indexer.strip() for indexer in spec.split(",") if indexer.strip()] or ["all"]
+
+def search_movie(query, year=None, limit=100, indexer=None, timeout=SEARCH_TIMEOUT, use_cache=True):
+    """Search for movie torrents using Jackett's Torznab API, via the result cache"""
+    try:
+        return cached_search(query, year, limit, indexer, timeout, use_cache)
+    except Exception as e:
+        logger.error(f"Error searching Jackett: {e}", exc_info=True)
+        return []
+
+def cached_search(query, year=None, limit=100, indexer=None, timeout=SEARCH_TIMEOUT, use_cache=True):
+    """
+    search_movie without the error handling
+    
+    Raises:
+        Exception: Whatever the request or the parser raised
+    """
+    indexer = indexer or INDEXERS
+    if use_cache and SEARCH_CACHE_TTL > 0:
+        key = make_cache_key(query, year, limit, indexer)
+        return get_search_cache().get_or_fetch(
+            key, lambda: fetch_torznab(query, year, limit, indexer, timeout))
+    return fetch_torznab(query, year, limit, indexer, timeout)
+
+def fetch_torznab(query, year=None, limit=100, indexer=None, timeout=SEARCH_TIMEOUT):
+    """
+    Query a Jackett Torznab endpoint directly, bypassing the cache
+    
+    Raises:
+        requests.RequestException: On connection errors, timeouts and non-200 responses
+    """
+    indexer = indexer or INDEXERS
+    url = f"{JACKETT_URL}/api/v2.0/indexers/{indexer}/results/torznab/api"
     
     # Build query parameters according to Jackett documentation
     params = {
@@ -46,57 +177,288 @@ def search_movie(query, year=None, limit=100):
     logger.info(f"Searching with params: {params}")
     logger.info(f"Request URL: {url}?apikey=HIDDEN&{('&'.join([f'{k}={v}' for k, v in params.items() if k != 'apikey']))}")
     
+    telemetry = get_indexer_telemetry()
+    start = time.monotonic()
     try:
-        response = requests.get(url, params=params)
-        logger.info(f"Response status code: {response.status_code}")
-        
-        if response.status_code != 200:
-            logger.error(f"Error response: {response.text}")
-            return []
+        with get_http_session().get(url, params=params, timeout=timeout, stream=True) as response:
+            logger.info(f"Response status code: {response.status_code}")
             
-        # Parse XML response
-        root = ET.fromstring(response.content)
+            if response.status_code != 200:
+                logger.error(f"Error response: {response.text}")
+                response.raise_for_status()
+                raise requests.HTTPError(f"Unexpected status code {response.status_code}", response=response)
+            
+            # Parse the XML incrementally straight off the socket
+            response.raw.decode_content = True
+            results = list(parse_torznab(response.raw))
+    except requests.Timeout:
+        telemetry.record(indexer, time.monotonic() - start, timed_out=True)
+        raise
+    except Exception:
+        telemetry.record(indexer, time.monotonic() - start, error=True)
+        raise
+    telemetry.record(indexer, time.monotonic() - start, results=len(results))
+    
+    fetched_at = time.time()
+    for result in results:
+        result.fetched_at = fetched_at
+    
+    logger.info(f"Found {len(results)} results")
+    return results
+
+def parse_torznab(source):
+    """
+    Incrementally parse a Torznab feed, yielding one result per <item>
+    
+    Each item is detached from the tree as soon as it has been converted, so
+    memory use stays flat regardless of the number of results in the feed.
+    
+    Args:
+        source: File name or binary file-like object (e.g. a raw HTTP response)
         
-        # The namespace used in Torznab responses
-        ns = {'torznab': 'http://torznab.com/schemas/2015/feed'}
+    Yields:
+        TorrentResult: Parsed result
+    """
+    # Open elements, innermost last, so a finished item can be removed from its parent
+    parents = []
+    for event, elem in ET.iterparse(source, events=('start', 'end')):
+        if event == 'start':
+            parents.append(elem)
+            continue
+        parents.pop()
+        if elem.tag != 'item':
+            continue
         
-        results = []
-        # Process each item in the response
-        for item in root.findall('.//item'):
-            result = {
-                'title': item.find('title').text if item.find('title') is not None else 'Unknown',
-                'link': item.find('link').text if item.find('link') is not None else '',
-                'size': 0,
-                'seeders': 0,
-                'leechers': 0,
-                'pubDate': item.find('pubDate').text if item.find('pubDate') is not None else '',
-            }
-            
-            # Extract torznab attributes (size, seeders, leechers)
-            for attr in item.findall('./torznab:attr', ns):
-                name = attr.get('name')
-                value = attr.get('value')
+        result = TorrentResult()
+        peers = None
+        for child in elem:
+            child_tag = child.tag
+            if child_tag == TORZNAB_ATTR:
+                name = child.get('name')
+                value = child.get('value')
                 
                 if name == 'size':
-                    result['size'] = int(value)
+                    result.size = int(value)
                 elif name == 'seeders':
-                    result['seeders'] = int(value)
+                    result.seeders = int(value)
                 elif name == 'peers':
-                    result['leechers'] = int(value) - result['seeders']
+                    peers = int(value)
                 elif name == 'downloadvolumefactor':
-                    result['downloadFactor'] = float(value)
+                    result.download_factor = float(value)
                 elif name == 'uploadvolumefactor':
-                    result['uploadFactor'] = float(value)
+                    result.upload_factor = float(value)
+                elif name == 'infohash':
+                    result.infohash = normalize_infohash(value)
+                elif name == 'magneturl':
+                    result.magnet_url = value
+            elif child_tag == 'title':
+                result.title = child.text or 'Unknown'
+            elif child_tag == 'link':
+                result.link = child.text or ''
+            elif child_tag == 'pubDate':
+                result.pub_date = child.text or ''
+        
+        # Torznab reports peers including seeders
+        if peers is not None:
+            result.leechers = peers - result.seeders
+        
+        if not result.infohash:
+            result.infohash = infohash_from_magnet(result.magnet_url or result.link)
+        
+        # Drop the processed item from the tree altogether
+        if parents:
+            parents[-1].remove(elem)
+        yield result
+
+def normalize_infohash(value):
+    """Return a v1 infohash as lowercase hex, converting base32 if needed"""
+    value = (value or '').strip()
+    if len(value) == 32:
+        try:
+            return base64.b32decode(value.upper()).hex()
+        except ValueError:
+            return ''
+    return value.lower() if len(value) == 40 else ''
+
+def infohash_from_magnet(uri):
+    """Extract the normalized infohash from a magnet URI, or '' if there is none"""
+    match = re.search(r'xt=urn:btih:([a-zA-Z0-9]{32,40})', uri or '')
+    return normalize_infohash(match.group(1)) if match else ''
+
+def dedupe_key(result):
+    """
+    Identity of a release across indexers
+    
+    The infohash when known, otherwise the title with case and punctuation
+    folded plus the exact size.
+    """
+    if result.infohash:
+        return result.infohash
+    normalized_title = re.sub(r'[^a-z0-9]+', ' ', result.title.lower()).strip()
+    return (normalized_title, result.size)
+
+def merge_results(results):
+    """
+    Deduplicate results by release, keeping the freshest seeder/peer counts
+    
+    When the same release is reported more than once, the most recently
+    fetched record wins; ties go to the record with more seeders.
+    
+    Args:
+        results: Iterable of TorrentResult
+        
+    Returns:
+        list: One TorrentResult per distinct release
+    """
+    merged = {}
+    for result in results:
+        key = dedupe_key(result)
+        current = merged.get(key)
+        if current is None or (result.fetched_at, result.seeders) > (current.fetched_at, current.seeders):
+            merged[key] = result
+    return list(merged.values())
+
+class _Descending:
+    """Wrapper that inverts the ordering of a ranking key for a min-heap"""
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __lt__(self, other):
+        return self.value > other.value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+def rank_results(results, k=None, key=attrgetter('seeders')):
+    """
+    Lazily yield results from best to worst
+    
+    With k set, only a bounded heap of k entries is kept while scanning the
+    input (O(n log k) time, O(k) extra memory). Without k, the results are
+    heapified once and popped on demand, so consumers that stop early never
+    pay for a full sort.
+    
+    Args:
+        results: Iterable of results
+        k (int): Maximum number of results to yield, or None for all
+        key: Ranking key; higher ranks first (default: seeders)
+        
+    Yields:
+        Results in descending key order
+    """
+    if k is not None:
+        yield from heapq.nlargest(k, results, key=key)
+        return
+    
+    # The index breaks ties stably and keeps results themselves out of comparisons
+    heap = [(_Descending(key(result)), i, result) for i, result in enumerate(results)]
+    heapq.heapify(heap)
+    while heap:
+        yield heapq.heappop(heap)[2]
+
+def search_all(queries, indexers=None, limit=100, timeout=SEARCH_TIMEOUT):
+    """
+    Run every query variant against every configured indexer concurrently
+    
+    Indexers are scheduled from their recorded telemetry: chronically
+    failing or slow indexers are skipped, slow ones are queued last, and a
+    request that runs past its indexer's p95 latency gets a hedged duplicate
+    whose answer is used if it arrives first (or if the other copy fails).
+    
+    Args:
+        queries (list): (query, year) tuples; year may be None
+        indexers (str): "all" (one aggregate request per query) or
+            comma-separated indexer IDs (one request per query and indexer);
+            defaults to INDEXERS
+        limit (int): Maximum number of results per request
+        timeout (float): Deadline in seconds for the whole fan-out; requests
+            still running when it expires are abandoned
+        
+    Returns:
+        list: Merged results of all requests that finished before the deadline
+    """
+    telemetry = get_indexer_telemetry()
+    scheduled, skipped = telemetry.schedule(get_indexers(indexers), timeout)
+    for indexer in skipped:
+        logger.warning(f"Skipping indexer {indexer}: chronically slow or failing "
+                       f"({telemetry.snapshot()[indexer]})")
+    
+    jobs = [(query, year, indexer) for query, year in queries for indexer in scheduled]
+    if not jobs:
+        return []
+    
+    started = {}
+    
+    def run(job):
+        started.setdefault(job, time.monotonic())
+        query, year, indexer = job
+        return cached_search(query, year=year, limit=limit, indexer=indexer, timeout=timeout)
+    
+    deadline = time.monotonic() + timeout
+    # Leave room for hedged duplicates on top of the primary requests
+    executor = ThreadPoolExecutor(max_workers=min(2 * len(jobs), MAX_CONCURRENT_SEARCHES))
+    try:
+        pending = {executor.submit(run, job): job for job in jobs}
+        hedge_after = {job: telemetry.hedge_after(job[2], timeout) for job in jobs}
+        finished = {}
+        
+        while pending:
+            now = time.monotonic()
+            if now >= deadline:
+                break
+            
+            # Wake up for the next completion, hedge point or the deadline
+            hedge_points = [started[job] + delay for job, delay in hedge_after.items()
+                            if delay is not None and job in started and job not in finished]
+            wake_at = min(hedge_points + [deadline])
+            done, _ = wait(pending, timeout=max(0.0, wake_at - now), return_when=FIRST_COMPLETED)
+            
+            for future in done:
+                job = pending.pop(future)
+                if job in finished:
+                    continue
+                error = future.exception()
+                if error is None:
+                    finished[job] = future.result()
+                elif job not in pending.values():
+                    # Every copy of the request failed
+                    logger.error(f"Error searching Jackett: {error}", exc_info=error)
+                    finished[job] = []
+                else:
+                    # A hedged copy is still running and may yet succeed
+                    logger.warning(f"Search for '{job[0]}' on {job[2]} failed, waiting for its duplicate: {error}")
             
-            # Format size for display
-            result['formatted_size'] = format_size(result['size'])
-            results.append(result)
+            now = time.monotonic()
+            for job, delay in list(hedge_after.items()):
+                if delay is None or job in finished or job not in started:
+                    continue
+                if now - started[job] >= delay:
+                    query, year, indexer = job
+                    logger.info(f"Hedging search for '{query}' (year={year}) on {indexer} "
+                                f"after {delay:.2f}s (p95)")
+                    pending[executor.submit(run, job)] = job
+                    hedge_after[job] = None
+            
+            # Whichever copy of a hedged request answered first wins
+            pending = {future: job for future, job in pending.items() if job not in finished}
+        
+        for query, year, indexer in (job for job in jobs if job not in finished):
+            logger.warning(f"Search for '{query}' (year={year}, indexer={indexer}) "
+                           f"missed the {timeout}s deadline, skipping")
         
-        logger.info(f"Found {len(results)} results")
+        # Keep results in submission order so merging is deterministic
+        results = []
+        for job in jobs:
+            results.extend(finished.get(job, []))
+        
+        logger.info(f"Fan-out search finished: {len(finished)}/{len(jobs)} requests, "
+                    f"{len(results)} results")
         return results
-    except Exception as e:
-        logger.error(f"Error searching Jackett: {e}", exc_info=True)
-        return []
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+        telemetry.save()
 
 def format_size(size_bytes):
     """Format bytes to human-readable size"""
@@ -112,31 +474,27 @@ def format_size(size_bytes):
 def main():
     logger.info(f"Starting search for movie: {title} ({year})")
     
-    # Search for the movie title without year
-    logger.info(f"Searching for: {title}")
-    results1 = search_movie(title)
-    
-    # Search for the movie title with year
-    logger.info(f"Searching for: {title} with year {year}")
-    results2 = search_movie(title, year=year)
-    
-    # Combine results
-    all_results = results1 + results2
+    # Search for the movie title with and without the year concurrently
+    logger.info(f"Searching for: {title} (with and without year {year})")
+    all_results = search_all([(title, None), (title, year)])
     logger.info(f"Total combined results: {len(all_results)}")
+    if SEARCH_CACHE_TTL > 0:
+        logger.info(f"Search cache stats: {get_search_cache().stats()}")
     
     if not all_results:
         logger.warning("No results found!")
         return
     
-    # Sort by number of seeders (descending)
-    sorted_results = sorted(all_results, key=itemgetter('seeders'), reverse=True)
+    # Collapse releases reported by several queries/indexers
+    unique_results = merge_results(all_results)
+    logger.info(f"Unique releases: {len(unique_results)}")
     
-    # Display top 5 results
-    print("\nTop 5 torrents with most seeds:")
-    for i, result in enumerate(sorted_results[:5], 1):
-        print(f"{i}. {result['title']}")
-        print(f"   Size: {result['formatted_size']} | Seeds: {result['seeders']} | Leechers: {result['leechers']}")
-        print(f"   Link: {result['link']}")
+    # Display top 5 results by combined quality/health score
+    print("\nTop 5 torrents by score:")
+    for i, (score, result) in enumerate(top_scored(unique_results, k=5), 1):
+        print(f"{i}. {result.title}")
+        print(f"   Score: {score:.2f} | Size: {result.formatted_size} | Seeds: {result.seeders} | Leechers: {result.leechers}")
+        print(f"   Link: {result.link}")
         print()
 
 if __name__ == "__main__":
@@ -1,42 +1,135 @@
 import libtorrent as lt
-import time
 import sys
 import os
 import re
 import signal
 
-# Global variable to track the active session and handle
-active_session = None
-active_handle = None
+from file_manifest import FileManifest
+from metadata_store import MetadataStore
+from resume_store import ResumeStore
+from session_manager import PROFILES, SessionManager, infohash_hex
+from session_stats import SessionStatsExporter, format_progress
+
+# Fast-resume data of every torrent the shared session hosts
+RESUME_DIR = "./.resume"
+# Metadata of every torrent seen so far, so re-adding a magnet skips the DHT wait
+METADATA_DIR = "./.metadata"
+
+# Settings profile of the shared session (see session_manager.PROFILES)
+SESSION_PROFILE = os.getenv("SESSION_PROFILE", "default")
+
+# Session statistics export: Prometheus endpoint port and JSON-lines file (empty to disable)
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = os.getenv("METRICS_PORT", "")
+METRICS_FILE = os.getenv("METRICS_FILE", "")
+
+# Shared session hosting every torrent in this process, created on first use
+_session_manager = None
+_stats_exporter = None
+
+def get_session_manager(profile=None):
+    """
+    Return the process-wide SessionManager, creating it (and restoring saved torrents) on first use
+    
+    Args:
+        profile (str): Settings profile if the session is created by this call (defaults to SESSION_PROFILE)
+    """
+    global _session_manager
+    if _session_manager is None:
+        _session_manager = SessionManager(profile=profile or SESSION_PROFILE, resume_store=ResumeStore(RESUME_DIR),
+                                          metadata_store=MetadataStore(METADATA_DIR))
+    return _session_manager
+
+def start_stats_exporter():
+    """
+    Export the shared session's statistics as configured by METRICS_PORT and METRICS_FILE
+    
+    Returns:
+        SessionStatsExporter: The running exporter, or None if neither is set
+    """
+    global _stats_exporter
+    if _stats_exporter is None and (METRICS_PORT or METRICS_FILE):
+        _stats_exporter = SessionStatsExporter(get_session_manager(), jsonl_path=METRICS_FILE or None,
+                                               host=METRICS_HOST, port=int(METRICS_PORT) if METRICS_PORT else None)
+        _stats_exporter.start()
+        if _stats_exporter.url:
+            print(f"Session metrics at {_stats_exporter.url}")
+    return _stats_exporter
+
+def shutdown_session_manager():
+    """Pause every torrent and save its resume data so the next run picks up where this one stopped"""
+    global _session_manager, _stats_exporter
+    exporter, _stats_exporter = _stats_exporter, None
+    if exporter is not None:
+        exporter.stop()
+    manager, _session_manager = _session_manager, None
+    if manager is None:
+        return
+    print("Stopping torrents and saving resume data...")
+    manager.close()
+
+def wait_for_metadata(handle, manager=None):
+    """
+    Block until a torrent's metadata has arrived, woken by the session's alerts
+
+    Args:
+        handle: Torrent handle hosted by the session manager
+        manager (SessionManager): Manager hosting the torrent (defaults to the shared one)
+
+    Returns:
+        bool: True once metadata is available, False if the torrent failed
+    """
+    if handle.status().has_metadata:
+        return True
+    manager = manager or get_session_manager()
+    return manager.wait_for_metadata(infohash_hex(handle.info_hashes()))
+
+def prefetch_metadata(magnet_links, timeout=60, manager=None):
+    """
+    Fetch the metadata of candidate torrents in parallel, downloading none of their files
+
+    The metadata is cached, so whichever candidate is then downloaded starts
+    without waiting for it again.
+
+    Args:
+        magnet_links (list): Magnet links of the candidates (e.g. the crawler's top results)
+        timeout (int): Seconds to wait for all of them
+        manager (SessionManager): Session to fetch in (defaults to the shared one)
+
+    Returns:
+        dict: Infohash -> torrent info (None where the metadata did not arrive in time)
+    """
+    manager = manager or get_session_manager()
+    print(f"Fetching metadata for {len(magnet_links)} torrents...")
+    infos = manager.prefetch([link for link in magnet_links if link.startswith('magnet:')], timeout)
+    for infohash, info in infos.items():
+        if info is None:
+            print(f"✗ {infohash}: no metadata after {timeout}s")
+        else:
+            print(f"✓ {info.name()}: {info.num_files()} files, {info.total_size() / (1024**3):.2f} GB")
+    return infos
 
 def signal_handler(sig, frame):
     """Handle interrupt signals gracefully"""
     print("\n\nInterrupt received, shutting down gracefully...")
-    
-    if active_session is not None and active_handle is not None:
-        print("Stopping torrent and closing session...")
-        # Pause the torrent to stop network activity
-        active_handle.pause()
-        # Save resume data for potential future resuming
-        active_handle.save_resume_data()
-        # Wait briefly for the resume data to be processed
-        time.sleep(1)
-        # Remove the torrent but keep the files
-        active_session.remove_torrent(active_handle)
-    
+    shutdown_session_manager()
     print("Shutdown complete. Exiting.")
     sys.exit(0)
 
+VIDEO_EXTENSIONS = ['.mp4', '.mkv', '.avi', '.mov', '.wmv', '.flv', '.webm']
+SUBTITLE_EXTENSIONS = ['.srt', '.ass', '.sub', '.idx', '.sup']
+AUDIO_EXTENSIONS = ['.mp3', '.wav', '.flac', '.ogg', '.aac', '.m4a']
+DOCUMENT_EXTENSIONS = ['.pdf', '.epub', '.mobi', '.doc', '.docx', '.txt']
+ARCHIVE_EXTENSIONS = ['.zip', '.rar', '.7z', '.tar', '.gz']
+IMAGE_EXTENSIONS = ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff']
+
 def get_known_extensions():
     """Return a list of known safe file extensions"""
-    video_extensions = ['.mp4', '.mkv', '.avi', '.mov', '.wmv', '.flv', '.webm']
-    subtitle_extensions = ['.srt', '.ass', '.sub', '.idx', '.sup']
-    audio_extensions = ['.mp3', '.wav', '.flac', '.ogg', '.aac', '.m4a']
-    document_extensions = ['.pdf', '.epub', '.mobi', '.doc', '.docx', '.txt']
-    archive_extensions = ['.zip', '.rar', '.7z', '.tar', '.gz']
-    image_extensions = ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff']
-    
-    return video_extensions + subtitle_extensions + audio_extensions + document_extensions + archive_extensions + image_extensions
+    return (VIDEO_EXTENSIONS + SUBTITLE_EXTENSIONS + AUDIO_EXTENSIONS + DOCUMENT_EXTENSIONS
+            + ARCHIVE_EXTENSIONS + IMAGE_EXTENSIONS)
+
+# Frozen once for classifying files in manifests
+KNOWN_EXTENSIONS = frozenset(get_known_extensions())
 
 def check_torrent_name(name):
     """
@@ -57,132 +150,137 @@ def check_torrent_name(name):
     
     return True, "Torrent name passed checks"
 
-def is_safe_torrent(handle):
+def get_manifest(handle, manager=None):
+    """
+    Return the file manifest of a torrent, building it once its metadata has arrived
+
+    The manifest is kept with the torrent in the session manager, so the safety
+    checks, file selection and streaming all share one copy, and saved in the
+    manager's metadata store, so later runs load it instead of rebuilding it.
+
+    Args:
+        handle: Torrent handle hosted by the session manager
+        manager (SessionManager): Manager hosting the torrent (defaults to the shared one)
+
+    Returns:
+        FileManifest: The torrent's files, or None if its metadata could not be retrieved
+    """
+    manager = manager or get_session_manager()
+    torrent = manager.torrent_for(handle)
+    if torrent is not None and torrent.manifest is not None:
+        return torrent.manifest
+    
+    if not wait_for_metadata(handle, manager):
+        return None
+    
+    store = manager.metadata_store if torrent is not None else None
+    manifest = store.load_manifest(torrent.infohash, KNOWN_EXTENSIONS) if store is not None else None
+    if manifest is None:
+        manifest = FileManifest.from_torrent_info(handle.torrent_file(), KNOWN_EXTENSIONS)
+        if store is not None:
+            store.save_manifest(torrent.infohash, manifest)
+    if torrent is not None:
+        torrent.manifest = manifest
+    return manifest
+
+def is_safe_torrent(handle, manager=None):
     """
     Validate if a torrent is safe to download based on various checks
     
     Args:
         handle: Torrent handle with metadata
+        manager (SessionManager): Manager hosting the torrent, used if metadata is still missing
         
     Returns:
         tuple: (is_safe, reason) - Boolean indicating if safe and reason if not
     """
-    # Wait for metadata if needed
-    while not handle.status().has_metadata:
-        time.sleep(1)
-        print("\rWaiting for metadata...", end='')
+    manifest = get_manifest(handle, manager)
+    if manifest is None:
+        return False, "Metadata could not be retrieved"
     
     print("\rValidating torrent safety...", end='')
     
-    # Get torrent info
-    info = handle.torrent_file()
-    
     # Check 1: File size (e.g., > 50GB might be suspicious)
-    total_size = info.total_size()
+    total_size = manifest.total_size
     if total_size > 50 * 1024 * 1024 * 1024:  # 50GB
         return False, f"Torrent size is suspiciously large: {total_size / (1024**3):.2f} GB"
     
     # Check 2: Too many small files (could be a sign of malware)
-    small_files_count = 0
-    for i in range(info.num_files()):
-        if info.files().file_size(i) < 10 * 1024:  # Less than 10KB
-            small_files_count += 1
+    small_files_count = manifest.count_smaller_than(10 * 1024)  # Less than 10KB
     
     if small_files_count > 100:  # Arbitrary threshold
         return False, f"Contains suspiciously many small files: {small_files_count}"
     
     # Check 3: Torrent name check
-    torrent_name = info.name()
+    torrent_name = manifest.name
     name_safe, name_reason = check_torrent_name(torrent_name)
     if not name_safe:
         return False, name_reason
     
     return True, "Torrent passed safety checks"
 
-def filter_files_by_extension(handle):
+def filter_files_by_extension(handle, manager=None):
     """
     Set file priorities to only download files with known extensions
     
     Args:
         handle: Torrent handle with metadata
+        manager (SessionManager): Manager hosting the torrent, used if metadata is still missing
         
     Returns:
         tuple: (total_files, selected_files) - Counts of total and selected files
     """
-    known_extensions = get_known_extensions()
+    manifest = get_manifest(handle, manager)
+    if manifest is None:
+        return 0, 0
     
-    # Wait for metadata if needed
-    while not handle.status().has_metadata:
-        time.sleep(1)
+    total_files = len(manifest)
+    selected_files = manifest.selected_count
     
-    info = handle.torrent_file()
-    file_priorities = []
-    total_files = info.num_files()
-    selected_files = 0
-    skipped_extensions = set()
+    # Known extensions at normal priority, everything else not downloaded
+    handle.prioritize_files(manifest.priorities())
     
-    print("\nSelecting files to download:")
-    
-    for i in range(total_files):
-        file_path = info.files().file_path(i)
-        file_ext = os.path.splitext(file_path)[1].lower()
-        
-        if file_ext in known_extensions:
-            file_priorities.append(4)  # Normal priority
-            selected_files += 1
-            print(f"✓ Will download: {file_path}")
-        else:
-            file_priorities.append(0)  # Don't download
-            skipped_extensions.add(file_ext)
-            print(f"✗ Skipping: {file_path}")
-    
-    handle.prioritize_files(file_priorities)
+    print(f"\nSelected {selected_files} of {total_files} files to download")
     
+    skipped_extensions = manifest.skipped_extensions()
     if skipped_extensions:
-        print(f"\nSkipped file types: {', '.join(skipped_extensions)}")
+        print(f"Skipped file types: {', '.join(sorted(skipped_extensions))}")
     
     return total_files, selected_files
 
-def download_torrent(magnet_link, save_path="./downloads"):
+def download_torrent(magnet_link, save_path="./downloads", manager=None):
     """
     Download a torrent from a magnet link
     
     Args:
         magnet_link (str): Magnet link to download
         save_path (str): Directory to save the downloaded files
+        manager (SessionManager): Session to host the torrent in (defaults to the shared one)
     """
-    global active_session, active_handle
-    
-    # Create session with appropriate settings
-    settings = {
-        'enable_dht': True,
-        'enable_lsd': True,
-        'enable_upnp': True,
-        'enable_natpmp': True,
-        'alert_mask': lt.alert.category_t.all_categories
-    }
-    
-    ses = lt.session(settings)
-    active_session = ses
+    manager = manager or get_session_manager()
     
-    # Parse magnet link
-    params = lt.parse_magnet_uri(magnet_link)
+    # Add the torrent to the shared session
+    infohash = manager.add(magnet_link, save_path)
     
-    # Create a temporary save path to get metadata
-    temp_save_path = save_path
-    params.save_path = temp_save_path
+    torrent = manager.get(infohash)
     
-    # Add the torrent to the session
-    handle = ses.add_torrent(params)
-    active_handle = handle
+    # Wait for a free slot if the session is full
+    if torrent.pending:
+        print(f"Queued for admission: {manager.status(infohash)['pending_position']} ahead")
+        torrent.admitted.wait()
+        if torrent.handle is None:
+            print("Torrent was removed before it could start.")
+            return
+    handle = torrent.handle
     
     # Wait for metadata
     print(f"Downloading metadata...")
-    while not handle.status().has_metadata:
-        print("\rWaiting for metadata...", end='')
-        time.sleep(1)
+    if not manager.wait_for_metadata(infohash):
+        print(f"Failed to retrieve metadata: {torrent.error}")
+        manager.remove(infohash)
+        return
     
-    print("\nMetadata received!")
+    print("Metadata received!")
     
     # Get torrent name for folder creation
     torrent_name = handle.status().name
@@ -195,46 +293,43 @@ def download_torrent(magnet_link, save_path="./downloads"):
     handle.move_storage(torrent_folder)
     
     # Validate torrent safety
-    is_safe, reason = is_safe_torrent(handle)
+    is_safe, reason = is_safe_torrent(handle, manager)
     
     if not is_safe:
         print(f"Safety check failed: {reason}")
         print("Aborting download for safety reasons.")
-        ses.remove_torrent(handle)
+        manager.remove(infohash)
         return
     
     print(f"Safety check passed: {reason}")
     
     # Filter files by extension
-    total_files, selected_files = filter_files_by_extension(handle)
+    total_files, selected_files = filter_files_by_extension(handle, manager)
     
     if selected_files == 0:
         print("No files with known safe extensions found in this torrent.")
         print("Aborting download for safety reasons.")
-        ses.remove_torrent(handle)
+        manager.remove(infohash)
         return
     
     print(f"\nDownloading {selected_files} of {total_files} files from: {torrent_name}")
     
-    # Monitor the download progress
-    while handle.status().state != lt.torrent_status.seeding:
-        status = handle.status()
-        
-        # Calculate download progress
-        progress = status.progress * 100
-        download_rate = status.download_rate / 1000  # KB/s
-        
-        state_str = ['queued', 'checking', 'downloading metadata', 
-                    'downloading', 'finished', 'seeding', 'allocating']
-        
-        current_state = state_str[status.state] if status.state < len(state_str) else "unknown"
-        
-        print(f"\rStatus: {current_state} | "
-              f"Progress: {progress:.2f}% | "
-              f"Download speed: {download_rate:.2f} KB/s | "
-              f"Peers: {status.num_peers}", end='')
-        
-        time.sleep(1)
+    # Monitor the download progress from the session's batched state updates, using the
+    # same per-torrent record the stats exporter publishes
+    def show_progress(event, updated):
+        if updated is not torrent or event != 'progress':
+            return
+        print(f"\r{format_progress(manager.describe(infohash))}", end='')
+    
+    manager.subscribe(show_progress)
+    try:
+        finished = manager.wait_until_finished(infohash)
+    finally:
+        manager.unsubscribe(show_progress)
+    
+    if not finished:
+        print(f"\nDownload failed: {torrent.error}")
+        return
     
     print("\nDownload complete!")
 
@@ -263,6 +358,15 @@ if __name__ == "__main__":
     signal.signal(signal.SIGINT, signal_handler)  # Ctrl+C
     signal.signal(signal.SIGTERM, signal_handler)  # Termination signal
     
+    # Optional settings profile: --profile <name>
+    if '--profile' in sys.argv:
+        index = sys.argv.index('--profile')
+        if index + 1 >= len(sys.argv) or sys.argv[index + 1] not in PROFILES:
+            print(f"Error: --profile must be one of: {', '.join(PROFILES)}")
+            sys.exit(1)
+        SESSION_PROFILE = sys.argv[index + 1]
+        del sys.argv[index:index + 2]
+    
     try:
         # Interactive mode if no arguments provided
         if len(sys.argv) < 2:
@@ -279,10 +383,11 @@ if __name__ == "__main__":
         
         # Create save directory if it doesn't exist
         os.makedirs(save_path, exist_ok=True)
+        start_stats_exporter()
         download_torrent(magnet_link, save_path)
+        shutdown_session_manager()
     except Exception as e:
         print(f"\nAn error occurred: {e}")
         # Attempt to clean up if an exception occurs
-        if active_session is not None and active_handle is not None:
-            active_session.remove_torrent(active_handle)
+        shutdown_session_manager()
         sys.exit(1)
\ No newline at end of file
@@ -0,0 +1,80 @@
+import os
+import sys
+from array import array
+from itertools import accumulate
+
+class FileManifest:
+    """
+    Compact, array-backed list of a torrent's files
+
+    Built once per torrent from its metadata so that safety checks, file
+    priorities and picking the file to stream are single passes over flat
+    arrays instead of a libtorrent call per file. Paths and extensions are
+    interned (releases repeat the same few extensions thousands of times),
+    sizes and offsets are 64-bit integer arrays, and each file is classified
+    against the known extensions once, when the manifest is built.
+    """
+
+    __slots__ = ('name', 'paths', 'extensions', 'sizes', 'offsets', 'known')
+
+    def __init__(self, paths, sizes, known_extensions=frozenset(), name=''):
+        """
+        Args:
+            paths (list): Path of each file, in torrent order
+            sizes (list): Size of each file in bytes
+            known_extensions (frozenset): Lowercase extensions (with the dot) of files to download
+            name (str): Name of the torrent
+        """
+        self.name = name
+        self.paths = [sys.intern(path) for path in paths]
+        self.extensions = [sys.intern(os.path.splitext(path)[1].lower()) for path in self.paths]
+        self.sizes = array('q', sizes)
+        # Files are laid out back to back in the torrent
+        self.offsets = array('q', accumulate(self.sizes, initial=0))[:-1]
+        self.known = bytes(extension in known_extensions for extension in self.extensions)
+
+    @classmethod
+    def from_torrent_info(cls, info, known_extensions=frozenset()):
+        """Build the manifest of a torrent from its lt.torrent_info"""
+        files = info.files()
+        count = files.num_files()
+        return cls([files.file_path(i) for i in range(count)], [files.file_size(i) for i in range(count)],
+                   known_extensions, name=info.name())
+
+    def __len__(self):
+        return len(self.sizes)
+
+    @property
+    def total_size(self):
+        return sum(self.sizes)
+
+    @property
+    def selected_count(self):
+        """Number of files with a known extension"""
+        return self.known.count(1)
+
+    def count_smaller_than(self, size):
+        """Number of files smaller than size bytes"""
+        return sum(1 for file_size in self.sizes if file_size < size)
+
+    def priorities(self, wanted=4):
+        """File priorities downloading only the files with a known extension"""
+        return [wanted if known else 0 for known in self.known]
+
+    def skipped_extensions(self):
+        """Extensions of the files that will not be downloaded"""
+        return {extension for extension, known in zip(self.extensions, self.known) if not known}
+
+    def largest(self, extensions):
+        """
+        Index of the largest file with one of the given extensions
+
+        Returns:
+            int: File index, or None if no file has one of them
+        """
+        extensions = frozenset(extensions)
+        best, best_size = None, -1
+        for i, (extension, size) in enumerate(zip(self.extensions, self.sizes)):
+            if size > best_size and extension in extensions:
+                best, best_size = i, size
+        return best
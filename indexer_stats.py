@@ -0,0 +1,242 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (seconds) of the latency histogram buckets; the last one catches everything
+LATENCY_BUCKETS = (0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 30.0, float('inf'))
+
+class IndexerStats:
+    """Latency, error and yield statistics for a single indexer"""
+
+    def __init__(self, window=100):
+        self.requests = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.results = 0
+        self.last_attempt = 0.0
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        # Recent samples drive scheduling, so it adapts when an indexer recovers
+        self.recent_latencies = deque(maxlen=window)
+        self.recent_errors = deque(maxlen=window)
+
+    def record(self, latency, results=0, error=False, timed_out=False):
+        self.requests += 1
+        self.results += results
+        self.last_attempt = time.time()
+        if error or timed_out:
+            self.errors += 1
+        if timed_out:
+            self.timeouts += 1
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if latency <= bound:
+                self.buckets[i] += 1
+                break
+        self.recent_latencies.append(latency)
+        self.recent_errors.append(bool(error or timed_out))
+
+    def percentile(self, fraction):
+        """Latency at the given fraction (0-1) of recent requests, or None without samples"""
+        if not self.recent_latencies:
+            return None
+        ordered = sorted(self.recent_latencies)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    @property
+    def error_rate(self):
+        if not self.recent_errors:
+            return 0.0
+        return sum(self.recent_errors) / len(self.recent_errors)
+
+    @property
+    def mean_yield(self):
+        successes = self.requests - self.errors
+        return self.results / successes if successes else 0.0
+
+    def to_dict(self):
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'timeouts': self.timeouts,
+            'results': self.results,
+            'last_attempt': self.last_attempt,
+            'buckets': self.buckets,
+            'recent_latencies': list(self.recent_latencies),
+            'recent_errors': list(self.recent_errors),
+        }
+
+    @classmethod
+    def from_dict(cls, data, window=100):
+        stats = cls(window)
+        stats.requests = data.get('requests', 0)
+        stats.errors = data.get('errors', 0)
+        stats.timeouts = data.get('timeouts', 0)
+        stats.results = data.get('results', 0)
+        stats.last_attempt = data.get('last_attempt', 0.0)
+        buckets = data.get('buckets', [])
+        if len(buckets) == len(LATENCY_BUCKETS):
+            stats.buckets = list(buckets)
+        stats.recent_latencies.extend(data.get('recent_latencies', []))
+        stats.recent_errors.extend(data.get('recent_errors', []))
+        return stats
+
+class IndexerTelemetry:
+    """
+    Per-indexer statistics and the scheduling decisions derived from them
+
+    Indexers that mostly fail or whose p95 latency exceeds the search
+    deadline are skipped, except for an occasional probe so they can
+    recover. Indexers that are slow or error-prone are demoted to the back
+    of the queue. Statistics can be persisted so scheduling is warm from the
+    first search of a new process.
+    """
+
+    def __init__(self, path=None, min_samples=5, slow_fraction=0.5, demote_error_rate=0.25,
+                 skip_error_rate=0.75, retry_after=600):
+        """
+        Args:
+            path (str): JSON file the statistics are loaded from and saved to, or None
+            min_samples (int): Recent requests needed before an indexer is judged
+            slow_fraction (float): Demote indexers whose p95 exceeds this fraction of the deadline
+            demote_error_rate (float): Demote indexers failing at least this often
+            skip_error_rate (float): Skip indexers failing at least this often
+            retry_after (float): Seconds after which a skipped indexer is probed again
+        """
+        self.path = path
+        self.min_samples = min_samples
+        self.slow_fraction = slow_fraction
+        self.demote_error_rate = demote_error_rate
+        self.skip_error_rate = skip_error_rate
+        self.retry_after = retry_after
+        self._stats = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        if path:
+            self.load()
+
+    def record(self, indexer, latency, results=0, error=False, timed_out=False):
+        """Record the outcome of one request to an indexer"""
+        with self._lock:
+            stats = self._stats.setdefault(indexer, IndexerStats())
+            stats.record(latency, results, error, timed_out)
+            self._dirty = True
+
+    def get(self, indexer):
+        """Return the IndexerStats for an indexer, or None if it has never been queried"""
+        with self._lock:
+            return self._stats.get(indexer)
+
+    def hedge_after(self, indexer, deadline):
+        """
+        Seconds after which a duplicate request should be sent to an indexer
+
+        Only healthy, fast indexers are hedged; a request to them running past
+        their p95 latency is more likely stuck than legitimately slow.
+
+        Returns:
+            float: The indexer's recent p95 latency, or None to never hedge
+        """
+        with self._lock:
+            stats = self._stats.get(indexer)
+            if stats is None or len(stats.recent_latencies) < self.min_samples:
+                return None
+            p95 = stats.percentile(0.95)
+            if stats.error_rate >= self.demote_error_rate or p95 > deadline * self.slow_fraction:
+                return None
+            return p95
+
+    def schedule(self, indexers, deadline):
+        """
+        Order indexers for a search and drop chronically bad ones
+
+        Args:
+            indexers (list): Candidate indexer IDs
+            deadline (float): Overall search deadline in seconds
+
+        Returns:
+            tuple: (indexers to query, fastest first; indexers skipped)
+        """
+        now = time.time()
+        ranked = []
+        skipped = []
+        with self._lock:
+            for position, indexer in enumerate(indexers):
+                stats = self._stats.get(indexer)
+                if stats is None or len(stats.recent_latencies) < self.min_samples:
+                    ranked.append(((0, 0.0, position), indexer))
+                    continue
+
+                p95 = stats.percentile(0.95)
+                error_rate = stats.error_rate
+                chronic = error_rate >= self.skip_error_rate or p95 >= deadline
+                if chronic and now - stats.last_attempt < self.retry_after:
+                    skipped.append(indexer)
+                    continue
+
+                demoted = chronic or error_rate >= self.demote_error_rate or p95 > deadline * self.slow_fraction
+                ranked.append(((int(demoted), p95, position), indexer))
+
+        # Never skip everything; fall back to the demoted order
+        if not ranked and skipped:
+            return self.schedule_all(skipped), []
+        ranked.sort(key=lambda entry: entry[0])
+        return [indexer for _, indexer in ranked], skipped
+
+    def schedule_all(self, indexers):
+        """Order indexers by recent p95 latency without skipping any"""
+        with self._lock:
+            def p95(indexer):
+                stats = self._stats.get(indexer)
+                value = stats.percentile(0.95) if stats else None
+                return value if value is not None else 0.0
+            return sorted(indexers, key=p95)
+
+    def snapshot(self):
+        """Return a summary of every indexer's statistics"""
+        with self._lock:
+            return {
+                indexer: {
+                    'requests': stats.requests,
+                    'error_rate': stats.error_rate,
+                    'timeouts': stats.timeouts,
+                    'p50': stats.percentile(0.5),
+                    'p95': stats.percentile(0.95),
+                    'mean_yield': stats.mean_yield,
+                    'latency_histogram': dict(zip(map(str, LATENCY_BUCKETS), stats.buckets)),
+                }
+                for indexer, stats in self._stats.items()
+            }
+
+    def load(self):
+        """Load persisted statistics, ignoring a missing or corrupt file"""
+        try:
+            with open(self.path, 'r') as file:
+                data = json.load(file)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable indexer statistics in {self.path}: {e}")
+            return
+        with self._lock:
+            self._stats = {indexer: IndexerStats.from_dict(entry) for indexer, entry in data.items()}
+
+    def save(self):
+        """Persist statistics atomically if anything changed since the last save"""
+        if not self.path:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {indexer: stats.to_dict() for indexer, stats in self._stats.items()}
+            self._dirty = False
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, 'w') as file:
+                json.dump(data, file)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Failed to save indexer statistics to {self.path}: {e}")
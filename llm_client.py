@@ -0,0 +1,280 @@
+import time
+import random
+import asyncio
+import logging
+import threading
+from types import SimpleNamespace
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import openai
+from openai import OpenAI, AsyncOpenAI
+
+logger = logging.getLogger(__name__)
+
+# HTTP statuses that mean "busy or briefly broken, try again" rather than "bad request"
+RETRYABLE_STATUSES = {408, 409, 425, 429, 500, 502, 503, 504}
+
+class LLMUnavailableError(RuntimeError):
+    """Raised without contacting the model server while its circuit breaker is open."""
+
+def is_retryable(error: BaseException) -> bool:
+    """Return True for transient failures: timeouts, dropped connections, overload and 5xx responses."""
+    if isinstance(error, openai.APIConnectionError):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in RETRYABLE_STATUSES
+    return False
+
+def retry_after(error: BaseException) -> Optional[float]:
+    """Seconds the server asked us to wait (Retry-After), if it said."""
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None) or {}
+    try:
+        return float(headers.get('retry-after'))
+    except (TypeError, ValueError):
+        return None
+
+class CircuitBreaker:
+    """
+    Fail fast while the model server is saturated or down.
+
+    After `failure_threshold` consecutive transient failures the breaker
+    opens and calls are rejected for `reset_timeout` seconds. Then a single
+    probe is let through (half-open): success closes the breaker, failure
+    opens it for another `reset_timeout`.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opens = 0
+        self.rejected = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Return True if a call may go ahead now."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            now = time.monotonic()
+            if now - self._opened_at >= self.reset_timeout:
+                # Let one probe through; the next waits for another reset_timeout
+                self.state = self.HALF_OPEN
+                self._opened_at = now
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info("Model server recovered, closing circuit breaker")
+            self.state = self.CLOSED
+            self.consecutive_failures = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == self.HALF_OPEN or (
+                    self.state == self.CLOSED and self.consecutive_failures >= self.failure_threshold):
+                logger.warning(f"Opening circuit breaker after {self.consecutive_failures} consecutive failures")
+                self.state = self.OPEN
+                self.opens += 1
+                self._opened_at = time.monotonic()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            retry_in = 0.0
+            if self.state != self.CLOSED:
+                retry_in = max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+            return {
+                'state': self.state,
+                'consecutive_failures': self.consecutive_failures,
+                'opens': self.opens,
+                'rejected': self.rejected,
+                'retry_in': retry_in,
+            }
+
+class LLMClientPool:
+    """
+    Long-lived OpenAI-compatible clients for one server, with retries and a circuit breaker.
+
+    The sync client is created once and shared, so its keep-alive
+    connections are reused across requests and threads. Chat completion
+    calls made through `client` (or an `async_client()`) are retried on
+    transient failures with full-jitter exponential backoff, honouring
+    Retry-After, and rejected immediately while the breaker is open.
+    Completions are side-effect free, so every request is safe to retry.
+    """
+
+    def __init__(self, base_url: str, api_key: str, timeout: float = 60.0, max_retries: int = 3,
+                 backoff_base: float = 0.5, backoff_max: float = 8.0, failure_threshold: int = 5,
+                 reset_timeout: float = 30.0):
+        """
+        Args:
+            base_url: Server URL, e.g. http://localhost:8000/v1
+            api_key: API key sent to the server
+            timeout: Per-request timeout in seconds (callers may pass timeout= to override it)
+            max_retries: Retries after the first attempt for transient failures
+            backoff_base: Upper bound of the first retry delay; doubles each attempt
+            backoff_max: Cap on any single retry delay
+            failure_threshold: Consecutive failures that open the breaker
+            reset_timeout: Seconds the breaker stays open before probing again
+        """
+        self.base_url = base_url
+        self.api_key = api_key
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+        self.in_flight = 0
+        self._client: Optional[Any] = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self) -> Any:
+        """Shared sync client; its chat completions go through the retry policy and breaker."""
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    # Retries are ours: the SDK's own would bypass the breaker
+                    self._client = _GuardedClient(
+                        self, OpenAI(base_url=self.base_url, api_key=self.api_key, timeout=self.timeout,
+                                     max_retries=0), is_async=False)
+        return self._client
+
+    def async_client(self) -> Any:
+        """
+        New async client sharing this pool's breaker and counters.
+
+        Async connections belong to the event loop that opened them, so keep
+        one per loop and close it when the loop ends.
+        """
+        client = AsyncOpenAI(base_url=self.base_url, api_key=self.api_key, timeout=self.timeout, max_retries=0)
+        return _GuardedClient(self, client, is_async=True)
+
+    def call(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Call func with retries, backoff and the circuit breaker."""
+        attempt = 0
+        while True:
+            self._before_attempt(attempt)
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                error = e
+            else:
+                error = None
+            finally:
+                self._end_attempt()
+            if error is None:
+                self.breaker.record_success()
+                return result
+            delay = self._after_failure(error, attempt)
+            if delay is None:
+                raise error
+            time.sleep(delay)
+            attempt += 1
+
+    async def call_async(self, func: Callable[..., Awaitable[Any]], *args: Any, **kwargs: Any) -> Any:
+        """Async counterpart of call."""
+        attempt = 0
+        while True:
+            self._before_attempt(attempt)
+            try:
+                result = await func(*args, **kwargs)
+            except Exception as e:
+                error = e
+            else:
+                error = None
+            finally:
+                self._end_attempt()
+            if error is None:
+                self.breaker.record_success()
+                return result
+            delay = self._after_failure(error, attempt)
+            if delay is None:
+                raise error
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Return request/retry/failure counters and the breaker state, for monitoring."""
+        with self._lock:
+            stats = {
+                'base_url': self.base_url,
+                'requests': self.requests,
+                'retries': self.retries,
+                'failures': self.failures,
+                'in_flight': self.in_flight,
+                'timeout': self.timeout,
+            }
+        stats['breaker'] = self.breaker.snapshot()
+        return stats
+
+    def close(self) -> None:
+        """Close the shared sync client's connections."""
+        with self._lock:
+            if self._client is not None:
+                self._client.close()
+                self._client = None
+
+    def _before_attempt(self, attempt: int) -> None:
+        if not self.breaker.allow():
+            raise LLMUnavailableError(
+                f"Circuit breaker open for {self.base_url}; retry in {self.breaker.snapshot()['retry_in']:.1f}s")
+        with self._lock:
+            self.requests += 1
+            self.retries += attempt > 0
+            self.in_flight += 1
+
+    def _end_attempt(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+
+    def _after_failure(self, error: Exception, attempt: int) -> Optional[float]:
+        """Record a failed attempt; returns the delay before retrying, or None to give up."""
+        if not is_retryable(error):
+            # The server answered (e.g. 400 for an unsupported response_format): it is healthy
+            if isinstance(error, openai.APIStatusError):
+                self.breaker.record_success()
+            return None
+        with self._lock:
+            self.failures += 1
+        self.breaker.record_failure()
+        if attempt >= self.max_retries or self.breaker.snapshot()['state'] == CircuitBreaker.OPEN:
+            return None
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        server_delay = retry_after(error)
+        if server_delay is not None:
+            delay = max(delay, min(server_delay, self.backoff_max))
+        logger.warning(f"Transient LLM error ({error}), retrying in {delay:.2f}s "
+                       f"(attempt {attempt + 1}/{self.max_retries})")
+        return delay
+
+class _GuardedClient:
+    """OpenAI client proxy whose chat completions go through an LLMClientPool."""
+
+    def __init__(self, pool: LLMClientPool, client: Any, is_async: bool):
+        self._client = client
+        completions = client.chat.completions
+        if is_async:
+            async def create(*args: Any, **kwargs: Any) -> Any:
+                return await pool.call_async(completions.create, *args, **kwargs)
+        else:
+            def create(*args: Any, **kwargs: Any) -> Any:
+                return pool.call(completions.create, *args, **kwargs)
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=create))
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._client, name)
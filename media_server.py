@@ -0,0 +1,315 @@
+import argparse
+import json
+import mimetypes
+import re
+import threading
+from concurrent.futures import Future
+from contextlib import nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from download import get_manifest, get_session_manager, shutdown_session_manager
+from policy_engine import PolicyEngine
+from session_manager import PROFILES
+from streaming import TorrentStream, pick_main_file, stream_torrent
+
+RANGE_PATTERN = re.compile(r'^bytes=(\d*)-(\d*)$')
+PATH_PATTERN = re.compile(r'^/([0-9a-fA-F]{40}|[0-9a-fA-F]{64})(?:/(\d+))?/?$')
+
+# Most bytes handed to a single sendfile() call
+SEND_CHUNK = 4 * 1024 * 1024
+
+mimetypes.add_type('video/x-matroska', '.mkv')
+mimetypes.add_type('video/webm', '.webm')
+
+def parse_range(header, size):
+    """
+    Parse a single-range Range header
+
+    Args:
+        header (str): Value of the Range header (None if absent)
+        size (int): Size of the file in bytes
+
+    Returns:
+        tuple: (start, end) inclusive byte positions, None for the whole file, or
+            False if the range cannot be satisfied
+    """
+    if not header:
+        return None
+    match = RANGE_PATTERN.match(header.strip())
+    if not match or match.groups() == ('', ''):
+        # Multiple ranges or other units: serve the whole file, as RFC 9110 allows
+        return None
+    first, last = match.groups()
+    if first == '':
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0 or size == 0:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        return False
+    return start, end
+
+class MediaServer:
+    """
+    HTTP server streaming files of torrents hosted by a SessionManager
+
+    GET /<infohash> serves the torrent's main video file and /<infohash>/<file>
+    a given file index; GET / lists the torrents with their URLs. Byte ranges
+    are supported, so players can seek. Pieces already on disk are sent with
+    zero-copy sendfile(); a request reaching a piece that has not been
+    downloaded yet moves the stream's deadline window there and waits for it
+    instead of failing. Each client is served on its own thread. With a
+    PolicyEngine, a torrent gets priority bandwidth while its file is being sent.
+    """
+
+    def __init__(self, manager, host="127.0.0.1", port=8080, piece_timeout=60.0, policy=None):
+        """
+        Args:
+            manager (SessionManager): Manager hosting the torrents to serve
+            host (str): Interface to listen on ("0.0.0.0" for TVs and phones on the LAN)
+            port (int): Port to listen on (0 picks a free one)
+            piece_timeout (float): Seconds a request waits for a missing piece before giving up
+            policy (PolicyEngine): Bandwidth policy told which torrents are being watched
+        """
+        self.manager = manager
+        self.piece_timeout = piece_timeout
+        self.policy = policy
+        self._streams = {}
+        # Futures of the streams being started, so concurrent requests for one file start it once
+        self._starting = {}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def url_for(self, infohash, file_index=None):
+        """URL of a torrent's main video file (or of a given file)"""
+        path = f"{self.url}/{infohash}"
+        return path if file_index is None else f"{path}/{file_index}"
+
+    def start(self):
+        """Serve in a background thread"""
+        self._thread = threading.Thread(target=self._server.serve_forever, name="media-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        """Serve on the calling thread until interrupted"""
+        self._server.serve_forever()
+
+    def stop(self):
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread = None
+        self._server.server_close()
+        with self._lock:
+            streams, self._streams = list(self._streams.values()), {}
+        for stream in streams:
+            stream.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def adopt(self, stream):
+        """Serve an already started TorrentStream for its torrent"""
+        with self._lock:
+            self._streams[(stream.torrent.infohash, None)] = stream
+            self._streams[(stream.torrent.infohash, stream.file_index)] = stream
+
+    def stream_for(self, infohash, file_index=None):
+        """
+        Return the shared TorrentStream for a torrent's file, starting it on first use
+
+        Returns:
+            TorrentStream: The stream, or None if the torrent has no metadata in time
+
+        Raises:
+            KeyError: If the torrent is not hosted
+            ValueError: If no file index is given and the torrent has no video file
+        """
+        infohash = infohash.lower()
+        with self._lock:
+            stream = self._streams.get((infohash, file_index))
+        if stream is not None:
+            return stream
+        if not self.manager.wait_for_metadata(infohash, timeout=self.piece_timeout):
+            return None
+        main_file = file_index is None
+        if main_file:
+            file_index = pick_main_file(get_manifest(self.manager.handle(infohash), self.manager))
+            if file_index is None:
+                raise ValueError("Torrent has no video file to stream")
+        key = (infohash, file_index)
+        with self._lock:
+            stream = self._streams.get(key)
+            if stream is not None:
+                return stream
+            starting = self._starting.get(key)
+            owner = starting is None
+            if owner:
+                starting = self._starting[key] = Future()
+        if not owner:
+            return starting.result()
+
+        # Starting can wait seconds for file priorities: only requests for this file wait on it
+        try:
+            stream = TorrentStream(self.manager, infohash, file_index=file_index)
+            # A complete file needs no steering; otherwise fetch it in playback order
+            if not stream.have_range(0, stream.size):
+                stream.start()
+        except Exception as e:
+            with self._lock:
+                del self._starting[key]
+            starting.set_exception(e)
+            raise
+        with self._lock:
+            del self._starting[key]
+            self._streams[key] = stream
+            if main_file:
+                self._streams[(infohash, None)] = stream
+        starting.set_result(stream)
+        return stream
+
+    def _make_handler(self):
+        media = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_HEAD(self):
+                self._serve(send_body=False)
+
+            def do_GET(self):
+                if self.path.rstrip('/') == '':
+                    self._send_index()
+                else:
+                    self._serve(send_body=True)
+
+            def _send_index(self):
+                torrents = [dict(status, url=media.url_for(status['infohash']))
+                            for status in media.manager.torrents()]
+                body = json.dumps(torrents).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _serve(self, send_body):
+                match = PATH_PATTERN.match(self.path.split('?', 1)[0])
+                if not match:
+                    self.send_error(404)
+                    return
+                infohash, file_index = match.group(1), match.group(2)
+                try:
+                    stream = media.stream_for(infohash, None if file_index is None else int(file_index))
+                except (KeyError, IndexError, ValueError):
+                    self.send_error(404)
+                    return
+                if stream is None:
+                    self.send_error(503, "Metadata not available yet")
+                    return
+
+                byte_range = parse_range(self.headers.get("Range"), stream.size)
+                if byte_range is False:
+                    self.send_response(416)
+                    self.send_header("Content-Range", f"bytes */{stream.size}")
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                start, end = byte_range or (0, stream.size - 1)
+
+                self.send_response(206 if byte_range else 200)
+                self.send_header("Content-Type", mimetypes.guess_type(stream.path)[0] or "application/octet-stream")
+                self.send_header("Accept-Ranges", "bytes")
+                self.send_header("Content-Length", str(max(end - start + 1, 0)))
+                if byte_range:
+                    self.send_header("Content-Range", f"bytes {start}-{end}/{stream.size}")
+                self.end_headers()
+                if send_body and end >= start:
+                    watching = media.policy.watch(stream.torrent.infohash) if media.policy else nullcontext()
+                    with watching:
+                        self._send_file(stream, start, end)
+
+            def _send_file(self, stream, start, end):
+                position = start
+                stream.seek(position)
+                f = None
+                # True while the piece at position is known to be downloaded
+                downloaded = False
+                try:
+                    while position <= end:
+                        available = stream.readable_from(position, min(end + 1 - position, SEND_CHUNK),
+                                                         timeout=media.piece_timeout)
+                        if available == 0:
+                            if downloaded:
+                                # The piece is there but was not flushed to disk within piece_timeout
+                                self.close_connection = True
+                                return
+                            # Reader caught up with the download: pull the window here and wait
+                            stream.seek(position)
+                            if not stream.wait_for_range(position, 1, timeout=media.piece_timeout):
+                                self.close_connection = True
+                                return
+                            downloaded = True
+                            continue
+                        downloaded = False
+                        # The file only exists once libtorrent has written to it
+                        f = f or open(stream.path, 'rb')
+                        # socket.sendfile uses zero-copy os.sendfile() where the platform has it
+                        sent = self.connection.sendfile(f, offset=position, count=available)
+                        if sent == 0:
+                            self.close_connection = True
+                            return
+                        position += sent
+                except (BrokenPipeError, ConnectionResetError):
+                    self.close_connection = True
+                finally:
+                    if f is not None:
+                        f.close()
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream a torrent over HTTP while it downloads")
+    parser.add_argument("magnet", help="Magnet link of the torrent to stream")
+    parser.add_argument("save_path", nargs="?", default="./downloads", help="Directory to save the files")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to listen on (0.0.0.0 for the LAN)")
+    parser.add_argument("--port", type=int, default=8080, help="Port to listen on")
+    parser.add_argument("--profile", choices=list(PROFILES), default="streaming", help="Session settings profile")
+    args = parser.parse_args()
+
+    manager = get_session_manager(args.profile)
+    # Torrents seeding in the background are held back while a client watches
+    policy = PolicyEngine(manager)
+    server = MediaServer(manager, host=args.host, port=args.port, policy=policy)
+    try:
+        stream = stream_torrent(args.magnet, args.save_path, manager)
+        if stream is None:
+            return
+        server.adopt(stream)
+        print(f"Serving at {server.url_for(stream.torrent.infohash)}")
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nInterrupted.")
+    finally:
+        server.stop()
+        policy.close()
+        shutdown_session_manager()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+import json
+import logging
+import os
+
+import libtorrent as lt
+
+from file_manifest import FileManifest
+
+logger = logging.getLogger(__name__)
+
+class MetadataStore:
+    """
+    Torrent metadata (the bencoded info dictionary) cached by infohash
+
+    Metadata fetched from peers once is loaded straight into the
+    add_torrent_params the next time the torrent is added, so it starts
+    without waiting on the DHT. Entries are verified against their infohash
+    when read, and written atomically. Each torrent's FileManifest (paths and
+    sizes) is cached next to its metadata, so it is not rebuilt from the
+    info dictionary file by file on every run.
+    """
+
+    def __init__(self, directory):
+        """
+        Args:
+            directory (str): Directory holding the .info files (created if missing)
+        """
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def path_for(self, infohash):
+        return os.path.join(self.directory, f"{infohash.lower()}.info")
+
+    def manifest_path_for(self, infohash):
+        return os.path.join(self.directory, f"{infohash.lower()}.manifest")
+
+    def __contains__(self, infohash):
+        return os.path.exists(self.path_for(infohash))
+
+    def save(self, infohash, info):
+        """
+        Write a torrent's info dictionary atomically (existing entries are kept as they are)
+
+        Args:
+            infohash (str): Torrent the metadata belongs to
+            info: lt.torrent_info of the torrent
+
+        Returns:
+            bool: True if the metadata is stored
+        """
+        path = self.path_for(infohash)
+        if os.path.exists(path):
+            return True
+        return self._write(path, info.info_section())
+
+    def save_manifest(self, infohash, manifest):
+        """
+        Write a torrent's file manifest atomically
+
+        Args:
+            infohash (str): Torrent the manifest belongs to
+            manifest (FileManifest): Its files
+
+        Returns:
+            bool: True if the manifest is stored
+        """
+        entry = {'name': manifest.name, 'paths': manifest.paths, 'sizes': manifest.sizes.tolist()}
+        return self._write(self.manifest_path_for(infohash), json.dumps(entry).encode())
+
+    def load_manifest(self, infohash, known_extensions=frozenset()):
+        """
+        Read a torrent's file manifest, classifying its files against known_extensions
+
+        Returns:
+            FileManifest, or None if there is none or it is unreadable
+        """
+        path = self.manifest_path_for(infohash)
+        try:
+            with open(path, 'rb') as file:
+                entry = json.load(file)
+            return FileManifest(entry['paths'], entry['sizes'], known_extensions, name=entry['name'])
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Ignoring unreadable manifest in {path}: {e}")
+            return None
+
+    def load(self, infohash):
+        """
+        Read a torrent's metadata
+
+        Returns:
+            lt.torrent_info, or None if there is none or it does not match the infohash
+        """
+        path = self.path_for(infohash)
+        try:
+            with open(path, 'rb') as file:
+                # torrent_info parses a whole .torrent, so wrap the info dictionary in one
+                info = lt.torrent_info(b'd4:info' + file.read() + b'e')
+        except FileNotFoundError:
+            return None
+        except (OSError, RuntimeError) as e:
+            logger.warning(f"Ignoring unreadable metadata in {path}: {e}")
+            return None
+        hashes = info.info_hashes()
+        if infohash.lower() not in (str(hashes.v1), str(hashes.v2)):
+            logger.warning(f"Ignoring metadata in {path}: it belongs to another torrent")
+            return None
+        return info
+
+    def _write(self, path, data):
+        tmp_path = f"{path}.tmp"
+        try:
+            with open(tmp_path, 'wb') as file:
+                file.write(data)
+            os.replace(tmp_path, path)
+            return True
+        except OSError as e:
+            logger.warning(f"Failed to save metadata to {path}: {e}")
+            return False
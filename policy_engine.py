@@ -0,0 +1,263 @@
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, time as day_time
+
+import libtorrent as lt
+
+@dataclass(slots=True)
+class BandwidthWindow:
+    """Global rate limits applying between two times of day (wrapping past midnight if end < start)"""
+    start: day_time
+    end: day_time
+    upload_limit: int = 0
+    download_limit: int = 0
+
+    @classmethod
+    def parse(cls, start, end, upload_limit=0, download_limit=0):
+        """Build a window from "HH:MM" strings, limits in bytes/s (0 for unlimited)"""
+        return cls(day_time.fromisoformat(start), day_time.fromisoformat(end), upload_limit, download_limit)
+
+    def covers(self, moment):
+        """True if the time of day of moment falls inside the window"""
+        now = moment.time()
+        if self.start <= self.end:
+            return self.start <= now < self.end
+        return now >= self.start or now < self.end
+
+def _tighter(limit, cap):
+    # 0 means unlimited
+    if not cap:
+        return limit
+    return min(limit, cap) if limit else cap
+
+class PolicyEngine:
+    """
+    Bandwidth and seeding policy for the torrents of a SessionManager
+
+    - Global upload/download limits are set on libtorrent's global peer class,
+      and follow a time-of-day schedule of BandwidthWindows when one matches.
+    - Per-torrent limits are set on each torrent's handle.
+    - While a client is watching a torrent (watch()), every other torrent is
+      capped at the background limits, so seeding cannot starve the stream.
+    - Torrents that reach the seed ratio or seed time target are retired:
+      paused (kept hosted, files on disk) or removed. Watched torrents are
+      never retired.
+
+    Per-torrent limits and targets are evaluated on the manager's alert loop
+    as progress updates arrive, and everything is re-evaluated every
+    `interval` seconds on the engine's own thread, so schedule windows open
+    and close even when no torrent is active. Settings can be changed at any
+    time; changes apply immediately.
+    """
+
+    def __init__(self, manager, upload_limit=0, download_limit=0, seed_ratio=None, seed_time=None,
+                 retire='pause', schedule=(), background_upload_limit=64 * 1024, background_download_limit=0,
+                 interval=30.0):
+        """
+        Args:
+            manager (SessionManager): Manager whose torrents are governed
+            upload_limit (int): Global upload limit in bytes/s outside scheduled windows (0 for unlimited)
+            download_limit (int): Global download limit in bytes/s outside scheduled windows (0 for unlimited)
+            seed_ratio (float): Upload/size ratio after which a seeding torrent is retired (None for no target)
+            seed_time (float): Seconds of seeding after which a torrent is retired (None for no target)
+            retire (str): 'pause' or 'remove' (files are kept either way)
+            schedule (list): BandwidthWindows overriding the global limits at times of day
+            background_upload_limit (int): Upload cap in bytes/s of unwatched torrents while something is watched
+            background_download_limit (int): Download cap in bytes/s of unwatched torrents while something is watched
+            interval (float): Seconds between checks of the schedule and seeding targets
+        """
+        if retire not in ('pause', 'remove'):
+            raise ValueError(f"retire must be 'pause' or 'remove', not {retire!r}")
+        self.manager = manager
+        self.upload_limit = upload_limit
+        self.download_limit = download_limit
+        self.seed_ratio = seed_ratio
+        self.seed_time = seed_time
+        self.retire = retire
+        self.schedule = list(schedule)
+        self.background_upload_limit = background_upload_limit
+        self.background_download_limit = background_download_limit
+        self.interval = interval
+        self.retired = set()
+        self._torrent_limits = {}
+        self._watching = Counter()
+        # Limits last set on each torrent handle, so unchanged ones are not set again
+        self._applied = {}
+        self._global_applied = None
+        self._lock = threading.RLock()
+        self._stopping = threading.Event()
+        manager.subscribe(self._on_event)
+        self.apply()
+        self._thread = threading.Thread(target=self._run, name="policy-engine", daemon=True)
+        self._thread.start()
+
+    def close(self):
+        """Stop governing the torrents (limits already set stay in place)"""
+        self.manager.unsubscribe(self._on_event)
+        self._stopping.set()
+        if self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def set_global_limits(self, upload_limit=None, download_limit=None):
+        """Change the global limits used outside scheduled windows (None keeps the current one)"""
+        with self._lock:
+            if upload_limit is not None:
+                self.upload_limit = upload_limit
+            if download_limit is not None:
+                self.download_limit = download_limit
+            self._apply_global()
+
+    def set_schedule(self, schedule):
+        """Replace the time-of-day schedule"""
+        with self._lock:
+            self.schedule = list(schedule)
+            self._apply_global()
+
+    def set_torrent_limits(self, infohash, upload_limit=0, download_limit=0):
+        """Limit one torrent, in bytes/s (0 for unlimited)"""
+        with self._lock:
+            self._torrent_limits[infohash.lower()] = (upload_limit, download_limit)
+            self._apply_torrents()
+
+    def set_seed_targets(self, seed_ratio=None, seed_time=None):
+        """Change the ratio and seed time targets (None for no target) and retire torrents now past them"""
+        with self._lock:
+            self.seed_ratio = seed_ratio
+            self.seed_time = seed_time
+        self._check_retirement()
+
+    @contextmanager
+    def watch(self, infohash):
+        """Give a torrent priority bandwidth while the block runs (e.g. while a client plays it)"""
+        self.start_watching(infohash)
+        try:
+            yield
+        finally:
+            self.stop_watching(infohash)
+
+    def start_watching(self, infohash):
+        with self._lock:
+            self._watching[infohash.lower()] += 1
+            self._apply_torrents()
+
+    def stop_watching(self, infohash):
+        with self._lock:
+            infohash = infohash.lower()
+            self._watching[infohash] -= 1
+            if self._watching[infohash] <= 0:
+                del self._watching[infohash]
+            self._apply_torrents()
+
+    @property
+    def watching(self):
+        """Infohashes of the torrents being watched"""
+        with self._lock:
+            return set(self._watching)
+
+    def global_limits(self, moment=None):
+        """
+        Global limits in force at a moment
+
+        Returns:
+            tuple: (upload_limit, download_limit) of the first matching window, else the base limits
+        """
+        moment = moment or datetime.now()
+        for window in self.schedule:
+            if window.covers(moment):
+                return window.upload_limit, window.download_limit
+        return self.upload_limit, self.download_limit
+
+    def torrent_limits(self, infohash):
+        """
+        Limits in force for a torrent
+
+        Returns:
+            tuple: (upload_limit, download_limit) in bytes/s (0 for unlimited)
+        """
+        with self._lock:
+            upload, download = self._torrent_limits.get(infohash, (0, 0))
+            if self._watching and infohash not in self._watching:
+                upload = _tighter(upload, self.background_upload_limit)
+                download = _tighter(download, self.background_download_limit)
+            return upload, download
+
+    def apply(self):
+        """Apply the global limits, every torrent's limits and the seeding targets now"""
+        with self._lock:
+            self._apply_global()
+            self._apply_torrents()
+        self._check_retirement()
+
+    def _apply_global(self):
+        limits = self.global_limits()
+        if limits == self._global_applied:
+            return
+        session = self.manager.session
+        peer_class = session.get_peer_class(lt.session.global_peer_class_id)
+        peer_class['upload_limit'], peer_class['download_limit'] = limits
+        session.set_peer_class(lt.session.global_peer_class_id, peer_class)
+        self._global_applied = limits
+
+    def _apply_torrents(self):
+        torrents = self.manager.hosted_torrents()
+        for torrent in torrents:
+            self._apply_torrent(torrent)
+        # Forget the limits of removed torrents
+        hosted = {torrent.infohash for torrent in torrents}
+        for infohash in [infohash for infohash in self._applied if infohash not in hosted]:
+            del self._applied[infohash]
+
+    def _apply_torrent(self, torrent):
+        limits = self.torrent_limits(torrent.infohash)
+        if self._applied.get(torrent.infohash) == limits:
+            return
+        torrent.handle.set_upload_limit(limits[0])
+        torrent.handle.set_download_limit(limits[1])
+        self._applied[torrent.infohash] = limits
+
+    def _check_retirement(self, torrents=None):
+        for torrent in torrents if torrents is not None else self.manager.hosted_torrents():
+            reason = self._retirement_reason(torrent)
+            if reason is None:
+                continue
+            print(f"Retiring {torrent.last_status.name}: {reason}")
+            with self._lock:
+                self.retired.add(torrent.infohash)
+                self._applied.pop(torrent.infohash, None)
+            if self.retire == 'remove':
+                self.manager.remove(torrent.infohash)
+            else:
+                self.manager.pause(torrent.infohash)
+
+    def _retirement_reason(self, torrent):
+        status = torrent.last_status
+        if status is None or status.state != lt.torrent_status.seeding:
+            return None
+        with self._lock:
+            if torrent.infohash in self.retired or torrent.infohash in self._watching:
+                return None
+            seed_ratio, seed_time = self.seed_ratio, self.seed_time
+        ratio = status.all_time_upload / max(status.total_wanted, 1)
+        if seed_ratio is not None and ratio >= seed_ratio:
+            return f"ratio {ratio:.2f} reached the target of {seed_ratio:.2f}"
+        seeded = status.seeding_duration.total_seconds()
+        if seed_time is not None and seeded >= seed_time:
+            return f"seeded for {seeded / 3600:.1f}h (target {seed_time / 3600:.1f}h)"
+        return None
+
+    def _run(self):
+        while not self._stopping.wait(self.interval):
+            try:
+                self.apply()
+            except Exception as e:
+                print(f"Applying the bandwidth policy failed: {e}")
+
+    def _on_event(self, event, torrent):
+        if torrent.handle is None:
+            return
+        with self._lock:
+            self._apply_torrent(torrent)
+        if event == 'progress':
+            self._check_retirement([torrent])
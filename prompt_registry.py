@@ -0,0 +1,155 @@
+import os
+import json
+import yaml
+import hashlib
+import logging
+import threading
+from string import Formatter
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SYSTEM_PROMPT = (
+    "You are a helpful assistant that always outputs in valid JSON format. "
+    "The only valid keys for the JSON output are 'title' and 'year'."
+)
+
+# Placeholders each template must use; templates not listed must have none
+TEMPLATE_FIELDS = {
+    'retrieve_movie_year': {'movie'},
+    'retrieve_movie_year_batch': {'movies'},
+}
+REQUIRED_PROMPTS = ('retrieve_movie_year',)
+FEW_SHOT_PAIRS = (
+    ('retrieve_shot_one_user_prompt', 'retrieve_shot_one_assistant_prompt'),
+)
+
+class PromptError(ValueError):
+    """Raised when prompts.yaml is missing required templates or they are malformed."""
+
+def template_fields(template: str) -> set:
+    """Return the names of the format placeholders used in a template."""
+    return {field for _, field, _, _ in Formatter().parse(template) if field is not None}
+
+class PromptRegistry:
+    """
+    Prompts loaded once from a YAML file, validated, and reloaded only when
+    the file's modification time or size changes.
+
+    The system prompt and few-shot examples are rendered once into a message
+    prefix that is byte-identical across requests, so OpenAI-compatible
+    servers with prefix/KV caching can reuse it.
+    """
+
+    def __init__(self, file_path: str = 'prompts.yaml'):
+        self.file_path = file_path
+        self.reloads = 0
+        self._lock = threading.Lock()
+        self._signature: Optional[Tuple[int, int]] = None
+        self._prompts: Dict[str, str] = {}
+        self._version = ''
+        self._prefix: Tuple[Dict[str, str], ...] = ()
+        self.refresh()
+
+    @property
+    def prompts(self) -> Dict[str, str]:
+        self.refresh()
+        return self._prompts
+
+    @property
+    def version(self) -> str:
+        """Short content hash of the prompts file."""
+        self.refresh()
+        return self._version
+
+    @property
+    def system_prompt(self) -> str:
+        return self.prompts.get('system_prompt', DEFAULT_SYSTEM_PROMPT).strip()
+
+    def prefix_messages(self) -> List[Dict[str, str]]:
+        """Return the stable system + few-shot messages that start every request."""
+        self.refresh()
+        return [dict(message) for message in self._prefix]
+
+    def movie_messages(self, movie_name: str) -> List[Dict[str, str]]:
+        """Return the full message list for resolving a movie."""
+        self.refresh()
+        user_prompt = self._prompts['retrieve_movie_year'].format(movie=f"\"{movie_name}\"")
+        return [dict(message) for message in self._prefix] + [{"role": "user", "content": user_prompt}]
+
+    def refresh(self) -> bool:
+        """
+        Reload the file if it changed on disk.
+
+        An edit that fails validation is logged and the previous prompts are
+        kept; on the very first load the error is raised.
+
+        Returns:
+            True if the prompts were (re)loaded
+        """
+        stat = os.stat(self.file_path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        if signature == self._signature:
+            return False
+
+        with self._lock:
+            if signature == self._signature:
+                return False
+            try:
+                with open(self.file_path, 'rb') as file:
+                    raw = file.read()
+                prompts = yaml.safe_load(raw)
+                self._validate(prompts)
+            except (yaml.YAMLError, PromptError) as e:
+                if self._signature is None:
+                    logger.error(f"Failed to load prompts from {self.file_path}: {e}")
+                    raise
+                logger.error(f"Ignoring invalid edit to {self.file_path}, keeping previous prompts: {e}")
+                self._signature = signature
+                return False
+
+            self._prompts = prompts
+            self._version = hashlib.sha256(raw).hexdigest()[:12]
+            self._prefix = self._build_prefix(prompts)
+            self._signature = signature
+            self.reloads += 1
+            logger.debug(f"Loaded prompts from {self.file_path} (version {self._version})")
+            return True
+
+    def _validate(self, prompts: Any) -> None:
+        if not isinstance(prompts, dict):
+            raise PromptError("prompts file must contain a mapping of prompt names to templates")
+        for name in REQUIRED_PROMPTS:
+            if name not in prompts:
+                raise PromptError(f"missing required prompt '{name}'")
+        for name, template in prompts.items():
+            if not isinstance(template, str):
+                raise PromptError(f"prompt '{name}' must be a string")
+            try:
+                fields = template_fields(template)
+            except ValueError as e:
+                raise PromptError(f"prompt '{name}' is not a valid template: {e}") from e
+            expected = TEMPLATE_FIELDS.get(name, set())
+            if fields != expected:
+                raise PromptError(f"prompt '{name}' uses placeholders {sorted(fields)}, expected {sorted(expected)}")
+        for user_key, assistant_key in FEW_SHOT_PAIRS:
+            if (user_key in prompts) != (assistant_key in prompts):
+                raise PromptError(f"few-shot prompts '{user_key}' and '{assistant_key}' must be defined together")
+            if assistant_key in prompts:
+                try:
+                    example = json.loads(prompts[assistant_key].format())
+                except ValueError as e:
+                    raise PromptError(f"few-shot answer '{assistant_key}' is not valid JSON: {e}") from e
+                if not isinstance(example, dict) or set(example) != {'title', 'year'}:
+                    raise PromptError(f"few-shot answer '{assistant_key}' must have exactly 'title' and 'year'")
+
+    def _build_prefix(self, prompts: Dict[str, str]) -> Tuple[Dict[str, str], ...]:
+        system_prompt = prompts.get('system_prompt', DEFAULT_SYSTEM_PROMPT).strip()
+        messages = [{"role": "system", "content": system_prompt}]
+        for user_key, assistant_key in FEW_SHOT_PAIRS:
+            if user_key in prompts:
+                # Templates escape JSON braces; render them once
+                messages.append({"role": "user", "content": prompts[user_key].format()})
+                assistant = json.dumps(json.loads(prompts[assistant_key].format()))
+                messages.append({"role": "assistant", "content": assistant})
+        return tuple(messages)
@@ -0,0 +1,165 @@
+import re
+import sqlite3
+import threading
+import time
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+def normalize_query(query: str) -> str:
+    """Fold case, whitespace and punctuation so equivalent queries share an entry."""
+    return re.sub(r"\s+", " ", re.sub(r"[^\w\s]", " ", query.casefold())).strip()
+
+class ResolutionCache:
+    """
+    Durable LRU cache of validated movie resolutions.
+
+    Entries are keyed by (normalized query, model, prompt version), so
+    switching models or editing prompts.yaml never serves answers produced
+    by a different configuration. Lookups hit an in-memory tier first and
+    fall back to SQLite. Recency on disk is updated lazily: hits are
+    recorded in memory and their last_used stamps written in one batch on
+    the next put() or close(), before eviction runs.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_entries: int = 10000, memory_entries: int = 1024):
+        """
+        Args:
+            path: SQLite database file, or None for a memory-only cache
+            max_entries: Entries kept on disk before least-recently-used ones are evicted
+            memory_entries: Capacity of the in-memory tier
+        """
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self.hits = 0
+        self.misses = 0
+        self._memory: "OrderedDict[Tuple[str, str, str], Dict[str, Any]]" = OrderedDict()
+        # Keys hit since the last write, with the time of their latest hit
+        self._touched: Dict[Tuple[str, str, str], float] = {}
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS resolutions ("
+                "query TEXT NOT NULL, model TEXT NOT NULL, prompt_version TEXT NOT NULL, "
+                "title TEXT NOT NULL, year INTEGER NOT NULL, created REAL NOT NULL, last_used REAL NOT NULL, "
+                "PRIMARY KEY (query, model, prompt_version))"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS resolutions_last_used ON resolutions (last_used)")
+            self._db.commit()
+
+    def get(self, query: str, model: str, prompt_version: str) -> Optional[Dict[str, Any]]:
+        """Return the cached {title, year} for a query, or None on a miss."""
+        key = (normalize_query(query), model, prompt_version)
+        with self._lock:
+            movie_data = self._memory.get(key)
+            if movie_data is not None:
+                self._memory.move_to_end(key)
+                self._touch(key)
+                self.hits += 1
+                return dict(movie_data)
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT title, year FROM resolutions WHERE query = ? AND model = ? AND prompt_version = ?",
+                    key,
+                ).fetchone()
+                if row is not None:
+                    self._touch(key)
+                    movie_data = {"title": row[0], "year": row[1]}
+                    self._remember(key, movie_data)
+                    self.hits += 1
+                    return dict(movie_data)
+
+            self.misses += 1
+            return None
+
+    def put(self, query: str, model: str, prompt_version: str, movie_data: Dict[str, Any]) -> None:
+        """Store a validated resolution; results carrying an error are ignored."""
+        if "error" in movie_data or not movie_data.get("title"):
+            return
+        key = (normalize_query(query), model, prompt_version)
+        entry = {"title": movie_data["title"], "year": int(movie_data["year"])}
+        now = time.time()
+        with self._lock:
+            self._remember(key, entry)
+            self._touched.pop(key, None)
+            if self._db is not None:
+                self._write_touched()
+                self._db.execute(
+                    "INSERT OR REPLACE INTO resolutions "
+                    "(query, model, prompt_version, title, year, created, last_used) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (*key, entry["title"], entry["year"], now, now),
+                )
+                self._db.execute(
+                    "DELETE FROM resolutions WHERE rowid IN ("
+                    "SELECT rowid FROM resolutions ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+                self._db.commit()
+
+    def invalidate(self, keep_prompt_version: Optional[str] = None) -> int:
+        """
+        Drop cached resolutions.
+
+        Args:
+            keep_prompt_version: If given, only entries from other prompt versions are dropped
+
+        Returns:
+            Number of on-disk entries removed
+        """
+        with self._lock:
+            if keep_prompt_version is None:
+                self._memory.clear()
+                self._touched.clear()
+            else:
+                for key in [k for k in self._memory if k[2] != keep_prompt_version]:
+                    del self._memory[key]
+                for key in [k for k in self._touched if k[2] != keep_prompt_version]:
+                    del self._touched[key]
+            if self._db is None:
+                return 0
+            if keep_prompt_version is None:
+                cursor = self._db.execute("DELETE FROM resolutions")
+            else:
+                cursor = self._db.execute("DELETE FROM resolutions WHERE prompt_version != ?", (keep_prompt_version,))
+            self._db.commit()
+            return cursor.rowcount
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit/miss counters and the in-memory tier size."""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._memory)}
+
+    def close(self) -> None:
+        """Write pending recency updates and close the on-disk tier."""
+        with self._lock:
+            if self._db is not None:
+                self._write_touched()
+                self._db.commit()
+                self._db.close()
+                self._db = None
+
+    def _remember(self, key: Tuple[str, str, str], movie_data: Dict[str, Any]) -> None:
+        # Caller must hold self._lock
+        self._memory[key] = movie_data
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _touch(self, key: Tuple[str, str, str]) -> None:
+        # Caller must hold self._lock
+        if self._db is not None:
+            self._touched[key] = time.time()
+
+    def _write_touched(self) -> None:
+        # Caller must hold self._lock and commit
+        if self._touched:
+            self._db.executemany(
+                "UPDATE resolutions SET last_used = ? WHERE query = ? AND model = ? AND prompt_version = ?",
+                [(last_used, *key) for key, last_used in self._touched.items()],
+            )
+            self._touched.clear()
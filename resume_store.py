@@ -0,0 +1,97 @@
+import logging
+import os
+import re
+
+import libtorrent as lt
+
+logger = logging.getLogger(__name__)
+
+INFOHASH_PATTERN = re.compile(r'^([0-9a-f]{40}|[0-9a-f]{64})\.fastresume$')
+
+class ResumeStore:
+    """
+    Fast-resume data for torrents, one file per infohash
+
+    Each file holds libtorrent's bencoded resume data (with the info dict),
+    so a torrent reloaded from it has its metadata and its record of which
+    pieces are on disk, and comes back without a metadata fetch or a full
+    hash check. Files are replaced atomically, so a crash mid-write leaves
+    the previous copy intact.
+    """
+
+    def __init__(self, directory):
+        """
+        Args:
+            directory (str): Directory holding the .fastresume files (created if missing)
+        """
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def path_for(self, infohash):
+        return os.path.join(self.directory, f"{infohash.lower()}.fastresume")
+
+    def save(self, infohash, params):
+        """
+        Write a torrent's resume data atomically
+
+        Args:
+            infohash (str): Torrent the data belongs to
+            params: lt.add_torrent_params from a save_resume_data_alert
+
+        Returns:
+            bool: True if written
+        """
+        path = self.path_for(infohash)
+        tmp_path = f"{path}.tmp"
+        try:
+            data = lt.write_resume_data_buf(params)
+            with open(tmp_path, 'wb') as file:
+                file.write(data)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(tmp_path, path)
+            return True
+        except OSError as e:
+            logger.warning(f"Failed to save resume data to {path}: {e}")
+            return False
+
+    def load(self, infohash):
+        """
+        Read a torrent's resume data
+
+        Returns:
+            lt.add_torrent_params, or None if there is none or it is unreadable
+        """
+        path = self.path_for(infohash)
+        try:
+            with open(path, 'rb') as file:
+                return lt.read_resume_data(file.read())
+        except FileNotFoundError:
+            return None
+        except (OSError, RuntimeError) as e:
+            logger.warning(f"Ignoring unreadable resume data in {path}: {e}")
+            return None
+
+    def infohashes(self):
+        """Infohashes with stored resume data"""
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        return sorted(match.group(1) for match in map(INFOHASH_PATTERN.match, names) if match)
+
+    def load_all(self):
+        """Yield (infohash, add_torrent_params) for every readable entry"""
+        for infohash in self.infohashes():
+            params = self.load(infohash)
+            if params is not None:
+                yield infohash, params
+
+    def remove(self, infohash):
+        """Forget a torrent's resume data"""
+        try:
+            os.remove(self.path_for(infohash))
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"Failed to remove resume data for {infohash}: {e}")
@@ -0,0 +1,219 @@
+import re
+import time
+from dataclasses import dataclass, fields
+from email.utils import parsedate_to_datetime
+from functools import lru_cache
+from typing import NamedTuple
+
+import numpy as np
+
+# Release-name attributes, matched on dot/underscore/space separated tokens
+RESOLUTION_PATTERN = re.compile(r'(?<![a-z0-9])(2160|1080|720|576|480)[pi](?![a-z0-9])|(?<![a-z0-9])(4k|uhd)(?![a-z0-9])', re.I)
+CODEC_PATTERN = re.compile(r'(?<![a-z0-9])(x\.?26[45]|h\.?26[45]|hevc|avc|av1|xvid|divx)(?![a-z0-9])', re.I)
+SOURCE_PATTERN = re.compile(
+    r'(?<![a-z0-9])(remux|blu-?ray|bdrip|brrip|web-?dl|webrip|web|hdtv|dvdrip|dvd|hdrip|'
+    r'hdcam|cam(?:rip)?|telesync|ts|tc|telecine|screener|scr)(?![a-z0-9])', re.I)
+HDR_PATTERN = re.compile(r'(?<![a-z0-9])(hdr10\+?|hdr|dv|dovi|dolby\.?vision)(?![a-z0-9])', re.I)
+GROUP_PATTERN = re.compile(r'-([a-z0-9]+)(?:\.[a-z0-9]{2,4})?$', re.I)
+
+# Normalized source name for each alias matched by SOURCE_PATTERN
+SOURCE_ALIASES = {
+    'remux': 'remux', 'bluray': 'bluray', 'blu-ray': 'bluray', 'bdrip': 'bluray', 'brrip': 'bluray',
+    'web-dl': 'web-dl', 'webdl': 'web-dl', 'web': 'web-dl', 'webrip': 'webrip',
+    'hdtv': 'hdtv', 'dvdrip': 'dvd', 'dvd': 'dvd', 'hdrip': 'hdrip',
+    'hdcam': 'cam', 'cam': 'cam', 'camrip': 'cam', 'telesync': 'cam', 'ts': 'cam',
+    'tc': 'cam', 'telecine': 'cam', 'screener': 'screener', 'scr': 'screener',
+}
+
+# Quality of each attribute value on a -1..1 scale, multiplied by its weight
+RESOLUTION_SCORES = {2160: 0.8, 1080: 1.0, 720: 0.6, 576: 0.1, 480: 0.0, 0: 0.2}
+SOURCE_SCORES = {
+    'remux': 0.7, 'bluray': 1.0, 'web-dl': 0.9, 'webrip': 0.7, 'hdtv': 0.4, 'hdrip': 0.3,
+    'dvd': 0.2, 'screener': -0.6, 'cam': -1.0, '': 0.3,
+}
+CODEC_SCORES = {'x265': 1.0, 'av1': 1.0, 'x264': 0.8, 'xvid': 0.0, '': 0.5}
+
+# Typical video bitrate (bits/s) used to estimate the expected size of a release
+EXPECTED_BITRATES = {2160: 20_000_000, 1080: 8_000_000, 720: 4_000_000, 576: 2_000_000, 480: 1_500_000, 0: 6_000_000}
+
+class ReleaseInfo(NamedTuple):
+    """Attributes parsed from a release title"""
+    resolution: int
+    codec: str
+    source: str
+    hdr: bool
+    group: str
+
+@dataclass
+class ScoringWeights:
+    """Relative weight of each signal in a torrent's score"""
+    seeders: float = 1.0
+    seed_ratio: float = 0.5
+    size_fit: float = 1.0
+    age: float = 0.2
+    freeleech: float = 0.3
+    upload_factor: float = 0.1
+    resolution: float = 1.0
+    source: float = 1.5
+    codec: float = 0.3
+    hdr: float = 0.1
+
+    @classmethod
+    def from_dict(cls, values):
+        """Build weights from a mapping, ignoring unknown keys"""
+        names = {f.name for f in fields(cls)}
+        return cls(**{name: float(value) for name, value in values.items() if name in names})
+
+@lru_cache(maxsize=65536)
+def parse_release_name(title):
+    """
+    Parse resolution, codec, source, HDR and group from a release title
+
+    Results are memoized, since the same release names come back from many
+    indexers and query variants.
+
+    Args:
+        title (str): Release title, e.g. "Batman.Begins.2005.1080p.BluRay.x264-SPARKS"
+
+    Returns:
+        ReleaseInfo: Parsed attributes; unknown values are 0 / ''
+    """
+    resolution = 0
+    match = RESOLUTION_PATTERN.search(title)
+    if match:
+        resolution = int(match.group(1)) if match.group(1) else 2160
+
+    codec = ''
+    match = CODEC_PATTERN.search(title)
+    if match:
+        value = match.group(1).lower().replace('.', '')
+        if value in ('x265', 'h265', 'hevc'):
+            codec = 'x265'
+        elif value in ('x264', 'h264', 'avc'):
+            codec = 'x264'
+        elif value == 'av1':
+            codec = 'av1'
+        else:
+            codec = 'xvid'
+
+    # "REMUX" qualifies the disc source ("BluRay.REMUX"), so it wins wherever it appears
+    sources = [SOURCE_ALIASES.get(value.lower(), '') for value in SOURCE_PATTERN.findall(title)]
+    source = 'remux' if 'remux' in sources else (sources[0] if sources else '')
+
+    match = GROUP_PATTERN.search(title)
+    group = match.group(1) if match else ''
+
+    return ReleaseInfo(resolution, codec, source, HDR_PATTERN.search(title) is not None, group)
+
+@lru_cache(maxsize=4096)
+def parse_pub_date(value):
+    """Return a Torznab pubDate as a Unix timestamp, or NaN if unparseable"""
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError, IndexError):
+        return float('nan')
+
+def to_columns(results):
+    """
+    Convert search results into the columnar arrays consumed by score_columns
+
+    Args:
+        results (list): TorrentResult records
+
+    Returns:
+        dict: Column name -> NumPy array, all of length len(results)
+    """
+    count = len(results)
+    releases = [parse_release_name(result.title) for result in results]
+    return {
+        'seeders': np.fromiter((r.seeders for r in results), dtype=np.float64, count=count),
+        'leechers': np.fromiter((r.leechers for r in results), dtype=np.float64, count=count),
+        'size': np.fromiter((r.size for r in results), dtype=np.float64, count=count),
+        'published': np.fromiter((parse_pub_date(r.pub_date) for r in results), dtype=np.float64, count=count),
+        'download_factor': np.fromiter((r.download_factor for r in results), dtype=np.float64, count=count),
+        'upload_factor': np.fromiter((r.upload_factor for r in results), dtype=np.float64, count=count),
+        'resolution': np.fromiter((rel.resolution for rel in releases), dtype=np.int32, count=count),
+        'source_score': np.fromiter((SOURCE_SCORES.get(rel.source, 0.0) for rel in releases), dtype=np.float64, count=count),
+        'codec_score': np.fromiter((CODEC_SCORES.get(rel.codec, 0.0) for rel in releases), dtype=np.float64, count=count),
+        'hdr': np.fromiter((rel.hdr for rel in releases), dtype=np.float64, count=count),
+    }
+
+def _lookup(values, table):
+    """Vectorized dictionary lookup for small integer-keyed tables"""
+    keys = np.fromiter(table.keys(), dtype=values.dtype)
+    scores = np.fromiter(table.values(), dtype=np.float64)
+    order = np.argsort(keys)
+    keys, scores = keys[order], scores[order]
+    index = np.clip(np.searchsorted(keys, values), 0, len(keys) - 1)
+    default = table.get(0, 0.0)
+    return np.where(keys[index] == values, scores[index], default)
+
+def score_columns(columns, weights=None, runtime_minutes=120, now=None):
+    """
+    Score candidates in one vectorized pass
+
+    Args:
+        columns (dict): Arrays from to_columns
+        weights (ScoringWeights): Signal weights (default: ScoringWeights())
+        runtime_minutes (float): Expected runtime, used to judge whether sizes are plausible
+        now (float): Reference Unix time for release age (default: current time)
+
+    Returns:
+        numpy.ndarray: One score per candidate; higher is better
+    """
+    weights = weights or ScoringWeights()
+    now = time.time() if now is None else now
+
+    seeders = columns['seeders']
+    leechers = np.maximum(columns['leechers'], 0)
+    seeders_score = np.log1p(np.maximum(seeders, 0)) / np.log1p(10_000)
+    seed_ratio = seeders / (seeders + leechers + 1)
+
+    # Penalize sizes far from what the resolution and runtime imply, on a log scale
+    resolution = columns['resolution']
+    expected_size = _lookup(resolution, EXPECTED_BITRATES) * runtime_minutes * 60 / 8
+    size_fit = -np.abs(np.log2(np.maximum(columns['size'], 1) / expected_size))
+    size_fit = np.maximum(size_fit, -4) / 4
+
+    age_days = (now - columns['published']) / 86400
+    age_score = np.where(np.isnan(age_days), 0.0, -np.log1p(np.maximum(age_days, 0)) / np.log1p(3650))
+
+    freeleech = 1 - np.clip(columns['download_factor'], 0, 1)
+    upload = np.clip(columns['upload_factor'], 0, 2) - 1
+
+    return (
+        weights.seeders * seeders_score
+        + weights.seed_ratio * seed_ratio
+        + weights.size_fit * size_fit
+        + weights.age * age_score
+        + weights.freeleech * freeleech
+        + weights.upload_factor * upload
+        + weights.resolution * _lookup(resolution, RESOLUTION_SCORES)
+        + weights.source * columns['source_score']
+        + weights.codec * columns['codec_score']
+        + weights.hdr * columns['hdr']
+    )
+
+def score_results(results, weights=None, runtime_minutes=120, now=None):
+    """Score a list of TorrentResult records; see score_columns"""
+    if not results:
+        return np.empty(0)
+    return score_columns(to_columns(results), weights, runtime_minutes, now)
+
+def top_scored(results, k=5, weights=None, runtime_minutes=120, now=None):
+    """
+    Return the k best results by score
+
+    Uses argpartition so only the top k are fully sorted.
+
+    Returns:
+        list: (score, result) tuples, best first
+    """
+    results = list(results)
+    scores = score_results(results, weights, runtime_minutes, now)
+    if len(results) > k:
+        candidates = np.argpartition(-scores, k)[:k]
+    else:
+        candidates = np.arange(len(results))
+    order = candidates[np.argsort(-scores[candidates], kind='stable')]
+    return [(float(scores[i]), results[i]) for i in order]
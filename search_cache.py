@@ -0,0 +1,205 @@
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import astuple
+
+logger = logging.getLogger(__name__)
+
+def make_cache_key(query, year=None, limit=100, indexers="all"):
+    """
+    Build a normalized cache key for a search
+
+    Case and whitespace in the query are folded and the indexer set is
+    sorted, so equivalent searches share an entry.
+
+    Args:
+        query (str): Search query
+        year (int): Release year or None
+        limit (int): Maximum number of results
+        indexers (str): "all" or comma-separated indexer IDs
+
+    Returns:
+        str: Cache key
+    """
+    normalized_query = re.sub(r"\s+", " ", query).strip().lower()
+    indexer_set = ",".join(sorted({i.strip().lower() for i in indexers.split(",") if i.strip()}))
+    return json.dumps([normalized_query, int(year) if year else None, int(limit), indexer_set])
+
+class SearchCache:
+    """
+    Two-tier (in-memory LRU + SQLite) cache of search results with a TTL
+
+    Entries younger than `ttl` are served as fresh hits. Entries older than
+    that but younger than `stale_ttl` are served immediately while a
+    background refresh fetches current seeder/leecher counts. Anything older
+    is a miss.
+    """
+
+    def __init__(self, path=None, ttl=300, stale_ttl=3600, max_entries=256, record_type=None):
+        """
+        Args:
+            path (str): SQLite database file, or None for a memory-only cache
+            ttl (float): Seconds an entry is considered fresh
+            stale_ttl (float): Seconds an entry may be served while revalidating
+            max_entries (int): Capacity of the in-memory LRU tier
+            record_type: Callable rebuilding a result from its stored fields
+        """
+        self.ttl = ttl
+        self.stale_ttl = max(stale_ttl, ttl)
+        self.max_entries = max_entries
+        self.record_type = record_type
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS search_cache ("
+                "key TEXT PRIMARY KEY, created REAL NOT NULL, results TEXT NOT NULL)"
+            )
+            self._db.commit()
+
+    def stats(self):
+        """Return hit/miss counters and the in-memory tier size"""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'stale_hits': self.stale_hits,
+                'misses': self.misses,
+                'refreshes': self.refreshes,
+                'entries': len(self._memory),
+            }
+
+    def get(self, key):
+        """
+        Look up a cached entry in memory, then on disk
+
+        Returns:
+            tuple: (results, age_seconds), or None if absent or expired
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+            elif self._db is not None:
+                row = self._db.execute(
+                    "SELECT created, results FROM search_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    entry = (row[0], self._decode(row[1]))
+                    self._remember(key, entry)
+
+        if entry is None:
+            return None
+        created, results = entry
+        age = now - created
+        if age >= self.stale_ttl:
+            return None
+        return results, age
+
+    def put(self, key, results):
+        """Store results under key in both tiers"""
+        entry = (time.time(), list(results))
+        with self._lock:
+            self._remember(key, entry)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO search_cache (key, created, results) VALUES (?, ?, ?)",
+                    (key, entry[0], self._encode(entry[1])),
+                )
+                self._db.execute("DELETE FROM search_cache WHERE created < ?",
+                                 (entry[0] - self.stale_ttl,))
+                self._db.commit()
+
+    def get_or_fetch(self, key, fetch):
+        """
+        Return cached results for key, calling fetch() on a miss
+
+        Stale entries are returned immediately and refreshed in a background
+        thread. Exceptions from fetch() propagate on a miss and are logged
+        during a background refresh; failed fetches are never cached.
+
+        Args:
+            key (str): Cache key from make_cache_key
+            fetch: Zero-argument callable returning a list of results
+
+        Returns:
+            list: Search results
+        """
+        cached = self.get(key)
+        if cached is not None:
+            results, age = cached
+            if age < self.ttl:
+                with self._lock:
+                    self.hits += 1
+                return results
+            with self._lock:
+                self.stale_hits += 1
+            self._refresh_in_background(key, fetch)
+            return results
+
+        with self._lock:
+            self.misses += 1
+        results = fetch()
+        self.put(key, results)
+        return results
+
+    def clear(self):
+        """Drop every entry from both tiers"""
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM search_cache")
+                self._db.commit()
+
+    def close(self):
+        """Close the on-disk tier"""
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def _remember(self, key, entry):
+        # Caller must hold self._lock
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _refresh_in_background(self, key, fetch):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+            self.refreshes += 1
+
+        def refresh():
+            try:
+                self.put(key, fetch())
+            except Exception as e:
+                logger.warning(f"Background refresh of cached search failed: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=refresh, name="search-cache-refresh", daemon=True).start()
+
+    def _encode(self, results):
+        return json.dumps([astuple(result) for result in results])
+
+    def _decode(self, payload):
+        rows = json.loads(payload)
+        if self.record_type is None:
+            return rows
+        return [self.record_type(*row) for row in rows]
@@ -1,9 +1,25 @@
+import os
+import re
+import ast
+import sys
+import atexit
 import json
-import yaml
+import time
+import openai
+import asyncio
 import logging
 import argparse
-from openai import OpenAI
-from typing import Dict, Any, Optional
+import threading
+from openai import OpenAI, AsyncOpenAI
+from collections import Counter, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Any, Optional, List, Iterable, Iterator, AsyncIterator, Tuple
+from resolution_cache import ResolutionCache
+from prompt_registry import PromptRegistry
+from title_index import TitleIndex
+from llm_client import LLMClientPool
+from seer_metrics import JsonlTraceWriter, ResolutionTrace, SeerMetrics
 
 # Configure logging
 logging.basicConfig(
@@ -16,34 +32,512 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def load_prompts(file_path: str = 'prompts.yaml') -> Dict[str, str]:
-    """Load prompts from a YAML file."""
+DEFAULT_PROMPTS_PATH = 'prompts.yaml'
+DEFAULT_CACHE_PATH = 'seer_cache.sqlite3'
+
+# Structured output requested from the server: 'json_schema', 'json_object' or 'none'.
+# Servers that reject it are remembered and asked again without it.
+RESPONSE_FORMAT = 'json_schema'
+# A {title, year} answer is a few dozen tokens; leave headroom, not room for an essay
+MOVIE_MAX_TOKENS = 128
+# Stream completions and hang up as soon as a valid {title, year} object has arrived
+STREAM_COMPLETIONS = False
+
+MOVIE_JSON_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "title": {"type": "string"},
+        "year": {"type": "integer"},
+    },
+    "required": ["title", "year"],
+    "additionalProperties": False,
+}
+# Answer to the packed (several titles per completion) prompt
+MOVIE_BATCH_JSON_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "results": {"type": "array", "items": MOVIE_JSON_SCHEMA},
+    },
+    "required": ["results"],
+    "additionalProperties": False,
+}
+RESPONSE_SCHEMAS = {"movie": MOVIE_JSON_SCHEMA, "movies": MOVIE_BATCH_JSON_SCHEMA}
+
+FENCED_BLOCK_PATTERN = re.compile(r"```(?:json|javascript|python)?\s*(.*?)```", re.S | re.I)
+TITLE_FIELD_PATTERN = re.compile(r"""["']?title["']?\s*[:=]\s*(?:"((?:[^"\\]|\\.)*)"|'((?:[^'\\]|\\.)*)')""", re.I)
+YEAR_FIELD_PATTERN = re.compile(r"""["']?year["']?\s*[:=]\s*["']?(\d{4})""", re.I)
+
+_rejected_response_formats: set = set()
+# How each LLM answer was turned into {title, year}: 'direct', 'repaired', 'llm_fix' or 'failed';
+# 'title_index' counts queries answered by the offline index without the LLM
+_resolution_paths: Counter = Counter()
+
+# Recent streamed completions: seconds to first token / to a usable answer, and whether we hung up early
+_stream_timings: deque = deque(maxlen=1000)
+_resolution_cache: Optional[ResolutionCache] = None
+_title_index: Optional[TitleIndex] = None
+_cache_prompt_version: Optional[str] = None
+_prompt_registries: Dict[str, PromptRegistry] = {}
+_client_pools: Dict[Tuple[str, str], LLMClientPool] = {}
+_metrics = SeerMetrics()
+# Trace of the resolution running in the current thread or task, if any
+_current_trace: ContextVar[Optional[ResolutionTrace]] = ContextVar('seer_resolution_trace', default=None)
+_state_lock = threading.Lock()
+
+def configure_resolution_cache(path: Optional[str] = DEFAULT_CACHE_PATH, max_entries: int = 10000) -> ResolutionCache:
+    """Replace the shared resolution cache; a path of None keeps it in memory only."""
+    global _resolution_cache, _cache_prompt_version
+    with _state_lock:
+        if _resolution_cache is not None:
+            _resolution_cache.close()
+        _resolution_cache = ResolutionCache(path, max_entries=max_entries)
+        _cache_prompt_version = None
+        return _resolution_cache
+
+def get_resolution_cache() -> ResolutionCache:
+    """Return the shared resolution cache, creating the default one on first use."""
+    if _resolution_cache is None:
+        return configure_resolution_cache()
+    return _resolution_cache
+
+def configure_title_index(path: Optional[str], **kwargs: Any) -> Optional[TitleIndex]:
+    """Resolve confident title matches from an offline index (see title_index.py); None disables it."""
+    global _title_index
+    with _state_lock:
+        _title_index = TitleIndex(path, **kwargs) if path else None
+        return _title_index
+
+def lookup_title_index(movie_name: str) -> Optional[Dict[str, Any]]:
+    """Return {title, year} if the offline title index matches the query confidently."""
+    index = _title_index
+    if index is None:
+        return None
+    match = index.lookup(movie_name)
+    if match is None or not match.confident:
+        return None
+    record_resolution_path("title_index")
+    return {"title": match.title, "year": match.year}
+
+def get_prompt_registry(file_path: Optional[str] = None) -> PromptRegistry:
+    """Return the shared registry for a prompts file, loading it on first use."""
+    file_path = file_path or DEFAULT_PROMPTS_PATH
+    registry = _prompt_registries.get(file_path)
+    if registry is None:
+        with _state_lock:
+            registry = _prompt_registries.get(file_path)
+            if registry is None:
+                registry = _prompt_registries[file_path] = PromptRegistry(file_path)
+    return registry
+
+def prompt_version(file_path: Optional[str] = None) -> str:
+    """Return a short content hash of the prompts file, re-hashed only when it changes on disk."""
+    return get_prompt_registry(file_path).version
+
+def response_format_kwargs(mode: Optional[str] = None, schema: str = 'movie') -> Dict[str, Any]:
+    """Return the response_format request argument for a structured output mode and schema (see RESPONSE_SCHEMAS)."""
+    mode = mode or RESPONSE_FORMAT
+    if mode in _rejected_response_formats or mode == 'none':
+        return {}
+    if mode == 'json_schema':
+        return {"response_format": {
+            "type": "json_schema",
+            "json_schema": {"name": schema, "schema": RESPONSE_SCHEMAS[schema], "strict": True},
+        }}
+    if mode == 'json_object':
+        return {"response_format": {"type": "json_object"}}
+    raise ValueError(f"Unknown response format mode: {mode}")
+
+def create_movie_completion(client: OpenAI, model: str, messages: List[Dict[str, str]],
+                            purpose: str = 'resolve', schema: str = 'movie', **kwargs: Any) -> Any:
+    """
+    Request a completion, constrained to `schema` when the server supports it.
+    
+    Latency and token usage are recorded under `purpose` ('resolve', 'fix' or
+    'packed'); streamed completions are recorded when the stream finishes.
+    """
+    kwargs = {"model": model, "messages": messages, "temperature": 0.05, "n": 1, **kwargs}
+    start = time.perf_counter()
     try:
-        with open(file_path, 'r') as file:
-            return yaml.safe_load(file)
-    except (yaml.YAMLError, FileNotFoundError) as e:
-        logger.error(f"Failed to load prompts from {file_path}: {e}")
+        completion = _request_completion(client, kwargs, schema)
+    except Exception:
+        record_llm_call(model, purpose, start, ok=False)
         raise
+    if not kwargs.get("stream"):
+        record_llm_call(model, purpose, start, completion)
+    return completion
+
+def _request_completion(client: OpenAI, kwargs: Dict[str, Any], schema: str = 'movie') -> Any:
+    structured = response_format_kwargs(schema=schema)
+    if structured:
+        try:
+            return client.chat.completions.create(**kwargs, **structured)
+        except openai.BadRequestError as e:
+            logger.warning(f"Server rejected response_format '{RESPONSE_FORMAT}', continuing without it: {e}")
+            _rejected_response_formats.add(RESPONSE_FORMAT)
+    return client.chat.completions.create(**kwargs)
 
-def get_movie_info(movie_name: str, client: OpenAI, model: str) -> Dict[str, Any]:
-    """Get movie information using the LLM."""
+async def create_movie_completion_async(client: AsyncOpenAI, model: str, messages: List[Dict[str, str]],
+                                        purpose: str = 'resolve', schema: str = 'movie', **kwargs: Any) -> Any:
+    """Async counterpart of create_movie_completion."""
+    kwargs = {"model": model, "messages": messages, "temperature": 0.05, "n": 1, **kwargs}
+    start = time.perf_counter()
     try:
-        prompts = load_prompts()
+        completion = await _request_completion_async(client, kwargs, schema)
+    except Exception:
+        record_llm_call(model, purpose, start, ok=False)
+        raise
+    if not kwargs.get("stream"):
+        record_llm_call(model, purpose, start, completion)
+    return completion
+
+async def _request_completion_async(client: AsyncOpenAI, kwargs: Dict[str, Any], schema: str = 'movie') -> Any:
+    structured = response_format_kwargs(schema=schema)
+    if structured:
+        try:
+            return await client.chat.completions.create(**kwargs, **structured)
+        except openai.BadRequestError as e:
+            logger.warning(f"Server rejected response_format '{RESPONSE_FORMAT}', continuing without it: {e}")
+            _rejected_response_formats.add(RESPONSE_FORMAT)
+    return await client.chat.completions.create(**kwargs)
+
+def get_metrics() -> SeerMetrics:
+    """Return the shared metrics registry (Prometheus export, listeners, per-request traces)."""
+    return _metrics
+
+@contextmanager
+def trace_resolution(query: str, model: str, started: Optional[float] = None) -> Iterator[ResolutionTrace]:
+    """
+    Collect metrics for one query resolution into a ResolutionTrace.
+    
+    LLM calls made inside the block are attributed to the trace. It is
+    recorded on exit once finish() has been called; unfinished traces
+    (e.g. cache misses handed off elsewhere) are dropped.
+    """
+    start = time.perf_counter() if started is None else started
+    trace = ResolutionTrace(query=query, model=model, prompt_version=prompt_version())
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+        if trace.title is not None:
+            trace.seconds = time.perf_counter() - start
+            _metrics.record_resolution(trace)
+
+def _token_count(usage: Any, name: str) -> Optional[int]:
+    value = getattr(usage, name, None)
+    return value if isinstance(value, int) else None
+
+def record_llm_call(model: str, purpose: str, start: float, completion: Any = None, ok: bool = True,
+                    completion_tokens: Optional[int] = None, ttft: Optional[float] = None) -> None:
+    """Record latency and token usage of one completion request, started at perf_counter() `start`."""
+    seconds = time.perf_counter() - start
+    usage = getattr(completion, "usage", None)
+    prompt_tokens = _token_count(usage, "prompt_tokens")
+    if completion_tokens is None:
+        completion_tokens = _token_count(usage, "completion_tokens")
+    trace = _current_trace.get()
+    version = trace.prompt_version if trace is not None else prompt_version()
+    _metrics.record_llm_call(model, version, purpose, seconds, prompt_tokens, completion_tokens, ok)
+    if trace is not None:
+        trace.llm_calls += 1
+        trace.llm_seconds += seconds
+        trace.prompt_tokens += prompt_tokens or 0
+        trace.completion_tokens += completion_tokens or 0
+        if ttft is not None and trace.ttft is None:
+            trace.ttft = ttft
+
+def record_cache_lookup(hit: bool, model: str, version: str) -> None:
+    """Count a resolution cache lookup for the cache effectiveness metrics."""
+    _metrics.inc('seer_cache_lookups_total', result='hit' if hit else 'miss', model=model, prompt_version=version)
+
+def record_resolution_path(path: str) -> None:
+    """Count how an answer was obtained (see get_resolution_path_stats)."""
+    with _state_lock:
+        _resolution_paths[path] += 1
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.path = path
+
+def get_resolution_path_stats() -> Dict[str, Any]:
+    """Return counts of title-index hits and of direct, locally repaired, LLM-fixed and failed answers."""
+    with _state_lock:
+        counts = dict(_resolution_paths)
+    total = sum(count for path, count in counts.items() if path != "title_index")
+    counts["llm_fix_rate"] = counts.get("llm_fix", 0) / total if total else 0.0
+    return counts
+
+def _object_candidates(text: str) -> List[str]:
+    """Return every balanced {...} span in text, outermost first."""
+    spans = []
+    starts = []
+    quote = None
+    escaped = False
+    for i, char in enumerate(text):
+        if quote:
+            if escaped:
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == quote:
+                quote = None
+        elif char in '"\'' and starts:
+            quote = char
+        elif char == '{':
+            starts.append(i)
+        elif char == '}' and starts:
+            start = starts.pop()
+            spans.append((start, i + 1))
+    spans.sort(key=lambda span: (span[0], -span[1]))
+    return [text[start:end] for start, end in spans]
+
+def _as_movie(value: Any) -> Optional[Dict[str, Any]]:
+    if not isinstance(value, dict) or not all(key in value for key in ['title', 'year']):
+        return None
+    try:
+        return {"title": str(value["title"]).strip(), "year": int(value["year"])}
+    except (TypeError, ValueError):
+        return None
+
+def repair_movie_json(content: str) -> Optional[Dict[str, Any]]:
+    """
+    Recover {title, year} from a malformed response without another LLM call.
+    
+    Handles answers wrapped in code fences, followed or preceded by prose, or
+    written with single quotes / Python literals.
+    
+    Returns:
+        The repaired movie data, or None if nothing usable was found
+    """
+    if not content:
+        return None
+    texts = FENCED_BLOCK_PATTERN.findall(content) + [content]
+    for text in texts:
+        for candidate in _object_candidates(text):
+            for parse in (json.loads, ast.literal_eval):
+                try:
+                    movie_data = _as_movie(parse(candidate))
+                except (ValueError, SyntaxError, MemoryError, RecursionError, TypeError):
+                    continue
+                if movie_data is not None:
+                    return movie_data
+    
+    # Last resort: key/value pairs anywhere in the text
+    title_match = TITLE_FIELD_PATTERN.search(content)
+    year_match = YEAR_FIELD_PATTERN.search(content)
+    if title_match and year_match:
+        title = title_match.group(1) if title_match.group(1) is not None else title_match.group(2)
+        return {"title": title.strip(), "year": int(year_match.group(1))}
+    return None
+
+class MovieStreamParser:
+    """
+    Scan streamed completion text for the first complete {...} object holding
+    a title and year.
+    
+    Brace depth and string state are carried across chunks, so each character
+    is examined once however the text is split.
+    """
+    
+    def __init__(self):
+        self.text = ""
+        self.chunks = 0
+        self.leading_text = False
+        self._starts: List[int] = []
+        self._quote: Optional[str] = None
+        self._escaped = False
+    
+    def feed(self, chunk: str) -> Optional[Dict[str, Any]]:
+        """Add streamed text; returns the movie data once a valid object has closed, else None."""
+        offset = len(self.text)
+        self.text += chunk
+        self.chunks += 1
+        for i in range(offset, len(self.text)):
+            char = self.text[i]
+            if self._quote:
+                if self._escaped:
+                    self._escaped = False
+                elif char == '\\':
+                    self._escaped = True
+                elif char == self._quote:
+                    self._quote = None
+            elif char in '"\'' and self._starts:
+                self._quote = char
+            elif char == '{':
+                if not self._starts and self.text[:i].strip():
+                    self.leading_text = True
+                self._starts.append(i)
+            elif char == '}' and self._starts:
+                candidate = self.text[self._starts.pop():i + 1]
+                for parse in (json.loads, ast.literal_eval):
+                    try:
+                        movie_data = _as_movie(parse(candidate))
+                    except (ValueError, SyntaxError, MemoryError, RecursionError, TypeError):
+                        continue
+                    if movie_data is not None:
+                        return movie_data
+        return None
+
+def record_stream_timing(ttft: Optional[float], answer: Optional[float], total: float, early: bool) -> None:
+    """Remember the timings of one streamed completion (see get_stream_stats)."""
+    with _state_lock:
+        _stream_timings.append((ttft, answer, total, early))
+
+def _percentile(values: List[float], fraction: float) -> Optional[float]:
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+def get_stream_stats() -> Dict[str, Any]:
+    """Return time-to-first-token and time-to-answer percentiles (seconds) over recent streamed completions."""
+    with _state_lock:
+        timings = list(_stream_timings)
+    ttfts = [ttft for ttft, _, _, _ in timings if ttft is not None]
+    answers = [answer for _, answer, _, _ in timings if answer is not None]
+    return {
+        "streams": len(timings),
+        "stopped_early": sum(early for _, _, _, early in timings),
+        "ttft_p50": _percentile(ttfts, 0.5),
+        "ttft_p95": _percentile(ttfts, 0.95),
+        "answer_p50": _percentile(answers, 0.5),
+        "answer_p95": _percentile(answers, 0.95),
+    }
+
+def _chunk_text(chunk: Any) -> str:
+    if not chunk.choices:
+        return ""
+    return chunk.choices[0].delta.content or ""
+
+def _finish_stream(parser: MovieStreamParser, movie_data: Optional[Dict[str, Any]], model: str, start: float,
+                   ttft: Optional[float], early: bool) -> Tuple[str, Optional[Dict[str, Any]]]:
+    total = time.perf_counter() - start
+    answer = total if movie_data is not None else None
+    record_stream_timing(ttft, answer, total, early)
+    # Usage is only reported at the end of a stream; servers send about one token per chunk
+    record_llm_call(model, 'resolve', start, completion_tokens=parser.chunks, ttft=ttft)
+    if ttft is not None:
+        logger.info(f"Streamed completion: first token after {ttft * 1000:.0f} ms, "
+                    + (f"answer after {answer * 1000:.0f} ms" if answer is not None else "no valid answer")
+                    + (" (stopped early)" if early else ""))
+    if movie_data is not None:
+        record_resolution_path('repaired' if parser.leading_text else 'direct')
+    return parser.text, movie_data
+
+def stream_movie_completion(client: OpenAI, model: str, messages: List[Dict[str, str]],
+                            **kwargs: Any) -> Tuple[str, Optional[Dict[str, Any]]]:
+    """
+    Stream a completion and stop generation once a valid {title, year} object has arrived.
+    
+    Closing the stream drops the connection, which makes llama.cpp-style
+    servers stop generating and free the slot.
+    
+    Returns:
+        (text received, movie data or None if no valid object arrived)
+    """
+    start = time.perf_counter()
+    ttft = None
+    parser = MovieStreamParser()
+    movie_data = None
+    stream = create_movie_completion(client, model, messages, stream=True, **kwargs)
+    try:
+        for chunk in stream:
+            text = _chunk_text(chunk)
+            if not text:
+                continue
+            if ttft is None:
+                ttft = time.perf_counter() - start
+            movie_data = parser.feed(text)
+            if movie_data is not None:
+                break
+    finally:
+        stream.close()
+    return _finish_stream(parser, movie_data, model, start, ttft, early=movie_data is not None)
+
+async def stream_movie_completion_async(client: AsyncOpenAI, model: str, messages: List[Dict[str, str]],
+                                        **kwargs: Any) -> Tuple[str, Optional[Dict[str, Any]]]:
+    """Async counterpart of stream_movie_completion."""
+    start = time.perf_counter()
+    ttft = None
+    parser = MovieStreamParser()
+    movie_data = None
+    stream = await create_movie_completion_async(client, model, messages, stream=True, **kwargs)
+    try:
+        async for chunk in stream:
+            text = _chunk_text(chunk)
+            if not text:
+                continue
+            if ttft is None:
+                ttft = time.perf_counter() - start
+            movie_data = parser.feed(text)
+            if movie_data is not None:
+                break
+    finally:
+        await stream.close()
+    return _finish_stream(parser, movie_data, model, start, ttft, early=movie_data is not None)
+
+def prepare_resolution_cache() -> tuple:
+    """Return the shared cache and current prompt version, invalidating entries from older prompts."""
+    global _cache_prompt_version
+    cache = get_resolution_cache()
+    version = prompt_version()
+    if version != _cache_prompt_version:
+        # prompts.yaml changed (or first lookup): answers from other prompt versions are stale
+        removed = cache.invalidate(keep_prompt_version=version)
+        if removed:
+            logger.info(f"Prompts changed, invalidated {removed} cached resolutions")
+        _cache_prompt_version = version
+    return cache, version
+
+def get_movie_info(movie_name: str, client: OpenAI, model: str, use_cache: bool = True) -> Dict[str, Any]:
+    """Get movie information from the title index or resolution cache when possible, otherwise using the LLM."""
+    with trace_resolution(movie_name, model) as trace:
+        movie_data = _get_movie_info(movie_name, client, model, use_cache, trace)
+        trace.finish(movie_data)
+        return movie_data
+
+def _get_movie_info(movie_name: str, client: OpenAI, model: str, use_cache: bool,
+                    trace: ResolutionTrace) -> Dict[str, Any]:
+    try:
+        movie_data = lookup_title_index(movie_name)
+        if movie_data is not None:
+            logger.info(f"Resolved '{movie_name}' from title index: {movie_data}")
+            return movie_data
         
-        movie_year_retrieval_prompt = prompts['retrieve_movie_year'].format(movie=f"\"{movie_name}\"")
+        if not use_cache:
+            return resolve_with_llm(movie_name, client, model)
+        
+        cache, version = prepare_resolution_cache()
+        movie_data = cache.get(movie_name, model, version)
+        record_cache_lookup(movie_data is not None, model, version)
+        if movie_data is not None:
+            logger.info(f"Resolved '{movie_name}' from cache: {movie_data}")
+            trace.path = "cache"
+            return movie_data
+        
+        movie_data = resolve_with_llm(movie_name, client, model)
+        cache.put(movie_name, model, version, movie_data)
+        return movie_data
+    
+    except Exception as e:
+        logger.error(f"Error in get_movie_info: {e}", exc_info=True)
+        return {"title": "Unknown", "year": 0, "error": str(e)}
+
+def resolve_with_llm(movie_name: str, client: OpenAI, model: str) -> Dict[str, Any]:
+    """Get movie information using the LLM, bypassing the resolution cache."""
+    try:
+        # System prompt and few-shot example form a byte-stable prefix across requests
+        messages = get_prompt_registry().movie_messages(movie_name)
         
         logger.info(f"Requesting information for movie: {movie_name}")
         
-        completion = client.chat.completions.create(
-            model=model,
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant that always outputs in valid JSON format. The only valid keys for the JSON output are 'title' and 'year'."},
-                {"role": "user", "content": movie_year_retrieval_prompt},
-            ],
-            temperature=0.05,
-            max_tokens=1000,
-            n=1
-        )
+        if STREAM_COMPLETIONS:
+            json_content, movie_data = stream_movie_completion(client, model, messages, max_tokens=MOVIE_MAX_TOKENS)
+            if movie_data is not None:
+                return movie_data
+            return parse_and_validate_json(json_content, client, model)
+        
+        completion = create_movie_completion(client, model, messages, max_tokens=MOVIE_MAX_TOKENS)
         
         json_content = completion.choices[0].message.content
         logger.debug(f"Raw response: {json_content}")
@@ -51,59 +545,75 @@ def get_movie_info(movie_name: str, client: OpenAI, model: str) -> Dict[str, Any
         return parse_and_validate_json(json_content, client, model)
         
     except Exception as e:
-        logger.error(f"Error in get_movie_info: {e}", exc_info=True)
+        logger.error(f"Error in resolve_with_llm: {e}", exc_info=True)
         return {"title": "Unknown", "year": 0, "error": str(e)}
 
+def load_movie_json(json_content: str) -> Dict[str, Any]:
+    """Parse a model response, raising ValueError unless it is a JSON object with 'title' and an integer 'year'."""
+    movie_data = json.loads(json_content)
+    
+    # Check if the dictionary has the required keys
+    if not isinstance(movie_data, dict) or not all(key in movie_data for key in ['title', 'year']):
+        logger.warning(f"JSON missing required keys: {movie_data}")
+        raise ValueError("JSON is missing required keys 'title' and/or 'year'")
+    validated = _as_movie(movie_data)
+    if validated is None:
+        logger.warning(f"JSON year is not a number: {movie_data}")
+        raise ValueError("JSON 'year' is not an integer")
+    return validated
+
+def fix_messages(json_content: str) -> List[Dict[str, str]]:
+    """Build the request asking the model to reformat an invalid response."""
+    fix_prompt = f"""
+        The following is an AI response that should be in JSON format with 'title' and 'year' keys, but it's not correctly formatted:
+        
+        {json_content}
+        
+        Please convert this to a valid JSON with only 'title' and 'year' keys.
+        """
+    return [
+        {"role": "system", "content": get_prompt_registry().system_prompt},
+        {"role": "user", "content": fix_prompt},
+    ]
+
 def parse_and_validate_json(json_content: str, client: OpenAI, model: str) -> Dict[str, Any]:
     """Parse and validate JSON content, attempt to fix if invalid."""
     try:
-        movie_data = json.loads(json_content)
-        
-        # Check if the dictionary has the required keys
-        if not all(key in movie_data for key in ['title', 'year']):
-            logger.warning(f"JSON missing required keys: {movie_data}")
-            raise ValueError("JSON is missing required keys 'title' and/or 'year'")
-        
+        movie_data = load_movie_json(json_content)
         logger.info("Successfully parsed valid JSON response")
+        record_resolution_path('direct')
         return movie_data
     
-    except (json.JSONDecodeError, ValueError) as e:
+    except (json.JSONDecodeError, ValueError, TypeError) as e:
         logger.warning(f"Error with original response: {e}")
-        logger.info("Attempting to fix the response format...")
-        
-        return attempt_json_fix(json_content, client, model)
+    
+    movie_data = repair_movie_json(json_content)
+    if movie_data is not None:
+        logger.info(f"Repaired response locally: {movie_data}")
+        record_resolution_path('repaired')
+        return movie_data
+    
+    logger.info("Attempting to fix the response format...")
+    movie_data = attempt_json_fix(json_content, client, model)
+    record_resolution_path('failed' if 'error' in movie_data else 'llm_fix')
+    return movie_data
 
 def attempt_json_fix(json_content: str, client: OpenAI, model: str) -> Dict[str, Any]:
     """Attempt to fix invalid JSON by sending a new request to the LLM."""
     try:
-        fix_prompt = f"""
-        The following is an AI response that should be in JSON format with 'title' and 'year' keys, but it's not correctly formatted:
-        
-        {json_content}
-        
-        Please convert this to a valid JSON with only 'title' and 'year' keys.
-        """
-        
         logger.info("Sending fix request to model")
-        fix_completion = client.chat.completions.create(
-            model=model,
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant that always outputs in valid JSON format. The only valid keys for the JSON output are 'title' and 'year'."},
-                {"role": "user", "content": fix_prompt},
-            ],
-            temperature=0.05,
-        )
+        fix_completion = create_movie_completion(client, model, fix_messages(json_content), purpose='fix',
+                                                 max_tokens=MOVIE_MAX_TOKENS)
         
         fixed_json_content = fix_completion.choices[0].message.content
         logger.debug(f"Fixed response: {fixed_json_content}")
         
-        movie_data = json.loads(fixed_json_content)
-        
-        # Check if the fixed dictionary has the required keys
-        if not all(key in movie_data for key in ['title', 'year']):
-            logger.error("Even after fixing, JSON is missing required keys")
+        try:
+            movie_data = load_movie_json(fixed_json_content)
+        except (json.JSONDecodeError, ValueError, TypeError) as e:
+            logger.error(f"Even after fixing, JSON is invalid: {e}")
             logger.debug(f"Raw fixed content: {fixed_json_content}")
-            return {"title": "Unknown", "year": 0, "error": "Missing required keys after fix attempt"}
+            return {"title": "Unknown", "year": 0, "error": f"Invalid JSON after fix attempt: {e}"}
         
         logger.info("Successfully fixed the JSON format")
         return movie_data
@@ -112,12 +622,223 @@ def attempt_json_fix(json_content: str, client: OpenAI, model: str) -> Dict[str,
         logger.error(f"Error in fix attempt: {e}", exc_info=True)
         return {"title": "Unknown", "year": 0, "error": str(e)}
 
+async def resolve_with_llm_async(movie_name: str, client: AsyncOpenAI, model: str) -> Dict[str, Any]:
+    """Async counterpart of resolve_with_llm, including local repair and the fix-up request."""
+    try:
+        logger.info(f"Requesting information for movie: {movie_name}")
+        messages = get_prompt_registry().movie_messages(movie_name)
+        if STREAM_COMPLETIONS:
+            json_content, movie_data = await stream_movie_completion_async(
+                client, model, messages, max_tokens=MOVIE_MAX_TOKENS)
+            if movie_data is not None:
+                return movie_data
+        else:
+            completion = await create_movie_completion_async(client, model, messages, max_tokens=MOVIE_MAX_TOKENS)
+            json_content = completion.choices[0].message.content
+        logger.debug(f"Raw response: {json_content}")
+        
+        try:
+            movie_data = load_movie_json(json_content)
+            record_resolution_path('direct')
+            return movie_data
+        except (ValueError, TypeError) as e:
+            logger.warning(f"Error with original response: {e}")
+        
+        movie_data = repair_movie_json(json_content)
+        if movie_data is not None:
+            logger.info(f"Repaired response locally: {movie_data}")
+            record_resolution_path('repaired')
+            return movie_data
+    except Exception as e:
+        logger.error(f"Error resolving '{movie_name}': {e}", exc_info=True)
+        return {"title": "Unknown", "year": 0, "error": str(e)}
+    
+    try:
+        logger.info("Sending fix request to model")
+        fix_completion = await create_movie_completion_async(
+            client, model, fix_messages(json_content), purpose='fix', max_tokens=MOVIE_MAX_TOKENS)
+        movie_data = load_movie_json(fix_completion.choices[0].message.content)
+        record_resolution_path('llm_fix')
+        return movie_data
+    except Exception as e:
+        logger.error(f"Error in fix attempt for '{movie_name}': {e}", exc_info=True)
+        record_resolution_path('failed')
+        return {"title": "Unknown", "year": 0, "error": str(e)}
+
+async def resolve_packed_async(movie_names: List[str], client: AsyncOpenAI, model: str) -> List[Dict[str, Any]]:
+    """
+    Resolve several titles with one structured completion.
+    
+    Titles whose answer is missing or malformed are resolved individually.
+    """
+    answers: List[Any] = []
+    start = time.perf_counter()
+    try:
+        prompt = get_prompt_registry().prompts['retrieve_movie_year_batch'].format(
+            movies="\n".join(f"{i}. \"{name}\"" for i, name in enumerate(movie_names, 1)))
+        logger.info(f"Requesting information for {len(movie_names)} movies in one completion")
+        messages = [
+            {"role": "system", "content": get_prompt_registry().system_prompt},
+            {"role": "user", "content": prompt},
+        ]
+        completion = await create_movie_completion_async(client, model, messages, purpose='packed', schema='movies',
+                                                         max_tokens=64 * len(movie_names))
+        packed = json.loads(completion.choices[0].message.content)
+        answers = packed.get('results', []) if isinstance(packed, dict) else packed
+    except Exception as e:
+        logger.warning(f"Packed resolution failed, falling back to one request per title: {e}")
+    
+    results = []
+    for i, name in enumerate(movie_names):
+        # Same validation as a single answer: a title and a year that is an integer
+        packed_data = _as_movie(answers[i]) if i < len(answers) else None
+        if packed_data is not None:
+            with trace_resolution(name, model, started=start) as trace:
+                record_resolution_path('packed')
+                movie_data = packed_data
+                trace.finish(movie_data)
+        else:
+            with trace_resolution(name, model) as trace:
+                movie_data = await resolve_with_llm_async(name, client, model)
+                trace.finish(movie_data)
+        results.append(movie_data)
+    return results
+
+async def resolve_many_async(movie_names: Iterable[str], client: AsyncOpenAI, model: str,
+                             concurrency: int = 8, pack_size: int = 1,
+                             use_cache: bool = True) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Resolve many titles with bounded concurrency, yielding results as they finish.
+    
+    Args:
+        movie_names: Queries to resolve
+        client: Async OpenAI-compatible client
+        model: Model to use for inference
+        concurrency: Maximum completions in flight; match the server's parallel slots
+        pack_size: Titles packed into one structured completion (1 disables packing)
+        use_cache: Answer from, and populate, the resolution cache
+    
+    Yields:
+        Dicts with 'query', 'index' (position in the input), 'title', 'year' and optionally 'error'
+    """
+    cache, version = prepare_resolution_cache() if use_cache else (None, None)
+    pending = []
+    for index, name in enumerate(movie_names):
+        with trace_resolution(name, model) as trace:
+            cached = lookup_title_index(name)
+            if cached is None and cache is not None:
+                cached = cache.get(name, model, version)
+                record_cache_lookup(cached is not None, model, version)
+                if cached is not None:
+                    trace.path = "cache"
+            if cached is not None:
+                trace.finish(cached)
+        if cached is not None:
+            yield {"query": name, "index": index, **cached}
+        else:
+            pending.append((index, name))
+    
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    pack_size = max(1, pack_size)
+    
+    async def run(batch):
+        async with semaphore:
+            names = [name for _, name in batch]
+            if len(batch) == 1:
+                with trace_resolution(names[0], model) as trace:
+                    answers = [await resolve_with_llm_async(names[0], client, model)]
+                    trace.finish(answers[0])
+            else:
+                answers = await resolve_packed_async(names, client, model)
+        results = []
+        for (index, name), movie_data in zip(batch, answers):
+            if cache is not None:
+                cache.put(name, model, version, movie_data)
+            results.append({"query": name, "index": index, **movie_data})
+        return results
+    
+    tasks = [asyncio.ensure_future(run(pending[i:i + pack_size])) for i in range(0, len(pending), pack_size)]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            for result in await finished:
+                yield result
+    finally:
+        for task in tasks:
+            task.cancel()
+
+def resolve_many(movie_names: Iterable[str], model: str, base_url: str = "http://localhost:8000/v1",
+                 api_key: str = "lm-studio", concurrency: int = 8, pack_size: int = 1,
+                 use_cache: bool = True) -> List[Dict[str, Any]]:
+    """Resolve many titles concurrently; returns results in input order."""
+    async def collect():
+        client = setup_async_client(base_url, api_key)
+        try:
+            return [result async for result in resolve_many_async(
+                movie_names, client, model, concurrency, pack_size, use_cache)]
+        finally:
+            await client.close()
+    
+    results = asyncio.run(collect())
+    return sorted(results, key=lambda result: result["index"])
+
+def configure_client_pool(base_url: str, api_key: str, **options: Any) -> LLMClientPool:
+    """Replace the shared client pool for a server; options are passed to LLMClientPool."""
+    with _state_lock:
+        previous = _client_pools.get((base_url, api_key))
+        pool = _client_pools[(base_url, api_key)] = LLMClientPool(base_url, api_key, **options)
+    if previous is not None:
+        previous.close()
+    return pool
+
+def get_client_pool(base_url: str = "http://localhost:8000/v1", api_key: str = "lm-studio") -> LLMClientPool:
+    """Return the shared client pool for a server, creating one with default settings on first use."""
+    pool = _client_pools.get((base_url, api_key))
+    if pool is None:
+        with _state_lock:
+            pool = _client_pools.get((base_url, api_key))
+            if pool is None:
+                pool = _client_pools[(base_url, api_key)] = LLMClientPool(base_url, api_key)
+    return pool
+
+def get_client_pool_stats() -> List[Dict[str, Any]]:
+    """Return request counters and circuit breaker state for every client pool."""
+    with _state_lock:
+        pools = list(_client_pools.values())
+    return [pool.stats() for pool in pools]
+
 def setup_client(base_url: str = "http://localhost:8000/v1", api_key: str = "lm-studio") -> OpenAI:
-    """Set up and return an OpenAI client."""
-    return OpenAI(base_url=base_url, api_key=api_key)
+    """Return the shared, keep-alive OpenAI client for a server, with retries and a circuit breaker."""
+    return get_client_pool(base_url, api_key).client
+
+def setup_async_client(base_url: str = "http://localhost:8000/v1", api_key: str = "lm-studio") -> AsyncOpenAI:
+    """Return a new async OpenAI client sharing the server's retry policy and circuit breaker."""
+    return get_client_pool(base_url, api_key).async_client()
+
+async def run_batch(lines: Iterable[str], client: AsyncOpenAI, model: str, concurrency: int,
+                    pack_size: int, use_cache: bool, output=None) -> List[Dict[str, Any]]:
+    """Resolve one title per non-empty line, writing a JSON line per result as it finishes."""
+    output = output or sys.stdout
+    titles = [line.strip() for line in lines if line.strip()]
+    results = []
+    async for result in resolve_many_async(titles, client, model, concurrency, pack_size, use_cache):
+        output.write(json.dumps(result) + "\n")
+        output.flush()
+        results.append(result)
+    return results
+
+def write_metrics_file(path: str) -> None:
+    """Write the current metrics in Prometheus text format (e.g. for node_exporter's textfile collector)."""
+    tmp_path = f"{path}.tmp"
+    try:
+        with open(tmp_path, 'w') as file:
+            file.write(_metrics.prometheus_text())
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.warning(f"Failed to write metrics to {path}: {e}")
 
 def main():
     """Main function to run the movie info retrieval."""
+    global RESPONSE_FORMAT, STREAM_COMPLETIONS
     try:
         # Set up argument parser
         parser = argparse.ArgumentParser(description='Get movie information using an LLM.')
@@ -129,6 +850,31 @@ def main():
                             help='Base URL for the OpenAI API')
         parser.add_argument('--api-key', default="lm-studio",
                             help='API key for the OpenAI API')
+        parser.add_argument('--timeout', type=float, default=60.0,
+                            help='Per-request timeout in seconds (default: 60)')
+        parser.add_argument('--max-retries', type=int, default=3,
+                            help='Retries for timeouts, dropped connections and overload (default: 3)')
+        parser.add_argument('--cache-path', default=DEFAULT_CACHE_PATH,
+                            help='SQLite file caching resolved titles')
+        parser.add_argument('--no-cache', action='store_true',
+                            help='Always ask the LLM, bypassing the resolution cache')
+        parser.add_argument('--title-index', metavar='DIR',
+                            help='Offline title index (built with title_index.py) consulted before the LLM')
+        parser.add_argument('--response-format', choices=['json_schema', 'json_object', 'none'],
+                            default=RESPONSE_FORMAT,
+                            help='Structured output mode requested from the server (default: json_schema)')
+        parser.add_argument('--stream', action='store_true',
+                            help='Stream completions and stop generating once a valid answer has arrived')
+        parser.add_argument('--batch', metavar='FILE',
+                            help="Resolve one title per line from FILE ('-' for stdin), printing JSON lines")
+        parser.add_argument('--concurrency', type=int, default=8,
+                            help='Completions in flight in batch mode (default: 8)')
+        parser.add_argument('--pack', type=int, default=1,
+                            help='Titles packed into one completion in batch mode (default: 1)')
+        parser.add_argument('--metrics-file', metavar='FILE',
+                            help='Write metrics in Prometheus text format to FILE on exit')
+        parser.add_argument('--trace-file', metavar='FILE',
+                            help='Append a JSON line per resolution (tokens, latency, path) to FILE')
         parser.add_argument('--debug', action='store_true',
                             help='Enable debug logging')
         
@@ -140,13 +886,30 @@ def main():
             for handler in logger.handlers:
                 handler.setLevel(logging.DEBUG)
         
+        RESPONSE_FORMAT = args.response_format
+        STREAM_COMPLETIONS = args.stream
+        
+        configure_client_pool(args.base_url, args.api_key, timeout=args.timeout, max_retries=args.max_retries)
+        if not args.no_cache:
+            configure_resolution_cache(args.cache_path)
+        if args.title_index:
+            configure_title_index(args.title_index)
+        
+        if args.trace_file:
+            _metrics.add_listener(JsonlTraceWriter(args.trace_file))
+        if args.metrics_file:
+            atexit.register(write_metrics_file, args.metrics_file)
+        
+        if args.batch:
+            return main_batch(args)
+        
         logger.info(f"Starting movie info retrieval for: {args.movie_title}")
         
         # Initialize OpenAI client
         client = setup_client(args.base_url, args.api_key)
         
         # Get movie info
-        movie_data = get_movie_info(args.movie_title, client, args.model)
+        movie_data = get_movie_info(args.movie_title, client, args.model, use_cache=not args.no_cache)
         
         # Display results
         logger.info(f"Parsed dictionary: {movie_data}")
@@ -155,6 +918,10 @@ def main():
         
         if 'error' in movie_data:
             logger.warning(f"Process completed with errors: {movie_data['error']}")
+        logger.debug(f"Resolution paths: {get_resolution_path_stats()}")
+        logger.debug(f"Client pools: {get_client_pool_stats()}")
+        if args.stream:
+            logger.debug(f"Streaming timings: {get_stream_stats()}")
         
         return movie_data
         
@@ -163,5 +930,23 @@ def main():
         print("An error occurred. Check the logs for details.")
         return {"title": "Unknown", "year": 0, "error": str(e)}
 
+def main_batch(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    """Batch mode: resolve titles from a file or stdin, streaming JSON lines to stdout."""
+    async def run():
+        client = setup_async_client(args.base_url, args.api_key)
+        try:
+            if args.batch == '-':
+                lines = sys.stdin.readlines()
+            else:
+                with open(args.batch, 'r') as file:
+                    lines = file.readlines()
+            logger.info(f"Resolving {len(lines)} lines from {args.batch} "
+                        f"(concurrency={args.concurrency}, pack={args.pack})")
+            return await run_batch(lines, client, args.model, args.concurrency, args.pack, not args.no_cache)
+        finally:
+            await client.close()
+    
+    return asyncio.run(run())
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
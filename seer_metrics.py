@@ -0,0 +1,225 @@
+import json
+import time
+import logging
+import threading
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the histogram buckets; the last one catches everything
+LATENCY_BUCKETS = (0.001, 0.005, 0.025, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, float('inf'))
+TOKEN_BUCKETS = (8, 16, 32, 64, 128, 256, 512, 1024, 2048, float('inf'))
+
+METRICS = {
+    # name: (type, help, histogram buckets)
+    'seer_resolutions_total': ('counter', 'Query resolutions by how they were answered', None),
+    'seer_resolution_seconds': ('histogram', 'End-to-end time to resolve a query', LATENCY_BUCKETS),
+    'seer_cache_lookups_total': ('counter', 'Resolution cache lookups by result', None),
+    'seer_llm_requests_total': ('counter', 'Completion requests by purpose and outcome', None),
+    'seer_llm_request_seconds': ('histogram', 'Completion request latency', LATENCY_BUCKETS),
+    'seer_prompt_tokens_total': ('counter', 'Prompt tokens sent, as reported by the server', None),
+    'seer_completion_tokens_total': ('counter', 'Completion tokens generated', None),
+    'seer_completion_tokens': ('histogram', 'Completion tokens per request', TOKEN_BUCKETS),
+    'seer_time_to_first_token_seconds': ('histogram', 'Time to first streamed token', LATENCY_BUCKETS),
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+@dataclass
+class ResolutionTrace:
+    """What it took to resolve one query; emitted to listeners when the resolution finishes."""
+    query: str
+    model: str
+    prompt_version: str = ''
+    path: str = ''
+    title: Optional[str] = None
+    year: Optional[int] = None
+    error: Optional[str] = None
+    llm_calls: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    llm_seconds: float = 0.0
+    ttft: Optional[float] = None
+    seconds: float = 0.0
+    started: float = field(default_factory=time.time)
+
+    def finish(self, movie_data: Dict[str, Any]) -> None:
+        """Record the answer; only finished traces are reported."""
+        self.title = movie_data.get('title')
+        self.year = movie_data.get('year')
+        self.error = movie_data.get('error')
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus style."""
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.sum += value
+        self.count += 1
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+def _labels(labels: Dict[str, Any]) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+def _format_labels(labels: Labels, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = labels + extra
+    if not pairs:
+        return ''
+    escaped = (value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + '}'
+
+def _format_bound(bound: float) -> str:
+    return '+Inf' if bound == float('inf') else repr(float(bound))
+
+class SeerMetrics:
+    """
+    Counters and histograms for seer, labelled by model and prompt version.
+
+    Export with prometheus_text(), read with value()/snapshot(), or register
+    listeners that receive every finished ResolutionTrace as a dict (e.g. a
+    JsonlTraceWriter for per-request traces).
+    """
+
+    def __init__(self):
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        self._histograms: Dict[Tuple[str, Labels], Histogram] = {}
+        self._listeners: List[Callable[[Dict[str, Any]], None]] = []
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1.0, **labels: Any) -> None:
+        key = (name, _labels(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, **labels: Any) -> None:
+        key = (name, _labels(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(METRICS[name][2])
+            histogram.observe(value)
+
+    def value(self, name: str, **labels: Any) -> float:
+        """Sum of a counter (or a histogram's count) over series matching the given labels."""
+        wanted = set(_labels(labels))
+        with self._lock:
+            total = sum(count for (metric, series), count in self._counters.items()
+                        if metric == name and wanted <= set(series))
+            total += sum(histogram.count for (metric, series), histogram in self._histograms.items()
+                         if metric == name and wanted <= set(series))
+        return total
+
+    def add_listener(self, callback: Callable[[Dict[str, Any]], None]) -> None:
+        """Call callback with every finished resolution trace."""
+        with self._lock:
+            self._listeners.append(callback)
+
+    def remove_listener(self, callback: Callable[[Dict[str, Any]], None]) -> None:
+        with self._lock:
+            if callback in self._listeners:
+                self._listeners.remove(callback)
+
+    def record_llm_call(self, model: str, prompt_version: str, purpose: str, seconds: float,
+                        prompt_tokens: Optional[int] = None, completion_tokens: Optional[int] = None,
+                        ok: bool = True) -> None:
+        """Record one completion request ('resolve', 'fix' or 'packed')."""
+        labels = {'model': model, 'prompt_version': prompt_version}
+        self.inc('seer_llm_requests_total', purpose=purpose, outcome='ok' if ok else 'error', **labels)
+        self.observe('seer_llm_request_seconds', seconds, purpose=purpose, **labels)
+        if prompt_tokens is not None:
+            self.inc('seer_prompt_tokens_total', prompt_tokens, **labels)
+        if completion_tokens is not None:
+            self.record_completion_tokens(model, prompt_version, completion_tokens)
+
+    def record_completion_tokens(self, model: str, prompt_version: str, tokens: int) -> None:
+        self.inc('seer_completion_tokens_total', tokens, model=model, prompt_version=prompt_version)
+        self.observe('seer_completion_tokens', tokens, model=model, prompt_version=prompt_version)
+
+    def record_resolution(self, trace: ResolutionTrace) -> None:
+        """Record a finished resolution and pass its trace to the listeners."""
+        labels = {'model': trace.model, 'prompt_version': trace.prompt_version}
+        self.inc('seer_resolutions_total', path=trace.path or 'failed', **labels)
+        self.observe('seer_resolution_seconds', trace.seconds, path=trace.path or 'failed', **labels)
+        if trace.ttft is not None:
+            self.observe('seer_time_to_first_token_seconds', trace.ttft, **labels)
+        with self._lock:
+            listeners = list(self._listeners)
+        if listeners:
+            record = asdict(trace)
+            for listener in listeners:
+                try:
+                    listener(record)
+                except Exception as e:
+                    logger.warning(f"Metrics listener {listener!r} failed: {e}")
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return every series as plain data."""
+        with self._lock:
+            counters = [{'name': name, 'labels': dict(labels), 'value': value}
+                        for (name, labels), value in sorted(self._counters.items())]
+            histograms = [{'name': name, 'labels': dict(labels), 'count': histogram.count, 'sum': histogram.sum,
+                           'buckets': dict(zip(map(_format_bound, histogram.buckets), histogram.counts))}
+                          for (name, labels), histogram in sorted(self._histograms.items(), key=lambda item: item[0])]
+        return {'counters': counters, 'histograms': histograms}
+
+    def prometheus_text(self) -> str:
+        """Render all series in the Prometheus text exposition format."""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(((key, (list(h.counts), h.sum, h.count, h.buckets))
+                                 for key, h in self._histograms.items()), key=lambda item: item[0])
+        lines = []
+        for name, (kind, help_text, _) in METRICS.items():
+            if kind == 'counter':
+                series = [(labels, value) for (metric, labels), value in counters if metric == name]
+            else:
+                series = [(labels, data) for (metric, labels), data in histograms if metric == name]
+            if not series:
+                continue
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, data in series:
+                if kind == 'counter':
+                    lines.append(f"{name}{_format_labels(labels)} {data:g}")
+                    continue
+                counts, total, count, buckets = data
+                cumulative = 0
+                for bound, bucket_count in zip(buckets, counts):
+                    cumulative += bucket_count
+                    lines.append(f"{name}_bucket{_format_labels(labels, (('le', _format_bound(bound)),))} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {total:g}")
+                lines.append(f"{name}_count{_format_labels(labels)} {count}")
+        return '\n'.join(lines) + '\n' if lines else ''
+
+    def reset(self) -> None:
+        """Drop all series (listeners are kept)."""
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+class JsonlTraceWriter:
+    """Metrics listener appending each resolution trace to a JSON lines file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def __call__(self, record: Dict[str, Any]) -> None:
+        line = json.dumps(record, ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + '\n')
+            self._file.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
@@ -0,0 +1,745 @@
+import atexit
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+
+import libtorrent as lt
+
+# Alert categories the alert loop consumes: status (state updates, metadata, completion), errors,
+# piece_progress (finished pieces) and storage (file priorities, flushes, resume data)
+ALERT_MASK = (lt.alert.category_t.error_notification | lt.alert.category_t.status_notification
+              | lt.alert.category_t.piece_progress_notification | lt.alert.category_t.storage_notification)
+
+DEFAULT_SETTINGS = {
+    'enable_dht': True,
+    'enable_lsd': True,
+    'enable_upnp': True,
+    'enable_natpmp': True,
+    'alert_mask': ALERT_MASK,
+}
+
+def _preset(preset, **overrides):
+    # libtorrent's presets also size the torrent queue, which the SessionManager arguments control
+    settings = {name: value for name, value in preset.items() if not name.startswith('active_')}
+    settings.update(overrides)
+    return settings
+
+# Named settings profiles, applied on top of DEFAULT_SETTINGS
+PROFILES = {
+    # libtorrent's defaults
+    'default': {},
+    # Small devices: few connections, one disk thread, small buffers and queues
+    'low-memory': _preset(
+        lt.min_memory_usage(),
+        connections_limit=50,
+        max_queued_disk_bytes=1024 * 1024,
+    ),
+    # Dedicated seeding boxes: thousands of peers, deep disk and send queues, upload to the fastest peers
+    'seedbox': _preset(
+        lt.high_performance_seed(),
+        choking_algorithm=int(lt.choking_algorithm_t.rate_based_choker),
+        seed_choking_algorithm=int(lt.seed_choking_algorithm_t.fastest_upload),
+        hashing_threads=4,
+    ),
+    # Playback while downloading: short request queues so piece deadlines take effect quickly,
+    # quick timeouts so a slow peer does not hold up the next piece, and redundant end-game requests
+    'streaming': {
+        'request_queue_time': 1,
+        'piece_timeout': 5,
+        'request_timeout': 10,
+        'peer_connect_timeout': 5,
+        'strict_end_game_mode': False,
+        'prioritize_partial_pieces': True,
+        'connection_speed': 100,
+        'choking_algorithm': int(lt.choking_algorithm_t.rate_based_choker),
+    },
+}
+
+def profile_settings(name):
+    """
+    Settings of a named profile
+
+    Raises:
+        ValueError: If there is no such profile
+    """
+    try:
+        return dict(PROFILES[name])
+    except KeyError:
+        raise ValueError(f"Unknown settings profile {name!r} (choose from {', '.join(PROFILES)})") from None
+
+STATE_NAMES = ['queued', 'checking', 'downloading metadata', 'downloading', 'finished', 'seeding',
+               'allocating', 'checking resume data']
+
+class TorrentLimitError(RuntimeError):
+    """Raised when a torrent cannot be hosted or queued because every slot is taken"""
+
+def infohash_hex(info_hashes):
+    """Hex key for an info_hash_t: the v1 (SHA-1) hash when present, else the v2 hash"""
+    return str(info_hashes.v1) if info_hashes.has_v1() else str(info_hashes.v2)
+
+def state_name(state):
+    """Human-readable name of a torrent_status.state value"""
+    state = int(state)
+    return STATE_NAMES[state] if 0 <= state < len(STATE_NAMES) else 'unknown'
+
+FINISHED_STATES = (lt.torrent_status.finished, lt.torrent_status.seeding)
+
+class ManagedTorrent:
+    """A torrent hosted (or waiting to be hosted) by a SessionManager"""
+
+    def __init__(self, infohash, params, save_path):
+        self.infohash = infohash
+        self.params = params
+        self.save_path = save_path
+        self.handle = None
+        self.added_time = time.time()
+        # Latest status from a state_update_alert (None until the first update)
+        self.last_status = None
+        self.error = None
+        # FileManifest of the torrent's files, built on first use once its metadata is in
+        self.manifest = None
+        self.admitted = threading.Event()
+        self.metadata_ready = threading.Event()
+        self.finished = threading.Event()
+        # Notified whenever a piece of this torrent passes its hash check or reaches the disk
+        self.pieces_changed = threading.Condition()
+        # Pieces pass their hash check before libtorrent has written them out, so each one
+        # records a sequence number and counts as on disk once a later flush has completed
+        self.piece_seq = 0
+        self.piece_completed = {}
+        self.flushed_seq = 0
+        self.pending_flushes = deque()
+
+    def on_disk(self, piece):
+        """True if a downloaded piece can be read from its file (pieces not downloaded are not checked)"""
+        return self.piece_completed.get(piece, 0) <= self.flushed_seq
+
+    @property
+    def pending(self):
+        """True while the torrent is still in the admission queue"""
+        return self.handle is None
+
+class SessionManager:
+    """
+    One long-lived libtorrent session hosting many torrents
+
+    DHT, peer and connection state are kept across torrents instead of being
+    rebuilt per download. Torrents are auto-managed, so libtorrent's queue
+    keeps at most `active_downloads` downloading and `active_seeds` seeding;
+    the rest wait queued inside the session. Beyond `max_torrents` hosted
+    torrents, new ones wait in an admission queue (up to `max_pending`) and
+    are added as slots free up.
+
+    Events come from a single alert loop thread (start(), or started by the
+    first wait_for_metadata/wait_until_finished that has to block): metadata,
+    completion and errors are handled as their alerts fire, and progress for
+    every torrent arrives in one batched state_update_alert per
+    `update_interval`. Listeners registered with subscribe() are called on
+    that thread as `callback(event, torrent)`, with event one of 'metadata',
+    'progress', 'piece', 'file_priorities', 'finished' or 'error'.
+
+    With a ResumeStore, every torrent it holds is added back on startup,
+    resume data of changed torrents is saved every `save_interval` seconds
+    by the alert loop, and close() saves all of it before returning, so a
+    restart skips the metadata fetch and the full hash check. With a
+    MetadataStore, metadata is saved as it arrives and torrents added again
+    later start with it instead of waiting on the DHT.
+    """
+
+    def __init__(self, settings=None, profile='default', active_downloads=3, active_seeds=5, max_torrents=200, max_pending=1000,
+                 update_interval=1.0, resume_store=None, save_interval=300.0, metadata_store=None):
+        """
+        Args:
+            settings (dict): libtorrent settings overriding DEFAULT_SETTINGS and the profile
+            profile (str): Name of the settings profile in PROFILES
+            active_downloads (int): Torrents downloading at once; the rest are queued
+            active_seeds (int): Torrents seeding at once
+            max_torrents (int): Torrents hosted by the session, active or queued
+            max_pending (int): Torrents waiting in the admission queue
+            update_interval (float): Seconds between batched progress updates
+            resume_store (ResumeStore): Where resume data is saved and restored from (None keeps none)
+            save_interval (float): Seconds between periodic saves of changed torrents' resume data
+            metadata_store (MetadataStore): Where fetched metadata is cached by infohash (None keeps none)
+        """
+        self.max_torrents = max_torrents
+        self.max_pending = max_pending
+        self.update_interval = update_interval
+        self.resume_store = resume_store
+        self.save_interval = save_interval
+        self.metadata_store = metadata_store
+        session_settings = dict(DEFAULT_SETTINGS)
+        session_settings.update(profile_settings(profile))
+        session_settings.update({
+            'active_downloads': active_downloads,
+            'active_seeds': active_seeds,
+            'active_limit': max(active_downloads + active_seeds, 1),
+        })
+        session_settings.update(settings or {})
+        self.session = lt.session(session_settings)
+        self._torrents = OrderedDict()
+        self._by_handle = {}
+        self._pending = deque()
+        self._lock = threading.RLock()
+        self._listeners = []
+        self._thread = None
+        self._stopping = threading.Event()
+        self._next_update = 0.0
+        self._next_save = time.monotonic() + save_interval
+        # Latest session_stats_alert counters, by metric name
+        self.session_stats = {}
+        self._stats_seq = 0
+        self._stats_ready = threading.Condition()
+        # Number of save_resume_data() requests whose alert has not arrived yet
+        self._saves_pending = 0
+        self._saves_done = threading.Condition()
+        self._alert_handlers = {
+            lt.state_update_alert: self._on_state_update,
+            lt.metadata_received_alert: self._on_metadata_received,
+            lt.piece_finished_alert: self._on_piece_finished,
+            lt.file_prio_alert: self._on_file_priorities,
+            lt.cache_flushed_alert: self._on_cache_flushed,
+            lt.torrent_finished_alert: self._on_torrent_finished,
+            lt.torrent_error_alert: self._on_torrent_error,
+            lt.metadata_failed_alert: self._on_torrent_error,
+            lt.save_resume_data_alert: self._on_resume_data,
+            lt.save_resume_data_failed_alert: self._on_resume_data_failed,
+            lt.session_stats_alert: self._on_session_stats,
+        }
+        if resume_store is not None:
+            self.restore()
+
+    def add(self, source, save_path="./downloads", paused=False, files_wanted=True, queued=True):
+        """
+        Add a torrent, or queue it for admission if the session is full
+
+        Adding a torrent that is already hosted or queued returns its key.
+
+        Args:
+            source: Magnet link, or lt.add_torrent_params
+            save_path (str): Directory the torrent's files are saved under
+            paused (bool): Add without starting; resume() starts it
+            files_wanted (bool): False fetches metadata only, leaving every file at priority 0
+                until the caller picks what to download (e.g. a TorrentStream)
+            queued (bool): False starts the torrent right away, outside the active download limits
+
+        Returns:
+            str: Infohash (hex) identifying the torrent
+
+        Raises:
+            TorrentLimitError: If both the session and the admission queue are full
+        """
+        params = lt.parse_magnet_uri(source) if isinstance(source, str) else source
+        params.save_path = save_path
+        if paused:
+            params.flags = (params.flags | lt.torrent_flags.paused) & ~lt.torrent_flags.auto_managed
+        if not files_wanted:
+            params.flags |= lt.torrent_flags.default_dont_download
+        if not queued and not paused:
+            params.flags &= ~(lt.torrent_flags.auto_managed | lt.torrent_flags.paused)
+        infohash = infohash_hex(params.info_hashes).lower()
+        if params.ti is None and self.metadata_store is not None:
+            # Seen before: start with the cached metadata instead of asking the swarm again
+            params.ti = self.metadata_store.load(infohash)
+
+        with self._lock:
+            if infohash in self._torrents:
+                return infohash
+            hosted = sum(1 for torrent in self._torrents.values() if not torrent.pending)
+            if hosted >= self.max_torrents and len(self._pending) >= self.max_pending:
+                raise TorrentLimitError(f"Session full ({hosted} torrents, {len(self._pending)} pending)")
+
+            torrent = ManagedTorrent(infohash, params, save_path)
+            self._torrents[infohash] = torrent
+            if hosted < self.max_torrents:
+                self._admit(torrent)
+            else:
+                self._pending.append(infohash)
+        return infohash
+
+    def get(self, infohash):
+        """
+        Return the ManagedTorrent for an infohash
+
+        Raises:
+            KeyError: If the torrent is not hosted or queued
+        """
+        with self._lock:
+            return self._torrents[infohash.lower()]
+
+    def handle(self, infohash):
+        """Return the torrent handle, or None while the torrent is in the admission queue"""
+        return self.get(infohash).handle
+
+    def status(self, infohash):
+        """
+        Inspect a torrent
+
+        Returns:
+            dict: Name, state, progress, rates and peer counts of the torrent
+        """
+        torrent = self.get(infohash)
+        if torrent.pending:
+            with self._lock:
+                position = list(self._pending).index(torrent.infohash)
+            return {
+                'infohash': torrent.infohash,
+                'name': torrent.params.name,
+                'state': 'pending',
+                'pending_position': position,
+                'save_path': torrent.save_path,
+            }
+        return self._describe(torrent, torrent.handle.status())
+
+    def describe(self, infohash):
+        """
+        Inspect a torrent from its latest batched update, querying it only if there is none yet
+
+        Returns:
+            dict: Same fields as status()
+        """
+        torrent = self.get(infohash)
+        if torrent.last_status is None:
+            return self.status(infohash)
+        return self._describe(torrent, torrent.last_status)
+
+    def torrents(self):
+        """
+        Return the status of every hosted and pending torrent
+
+        Uses the latest batched update where there is one instead of querying
+        each torrent.
+        """
+        with self._lock:
+            torrents = list(self._torrents.values())
+        return [self._describe(torrent, torrent.last_status) if torrent.last_status is not None
+                else self.status(torrent.infohash) for torrent in torrents]
+
+    def hosted_torrents(self):
+        """Return the ManagedTorrents added to the session (those still in the admission queue are left out)"""
+        with self._lock:
+            return [torrent for torrent in self._torrents.values() if not torrent.pending]
+
+    def wait_for_metadata(self, infohash, timeout=None):
+        """
+        Block until the torrent's metadata has been received
+
+        Args:
+            infohash (str): Torrent to wait for
+            timeout (float): Seconds to wait at most (None waits indefinitely)
+
+        Returns:
+            bool: True once metadata is available, False on timeout or torrent error
+        """
+        torrent = self.get(infohash)
+        return self._wait(torrent, torrent.metadata_ready, lambda status: status.has_metadata, timeout)
+
+    def wait_until_finished(self, infohash, timeout=None):
+        """
+        Block until every wanted piece of the torrent has been downloaded
+
+        Returns:
+            bool: True once finished, False on timeout or torrent error
+        """
+        torrent = self.get(infohash)
+        return self._wait(torrent, torrent.finished, lambda status: status.state in FINISHED_STATES, timeout)
+
+    def flush(self, infohash, timeout=None):
+        """
+        Block until every piece downloaded so far has been written to the torrent's files
+
+        Must not be called from a listener (it waits for the alert loop).
+
+        Returns:
+            bool: True once flushed, False on timeout, torrent error or while the torrent is in the admission queue
+        """
+        torrent = self.get(infohash)
+        if torrent.pending:
+            return False
+        deadline = None if timeout is None else time.monotonic() + timeout
+        # Before taking pieces_changed: start() takes self._lock, which remove() holds while notifying
+        self.start()
+        with torrent.pieces_changed:
+            target = torrent.piece_seq
+            if torrent.flushed_seq >= target:
+                return True
+            if not torrent.pending_flushes or torrent.pending_flushes[-1] < target:
+                torrent.pending_flushes.append(target)
+                torrent.handle.flush_cache()
+            while torrent.flushed_seq < target:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if torrent.error is not None or (remaining is not None and remaining <= 0):
+                    return False
+                torrent.pieces_changed.wait(remaining)
+        return True
+
+    def prefetch(self, sources, timeout=60.0, save_path="./downloads"):
+        """
+        Fetch the metadata of several torrents in parallel without downloading any of their files
+
+        Every torrent is fetched at once, outside the active download limits,
+        then removed again unless it was already hosted. With a metadata
+        store the metadata stays cached, so adding the chosen torrent later
+        starts immediately.
+
+        Args:
+            sources (list): Magnet links (or lt.add_torrent_params)
+            timeout (float): Seconds to wait for all of them
+            save_path (str): Save path the torrents are added with (nothing is written to it)
+
+        Returns:
+            dict: Infohash -> lt.torrent_info, or None for torrents whose metadata did not arrive in time
+        """
+        with self._lock:
+            known = set(self._torrents)
+            infohashes = [self.add(source, save_path, files_wanted=False, queued=False) for source in sources]
+        deadline = time.monotonic() + timeout
+        results = {}
+        try:
+            for infohash in infohashes:
+                remaining = max(0.0, deadline - time.monotonic())
+                if self.wait_for_metadata(infohash, timeout=remaining):
+                    results[infohash] = self.handle(infohash).torrent_file()
+                else:
+                    results[infohash] = None
+        finally:
+            for infohash in infohashes:
+                if infohash not in known:
+                    self.remove(infohash)
+        return results
+
+    def restore(self):
+        """
+        Add back every torrent in the resume store that is not hosted yet
+
+        Torrents come back with their metadata, save path, priorities and
+        record of downloaded pieces, so libtorrent only checks that the files
+        are still there instead of hashing them again.
+
+        Returns:
+            list: Infohashes of the restored torrents
+        """
+        restored = []
+        for infohash, params in self.resume_store.load_all():
+            try:
+                restored.append(self.add(params, params.save_path))
+            except TorrentLimitError:
+                print(f"Session full, not restoring {infohash}")
+                break
+        return restored
+
+    def save_resume_data(self, only_changed=True):
+        """
+        Ask libtorrent for the resume data of every hosted torrent; the alert loop writes it to the store
+
+        Args:
+            only_changed (bool): Skip torrents whose state has not changed since their last save
+
+        Returns:
+            int: Number of torrents asked
+        """
+        if self.resume_store is None:
+            return 0
+        with self._lock:
+            handles = [torrent.handle for torrent in self._torrents.values() if not torrent.pending]
+        flags = lt.torrent_handle.flush_disk_cache | lt.torrent_handle.save_info_dict
+        requested = 0
+        for handle in handles:
+            if not handle.is_valid() or (only_changed and not handle.need_save_resume_data()):
+                continue
+            with self._saves_done:
+                self._saves_pending += 1
+            handle.save_resume_data(flags)
+            requested += 1
+        return requested
+
+    def save_all(self, timeout=30.0):
+        """
+        Save the resume data of every hosted torrent and wait until it is written
+
+        Must not be called from a listener (it waits for the alert loop).
+
+        Returns:
+            bool: True once every requested save has been written or has failed, False on timeout
+        """
+        if self.save_resume_data(only_changed=False) == 0:
+            return True
+        self.start()
+        with self._saves_done:
+            return self._saves_done.wait_for(lambda: self._saves_pending == 0, timeout)
+
+    def request_session_stats(self, timeout=None):
+        """
+        Ask libtorrent for its session counters and wait for them
+
+        Must not be called from a listener (it waits for the alert loop).
+
+        Returns:
+            dict: Metric name (e.g. 'disk.queued_disk_jobs') -> value, or None on timeout
+        """
+        with self._stats_ready:
+            seq = self._stats_seq
+            self.session.post_session_stats()
+            self.start()
+            if not self._stats_ready.wait_for(lambda: self._stats_seq > seq, timeout):
+                return None
+            return self.session_stats
+
+    def subscribe(self, callback):
+        """Call callback(event, torrent) for every torrent event"""
+        with self._lock:
+            self._listeners.append(callback)
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            if callback in self._listeners:
+                self._listeners.remove(callback)
+
+    @property
+    def running(self):
+        """True while the alert loop thread is running"""
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Start the alert loop thread if it is not already running"""
+        with self._lock:
+            if self.running:
+                return
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name="session-alerts", daemon=True)
+            self._thread.start()
+            # A thread still inside libtorrent at interpreter exit aborts the process
+            atexit.register(self.stop)
+
+    def stop(self):
+        """Stop the alert loop thread"""
+        atexit.unregister(self.stop)
+        self._stopping.set()
+        thread, self._thread = self._thread, None
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+
+    def process_alerts(self, timeout=0.0):
+        """
+        Handle the alerts posted so far, waiting up to timeout seconds for the first one
+
+        Requests a batched progress update whenever update_interval has passed.
+        Called in a loop by the alert thread; call it directly to drive the
+        session from your own loop instead.
+
+        Returns:
+            int: Number of alerts handled
+        """
+        now = time.monotonic()
+        if now >= self._next_update:
+            self._next_update = now + self.update_interval
+            self.session.post_torrent_updates()
+        if self.resume_store is not None and now >= self._next_save:
+            self._next_save = now + self.save_interval
+            self.save_resume_data()
+        timeout = max(0.0, min(timeout, self._next_update - now))
+        if self.session.wait_for_alert(int(timeout * 1000)) is None:
+            return 0
+        alerts = self.session.pop_alerts()
+        for alert in alerts:
+            handler = self._alert_handlers.get(type(alert))
+            if handler is not None:
+                handler(alert)
+        return len(alerts)
+
+    def pause(self, infohash):
+        """Pause a torrent and take it out of the automatic queue"""
+        handle = self.handle(infohash)
+        if handle is not None:
+            handle.unset_flags(lt.torrent_flags.auto_managed)
+            handle.pause()
+
+    def resume(self, infohash):
+        """Hand a paused torrent back to the automatic queue"""
+        handle = self.handle(infohash)
+        if handle is not None:
+            handle.set_flags(lt.torrent_flags.auto_managed)
+            handle.resume()
+
+    def remove(self, infohash, delete_files=False):
+        """
+        Remove a torrent, admitting the next pending one, and forget its resume data
+
+        Args:
+            infohash (str): Torrent to remove
+            delete_files (bool): Also delete its downloaded files
+        """
+        with self._lock:
+            torrent = self._torrents.pop(infohash.lower(), None)
+            if torrent is None:
+                return
+            if self.resume_store is not None:
+                self.resume_store.remove(torrent.infohash)
+            # Wake anyone still waiting on the torrent
+            torrent.error = torrent.error or "Torrent removed"
+            for event in (torrent.admitted, torrent.metadata_ready, torrent.finished):
+                event.set()
+            with torrent.pieces_changed:
+                torrent.pieces_changed.notify_all()
+            if torrent.pending:
+                self._pending.remove(torrent.infohash)
+                return
+            options = lt.session.delete_files if delete_files else 0
+            self._by_handle.pop(torrent.handle, None)
+            self.session.remove_torrent(torrent.handle, options)
+            while self._pending:
+                hosted = sum(1 for t in self._torrents.values() if not t.pending)
+                if hosted >= self.max_torrents:
+                    break
+                self._admit(self._torrents[self._pending.popleft()])
+
+    def close(self, timeout=30.0):
+        """
+        Pause the session, save every torrent's resume data and stop the alert loop
+
+        Args:
+            timeout (float): Seconds to wait for the resume data to be written
+        """
+        self.session.pause()
+        if self.resume_store is not None and not self.save_all(timeout):
+            print("Timed out saving resume data; some torrents will be rechecked on restart")
+        self.stop()
+
+    def _admit(self, torrent):
+        # Caller must hold self._lock
+        os.makedirs(torrent.save_path, exist_ok=True)
+        torrent.handle = self.session.add_torrent(torrent.params)
+        self._by_handle[torrent.handle] = torrent
+        torrent.admitted.set()
+
+    def _wait(self, torrent, event, is_done, timeout):
+        if torrent.error is not None:
+            return False
+        # Check once in case the event fired before anyone listened, then let the alert loop wake us
+        if not event.is_set() and torrent.handle is not None and is_done(torrent.handle.status()):
+            event.set()
+        if not event.is_set():
+            self.start()
+            event.wait(timeout)
+        return event.is_set() and torrent.error is None
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self.process_alerts(timeout=self.update_interval)
+
+    def torrent_for(self, handle):
+        """Return the ManagedTorrent for a torrent handle, or None if the handle is not hosted here"""
+        with self._lock:
+            return self._by_handle.get(handle)
+
+    def _emit(self, event, torrent):
+        with self._lock:
+            listeners = list(self._listeners)
+        for listener in listeners:
+            try:
+                listener(event, torrent)
+            except Exception as e:
+                print(f"Session listener {listener!r} failed: {e}")
+
+    def _on_state_update(self, alert):
+        for status in alert.status:
+            torrent = self.torrent_for(status.handle)
+            if torrent is None:
+                continue
+            torrent.last_status = status
+            if status.state in FINISHED_STATES:
+                torrent.finished.set()
+            elif torrent.error is None:
+                # Raising a file's priority after completion resumes the download
+                torrent.finished.clear()
+            self._emit('progress', torrent)
+
+    def _on_metadata_received(self, alert):
+        torrent = self.torrent_for(alert.handle)
+        if torrent is not None:
+            if self.metadata_store is not None:
+                self.metadata_store.save(torrent.infohash, alert.handle.torrent_file())
+            torrent.metadata_ready.set()
+            self._emit('metadata', torrent)
+
+    def _on_piece_finished(self, alert):
+        torrent = self.torrent_for(alert.handle)
+        if torrent is not None:
+            with torrent.pieces_changed:
+                torrent.piece_seq += 1
+                torrent.piece_completed[int(alert.piece_index)] = torrent.piece_seq
+                torrent.pieces_changed.notify_all()
+            self._emit('piece', torrent)
+
+    def _on_cache_flushed(self, alert):
+        torrent = self.torrent_for(alert.handle)
+        if torrent is not None:
+            with torrent.pieces_changed:
+                # Flushes complete in the order they were requested
+                if torrent.pending_flushes:
+                    torrent.flushed_seq = max(torrent.flushed_seq, torrent.pending_flushes.popleft())
+                torrent.pieces_changed.notify_all()
+
+    def _on_file_priorities(self, alert):
+        # File priorities are applied asynchronously and reset the piece priorities when they land
+        torrent = self.torrent_for(alert.handle)
+        if torrent is not None:
+            self._emit('file_priorities', torrent)
+
+    def _on_torrent_finished(self, alert):
+        torrent = self.torrent_for(alert.handle)
+        if torrent is not None:
+            torrent.finished.set()
+            self._emit('finished', torrent)
+
+    def _on_torrent_error(self, alert):
+        torrent = self.torrent_for(alert.handle)
+        if torrent is not None:
+            torrent.error = alert.message()
+            # Wake anyone waiting on this torrent; the waits report the failure
+            torrent.metadata_ready.set()
+            torrent.finished.set()
+            with torrent.pieces_changed:
+                torrent.pieces_changed.notify_all()
+            self._emit('error', torrent)
+
+    def _on_resume_data(self, alert):
+        torrent = self.torrent_for(alert.handle)
+        # A torrent removed while its save was in flight stays forgotten
+        if torrent is not None and self.resume_store is not None:
+            self.resume_store.save(torrent.infohash, alert.params)
+        self._save_finished()
+
+    def _on_resume_data_failed(self, alert):
+        torrent = self.torrent_for(alert.handle)
+        if torrent is not None:
+            print(f"Failed to save resume data for {torrent.infohash}: {alert.message()}")
+        self._save_finished()
+
+    def _save_finished(self):
+        with self._saves_done:
+            self._saves_pending = max(0, self._saves_pending - 1)
+            self._saves_done.notify_all()
+
+    def _on_session_stats(self, alert):
+        with self._stats_ready:
+            self.session_stats = dict(alert.values)
+            self._stats_seq += 1
+            self._stats_ready.notify_all()
+
+    def _describe(self, torrent, status):
+        return {
+            'infohash': torrent.infohash,
+            'name': status.name,
+            'state': 'paused' if status.paused and not status.auto_managed else state_name(status.state),
+            'progress': status.progress,
+            'download_rate': status.download_rate,
+            'upload_rate': status.upload_rate,
+            'num_peers': status.num_peers,
+            'num_seeds': status.num_seeds,
+            'total_wanted': status.total_wanted,
+            'total_wanted_done': status.total_wanted_done,
+            'queue_position': int(status.queue_position),
+            'has_metadata': status.has_metadata,
+            'save_path': torrent.save_path,
+        }
@@ -0,0 +1,198 @@
+import atexit
+import json
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import libtorrent as lt
+
+logger = logging.getLogger(__name__)
+
+# Counter or gauge, by libtorrent metric name
+METRIC_TYPES = {metric.name: 'counter' if metric.type == lt.metric_type_t.counter else 'gauge'
+                for metric in lt.session_stats_metrics()}
+
+# Per-torrent gauges exported from the session manager's status records
+TORRENT_GAUGES = {
+    'progress': "Fraction of the wanted data downloaded",
+    'download_rate': "Download rate in bytes/s",
+    'upload_rate': "Upload rate in bytes/s",
+    'num_peers': "Connected peers",
+    'num_seeds': "Connected seeds",
+    'total_wanted': "Bytes selected for download",
+    'total_wanted_done': "Selected bytes downloaded",
+}
+
+def metric_name(name):
+    """Prometheus name of a libtorrent counter, e.g. disk.queued_disk_jobs -> libtorrent_disk_queued_disk_jobs"""
+    prometheus_name = "libtorrent_" + name.replace('.', '_')
+    return f"{prometheus_name}_total" if METRIC_TYPES.get(name) == 'counter' else prometheus_name
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def format_progress(status):
+    """One-line progress of a torrent, from a SessionManager status record"""
+    return (f"Status: {status['state']} | "
+            f"Progress: {status.get('progress', 0) * 100:.2f}% | "
+            f"Download speed: {status.get('download_rate', 0) / 1000:.2f} KB/s | "
+            f"Peers: {status.get('num_peers', 0)}")
+
+def render_prometheus(snapshot):
+    """
+    Render a snapshot in the Prometheus text exposition format
+
+    Args:
+        snapshot (dict): {'session': {metric name: value}, 'torrents': [status records]}
+
+    Returns:
+        str: The metrics page
+    """
+    lines = []
+    for name, value in sorted(snapshot['session'].items()):
+        prometheus_name = metric_name(name)
+        lines.append(f"# TYPE {prometheus_name} {METRIC_TYPES.get(name, 'gauge')}")
+        lines.append(f"{prometheus_name} {value}")
+
+    torrents = [status for status in snapshot['torrents'] if 'progress' in status]
+    for field, description in TORRENT_GAUGES.items():
+        prometheus_name = f"seer2seed_torrent_{field}"
+        lines.append(f"# HELP {prometheus_name} {description}")
+        lines.append(f"# TYPE {prometheus_name} gauge")
+        for status in torrents:
+            labels = f'infohash="{status["infohash"]}",name="{_label(status["name"])}",state="{status["state"]}"'
+            lines.append(f"{prometheus_name}{{{labels}}} {float(status[field])}")
+    lines.append("# TYPE seer2seed_torrents gauge")
+    lines.append(f"seer2seed_torrents {len(snapshot['torrents'])}")
+    return "\n".join(lines) + "\n"
+
+class SessionStatsExporter:
+    """
+    Periodic export of libtorrent's session counters and every torrent's state
+
+    Every `interval` seconds the session is asked for its counters
+    (post_session_stats: disk queue depth, peer counts, request and disk
+    latency, wasted bytes, DHT nodes and some 300 more) and the state of each
+    torrent is read from the manager's batched updates. The latest snapshot is
+    served as Prometheus text on http://host:port/metrics when a port is
+    given, and each snapshot is appended to a JSON-lines file when a path is
+    given.
+    """
+
+    def __init__(self, manager, interval=5.0, jsonl_path=None, host="127.0.0.1", port=None):
+        """
+        Args:
+            manager (SessionManager): Manager whose session and torrents are exported
+            interval (float): Seconds between snapshots
+            jsonl_path (str): File each snapshot is appended to as one JSON line (None for none)
+            host (str): Interface the metrics endpoint listens on
+            port (int): Port of the metrics endpoint (None for no endpoint, 0 picks a free one)
+        """
+        self.manager = manager
+        self.interval = interval
+        self.jsonl_path = jsonl_path
+        self._snapshot = None
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._server = None
+        self._server_thread = None
+        if port is not None:
+            self._server = ThreadingHTTPServer((host, port), self._make_handler())
+            self._server.daemon_threads = True
+
+    @property
+    def url(self):
+        """URL of the metrics endpoint, or None without one"""
+        if self._server is None:
+            return None
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/metrics"
+
+    def snapshot(self):
+        """Latest snapshot: {'time', 'session': {metric: value}, 'torrents': [status records]}, or None"""
+        with self._lock:
+            return self._snapshot
+
+    def collect(self, timeout=None):
+        """
+        Take a snapshot now, append it to the JSON-lines file and publish it
+
+        Returns:
+            dict: The snapshot, or None if the session counters did not arrive in time
+        """
+        stats = self.manager.request_session_stats(timeout=self.interval if timeout is None else timeout)
+        if stats is None:
+            return None
+        snapshot = {'time': time.time(), 'session': stats, 'torrents': self.manager.torrents()}
+        with self._lock:
+            self._snapshot = snapshot
+        if self.jsonl_path:
+            try:
+                with open(self.jsonl_path, 'a') as f:
+                    f.write(json.dumps(snapshot) + "\n")
+            except OSError as e:
+                logger.warning(f"Failed to append session stats to {self.jsonl_path}: {e}")
+        return snapshot
+
+    def start(self):
+        """Collect in a background thread and serve the endpoint, if any"""
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="session-stats", daemon=True)
+        self._thread.start()
+        if self._server is not None:
+            self._server_thread = threading.Thread(target=self._server.serve_forever, name="session-stats-http",
+                                                   daemon=True)
+            self._server_thread.start()
+        # The collector calls into libtorrent, which must not happen during interpreter exit
+        atexit.register(self.stop)
+        return self
+
+    def stop(self):
+        atexit.unregister(self.stop)
+        self._stopping.set()
+        thread, self._thread = self._thread, None
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+        if self._server is not None:
+            if self._server_thread is not None:
+                self._server.shutdown()
+                self._server_thread = None
+            self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            started = time.monotonic()
+            self.collect()
+            self._stopping.wait(max(0.0, self.interval - (time.monotonic() - started)))
+
+    def _make_handler(self):
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?', 1)[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                snapshot = exporter.snapshot()
+                if snapshot is None:
+                    self.send_error(503, "No statistics collected yet")
+                    return
+                body = render_prometheus(snapshot).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,322 @@
+import os
+import sys
+import threading
+import time
+
+from download import VIDEO_EXTENSIONS, get_manifest, get_session_manager, is_safe_torrent, shutdown_session_manager
+
+def pick_main_file(manifest, extensions=VIDEO_EXTENSIONS):
+    """
+    Pick the file to play: the largest file with a video extension
+
+    Args:
+        manifest (FileManifest): Files of the torrent
+        extensions (list): Extensions that count as playable
+
+    Returns:
+        int: File index, or None if the torrent has no video file
+    """
+    return manifest.largest(extensions)
+
+class TorrentStream:
+    """
+    Download one file of a torrent in playback order
+
+    The head of the file (where playback starts) and its tail (where MP4 moov
+    atoms and MKV cues usually live) are fetched first, then a window of piece
+    deadlines slides ahead of the playback position: the next `window_bytes`
+    of missing data get increasing deadlines, so libtorrent requests them in
+    order from the fastest peers while the rest of the file keeps downloading
+    rarest-first. seek() moves the window; readers call it as they advance.
+    """
+
+    def __init__(self, manager, infohash, file_index=None, ready_bytes=4 * 1024 * 1024,
+                 tail_bytes=2 * 1024 * 1024, window_bytes=32 * 1024 * 1024, deadline_step_ms=250):
+        """
+        Args:
+            manager (SessionManager): Manager hosting the torrent (its metadata must be available)
+            infohash (str): Torrent to stream
+            file_index (int): File to play (defaults to the main video file)
+            ready_bytes (int): Contiguous bytes from the start needed before playback can begin
+            tail_bytes (int): Bytes at the end of the file fetched up front for the container index
+            window_bytes (int): Bytes ahead of the playback position kept under deadlines
+            deadline_step_ms (int): Deadline added per piece further along the window
+
+        Raises:
+            ValueError: If no file is given and the torrent has no video file
+        """
+        self.manager = manager
+        self.torrent = manager.get(infohash)
+        self.handle = self.torrent.handle
+        manifest = get_manifest(self.handle, manager)
+        if file_index is None:
+            file_index = pick_main_file(manifest)
+            if file_index is None:
+                raise ValueError("Torrent has no video file to stream")
+        self.file_index = file_index
+        self.size = manifest.sizes[file_index]
+        self.path = os.path.join(self.handle.status().save_path, manifest.paths[file_index])
+        self.piece_length = self.handle.torrent_file().piece_length()
+        self._file_offset = manifest.offsets[file_index]
+        self.first_piece = self.piece_at(0)
+        self.last_piece = self.piece_at(max(self.size - 1, 0))
+
+        self.ready_bytes = min(ready_bytes, self.size)
+        self.window_pieces = max(1, -(-window_bytes // self.piece_length))
+        self.deadline_step_ms = deadline_step_ms
+        self._head = self.pieces_for(0, self.ready_bytes)
+        self._tail = self.pieces_for(max(self.size - tail_bytes, 0), min(tail_bytes, self.size))
+        self.position = 0
+        self._deadlines = set()
+        self._lock = threading.Lock()
+        self._held = []
+        self.started = None
+        self.ready_time = None
+
+    def piece_at(self, offset):
+        """Index of the piece holding a byte offset of the file"""
+        return (self._file_offset + offset) // self.piece_length
+
+    def pieces_for(self, offset, length):
+        """Indexes of the pieces covering length bytes of the file starting at offset"""
+        if length <= 0:
+            return range(0)
+        return range(self.piece_at(offset), self.piece_at(offset + length - 1) + 1)
+
+    def start(self, timeout=5.0):
+        """
+        Download this file head and tail first, with the window at the start
+
+        Args:
+            timeout (float): Seconds to wait for the file priorities to be applied
+        """
+        applied = threading.Event()
+        def on_applied(event, torrent):
+            if event == 'file_priorities' and torrent is self.torrent:
+                applied.set()
+        self.manager.subscribe(on_applied)
+        self.manager.start()
+        # Other files keep their priorities (0 when the torrent was added with files_wanted=False)
+        priorities = list(self.handle.get_file_priorities())
+        priorities[self.file_index] = max(priorities[self.file_index], 4)
+        self.handle.prioritize_files(priorities)
+        # File priorities land asynchronously and overwrite piece priorities, so steer pieces after that
+        applied.wait(timeout)
+        self.manager.unsubscribe(on_applied)
+
+        self.started = time.monotonic()
+        with self._lock:
+            # Until playback can start, nothing but the head and tail competes for bandwidth
+            startup = list(self._head) + [piece for piece in self._tail if piece not in self._head]
+            self._held = [piece for piece in range(self.first_piece, self.last_piece + 1) if piece not in startup]
+            self.handle.prioritize_pieces([(piece, 0) for piece in self._held])
+            for i, piece in enumerate(startup):
+                self._set_deadline(piece, i * self.deadline_step_ms // 4)
+        self.manager.subscribe(self._on_event)
+        self.refresh()
+
+    def close(self):
+        """Stop steering the download; the file keeps downloading at normal priority"""
+        self.manager.unsubscribe(self._on_event)
+        with self._lock:
+            self.handle.clear_piece_deadlines()
+            self._deadlines.clear()
+
+    def seek(self, offset):
+        """
+        Move the playback position, re-targeting the deadline window
+
+        Args:
+            offset (int): Byte offset in the file the player will read next
+        """
+        offset = min(max(offset, 0), max(self.size - 1, 0))
+        with self._lock:
+            self.position = offset
+            window = self._window()
+            wanted = set(window)
+            for piece in list(self._deadlines):
+                if piece not in wanted and not self._is_startup_piece(piece):
+                    self.handle.reset_piece_deadline(piece)
+                    self._deadlines.discard(piece)
+            self._extend(window)
+
+    def refresh(self):
+        """Top the window back up as pieces arrive (called on every finished piece)"""
+        with self._lock:
+            self._deadlines = {piece for piece in self._deadlines if not self.handle.have_piece(piece)}
+            if self.ready_time is None and self.started is not None and self.is_ready():
+                self.ready_time = time.monotonic()
+                # Playback can start: the window takes over and the rest of the file downloads normally
+                held, self._held = self._held, []
+                self.handle.prioritize_pieces([(piece, 4) for piece in held])
+            if self.ready_time is not None:
+                self._extend(self._window())
+
+    def have_range(self, offset, length):
+        """True if every piece covering the byte range is on disk"""
+        return all(self.handle.have_piece(piece) for piece in self.pieces_for(offset, length))
+
+    def prioritize_range(self, offset, length):
+        """Give the missing pieces of a byte range the most urgent deadlines, in order"""
+        with self._lock:
+            missing = [piece for piece in self.pieces_for(offset, length) if not self.handle.have_piece(piece)]
+            for i, piece in enumerate(missing):
+                self._set_deadline(piece, i * self.deadline_step_ms // 4)
+
+    def wait_for_range(self, offset, length, timeout=None):
+        """
+        Block until a byte range is on disk, prioritizing its missing pieces
+
+        Returns:
+            bool: True once every piece of the range is downloaded, False on timeout or torrent error
+        """
+        if self.have_range(offset, length):
+            return True
+        self.prioritize_range(offset, length)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.torrent.pieces_changed:
+            while not self.have_range(offset, length):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if self.torrent.error is not None or (remaining is not None and remaining <= 0):
+                    return False
+                self.torrent.pieces_changed.wait(remaining)
+        return True
+
+    def readable_from(self, offset, limit, timeout=None):
+        """
+        Number of bytes from offset (up to limit) that can be read from the file without gaps
+
+        Downloaded pieces that libtorrent has not written out yet are flushed first.
+        """
+        end = min(offset + limit, self.size)
+        piece_end = offset
+        flush = False
+        for piece in self.pieces_for(offset, end - offset):
+            if not self.handle.have_piece(piece):
+                break
+            flush = flush or not self.torrent.on_disk(piece)
+            piece_end = (piece + 1) * self.piece_length - self._file_offset
+        if flush and not self.manager.flush(self.torrent.infohash, timeout):
+            return 0
+        return max(0, min(piece_end, end) - offset)
+
+    def is_ready(self):
+        """True once the head and tail of the file are downloaded"""
+        return all(self.handle.have_piece(piece) for piece in list(self._head) + list(self._tail))
+
+    def wait_ready(self, timeout=None):
+        """
+        Block until playback can start
+
+        Returns:
+            bool: True once the head and tail are on disk, False on timeout or torrent error
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.torrent.pieces_changed:
+            while not self.is_ready():
+                if self.torrent.error is not None:
+                    return False
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self.torrent.pieces_changed.wait(remaining)
+        self.refresh()
+        # Players read the file directly, so make sure the head and tail are really written
+        return self.manager.flush(self.torrent.infohash, timeout)
+
+    @property
+    def time_to_first_frame(self):
+        """Seconds from start() until playback could begin (None until ready)"""
+        if self.started is None or self.ready_time is None:
+            return None
+        return self.ready_time - self.started
+
+    def _on_event(self, event, torrent):
+        if event == 'piece' and torrent is self.torrent:
+            self.refresh()
+
+    def _window(self):
+        # The next window_pieces missing pieces at or after the playback position
+        window = []
+        for piece in range(self.piece_at(self.position), self.last_piece + 1):
+            if len(window) >= self.window_pieces:
+                break
+            if piece in self._deadlines or not self.handle.have_piece(piece):
+                window.append(piece)
+        return window
+
+    def _extend(self, window):
+        # Pieces keep the deadline they were first given, so earlier ones stay more urgent
+        for i, piece in enumerate(window):
+            if piece not in self._deadlines:
+                self._set_deadline(piece, (i + 1) * self.deadline_step_ms)
+
+    def _set_deadline(self, piece, deadline_ms):
+        self.handle.set_piece_deadline(piece, deadline_ms)
+        self._deadlines.add(piece)
+
+    def _is_startup_piece(self, piece):
+        return self.ready_time is None and (piece in self._head or piece in self._tail)
+
+def stream_torrent(magnet_link, save_path="./downloads", manager=None, ready_bytes=4 * 1024 * 1024):
+    """
+    Download a torrent in playback order and report when its video can be played
+
+    Args:
+        magnet_link (str): Magnet link to stream
+        save_path (str): Directory to save the downloaded files
+        manager (SessionManager): Session to host the torrent in (defaults to the shared one)
+        ready_bytes (int): Bytes from the start of the video needed before playback
+
+    Returns:
+        TorrentStream: The stream, or None if the torrent could not be streamed
+    """
+    manager = manager or get_session_manager()
+    # Nothing downloads until the stream has set its priorities
+    infohash = manager.add(magnet_link, save_path, files_wanted=False)
+
+    print("Downloading metadata...")
+    if not manager.wait_for_metadata(infohash):
+        print(f"Failed to retrieve metadata: {manager.get(infohash).error}")
+        manager.remove(infohash)
+        return None
+
+    handle = manager.handle(infohash)
+    is_safe, reason = is_safe_torrent(handle, manager)
+    if not is_safe:
+        print(f"Safety check failed: {reason}")
+        manager.remove(infohash)
+        return None
+
+    try:
+        stream = TorrentStream(manager, infohash, ready_bytes=ready_bytes)
+    except ValueError as e:
+        print(f"Cannot stream: {e}")
+        manager.remove(infohash)
+        return None
+
+    print(f"Streaming: {stream.path} ({stream.size / (1024**2):.1f} MB)")
+    stream.start()
+    if not stream.wait_ready():
+        print(f"Streaming failed: {manager.get(infohash).error}")
+        return None
+    print(f"Ready to play after {stream.time_to_first_frame:.2f}s: {stream.path}")
+    return stream
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or not sys.argv[1].startswith('magnet:'):
+        print("Usage: python streaming.py <magnet link> [save path]")
+        sys.exit(1)
+
+    stream = None
+    try:
+        # Low-latency settings unless SESSION_PROFILE picks others
+        manager = get_session_manager(os.getenv("SESSION_PROFILE", "streaming"))
+        stream = stream_torrent(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else "./downloads", manager)
+        if stream is not None:
+            stream.manager.wait_until_finished(stream.torrent.infohash)
+            print("Download complete!")
+    except KeyboardInterrupt:
+        print("\nInterrupted.")
+    finally:
+        shutdown_session_manager()
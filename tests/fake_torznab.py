@@ -0,0 +1,173 @@
+"""
+Synthetic Torznab feeds and a local stand-in Jackett server for exercising
+the crawler without a live Jackett or API key.
+"""
+import random
+import re
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+TORZNAB_NS = "http://torznab.com/schemas/2015/feed"
+
+RESOLUTIONS = ["2160p", "1080p", "720p", "480p"]
+SOURCES = ["BluRay", "WEB-DL", "WEBRip", "HDTV", "CAM"]
+CODECS = ["x264", "x265", "HEVC", "AV1"]
+GROUPS = ["SPARKS", "YIFY", "RARBG", "FGT", "NTb"]
+
+def make_item(i, rng, query="Batman Begins", year=2005):
+    """Render a single synthetic <item> element"""
+    title = (f"{query.replace(' ', '.')}.{year}.{rng.choice(RESOLUTIONS)}."
+             f"{rng.choice(SOURCES)}.{rng.choice(CODECS)}-{rng.choice(GROUPS)}")
+    size = rng.randint(700, 80_000) * 1024 * 1024
+    seeders = rng.randint(0, 5000)
+    peers = seeders + rng.randint(0, 500)
+    infohash = f"{rng.getrandbits(160):040x}"
+    return (
+        "<item>"
+        f"<title>{title}</title>"
+        f"<guid>https://tracker.example/{i}</guid>"
+        f"<link>https://jackett.example/dl/{i}.torrent</link>"
+        f"<pubDate>Mon, 0{i % 9 + 1} Jan 2024 12:00:00 +0000</pubDate>"
+        f"<size>{size}</size>"
+        f'<torznab:attr name="size" value="{size}" />'
+        f'<torznab:attr name="seeders" value="{seeders}" />'
+        f'<torznab:attr name="peers" value="{peers}" />'
+        f'<torznab:attr name="infohash" value="{infohash}" />'
+        f'<torznab:attr name="downloadvolumefactor" value="{rng.choice((0, 0.5, 1))}" />'
+        '<torznab:attr name="uploadvolumefactor" value="1" />'
+        "</item>"
+    )
+
+def make_feed(num_items, seed=0, query="Batman Begins", year=2005):
+    """
+    Build a Torznab RSS document with the given number of items
+    
+    Args:
+        num_items (int): Number of <item> entries
+        seed (int): Random seed, so feeds are reproducible
+        query (str): Movie title used in the release names
+        year (int): Movie year used in the release names
+        
+    Returns:
+        bytes: UTF-8 encoded XML
+    """
+    rng = random.Random(seed)
+    items = "".join(make_item(i, rng, query, year) for i in range(num_items))
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        f'<rss version="2.0" xmlns:torznab="{TORZNAB_NS}">'
+        "<channel><title>Fake Jackett</title>"
+        f"{items}"
+        "</channel></rss>"
+    ).encode("utf-8")
+
+@dataclass
+class IndexerBehavior:
+    """How a fake indexer responds"""
+    items: int = 100
+    latency: float = 0.0
+    status: int = 200
+    error_rate: float = 0.0
+
+class FakeTorznabServer:
+    """
+    Local HTTP server answering Jackett's Torznab endpoint
+
+    Serves /api/v2.0/indexers/<indexer>/results/torznab/api with synthetic
+    feeds whose size, latency and failures are configured per indexer.
+    Unknown indexers (including "all") use the default behavior.
+
+    Usage:
+        with FakeTorznabServer({"slow": IndexerBehavior(latency=5)}) as server:
+            crawler.JACKETT_URL = server.url
+    """
+
+    PATH_PATTERN = re.compile(r"^/api/v2\.0/indexers/([^/]+)/results/torznab/api$")
+
+    def __init__(self, indexers=None, default=None, seed=0):
+        self.indexers = dict(indexers or {})
+        self.default = default or IndexerBehavior()
+        self.requests = []
+        self._rng = random.Random(seed)
+        self._feeds = {}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def feed(self, indexer, items, query):
+        """Return (and memoize) the feed body for an indexer"""
+        key = (indexer, items, query)
+        with self._lock:
+            if key not in self._feeds:
+                self._feeds[key] = make_feed(items, seed=zlib.crc32(indexer.encode()), query=query)
+            return self._feeds[key]
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body are written separately; avoid delayed-ACK stalls
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                match = server.PATH_PATTERN.match(parsed.path)
+                if not match:
+                    self._reply(404, b"Not found", "text/plain")
+                    return
+
+                indexer = match.group(1)
+                params = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+                behavior = server.indexers.get(indexer, server.default)
+                with server._lock:
+                    server.requests.append((indexer, params))
+                    failed = server._rng.random() < behavior.error_rate
+
+                if behavior.latency:
+                    time.sleep(behavior.latency)
+                if failed or behavior.status != 200:
+                    self._reply(behavior.status if behavior.status != 200 else 500,
+                                b"Indexer error", "text/plain")
+                    return
+
+                items = min(behavior.items, int(params.get("limit", behavior.items)))
+                body = server.feed(indexer, items, params.get("q", "Batman Begins"))
+                self._reply(200, body, "application/rss+xml")
+
+            def _reply(self, status, body, content_type):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,91 @@
+"""
+A loopback-only BitTorrent swarm for exercising the download side without
+the public network: synthetic torrents, a seeding session and helpers to
+point other sessions at it.
+"""
+import os
+import time
+
+import libtorrent as lt
+
+from session_manager import ALERT_MASK
+
+# Loopback only: no DHT, LSD or port mapping, and every peer shares 127.0.0.1
+LOCAL_SETTINGS = {
+    'listen_interfaces': '127.0.0.1:0',
+    'enable_dht': False,
+    'enable_lsd': False,
+    'enable_upnp': False,
+    'enable_natpmp': False,
+    'allow_multiple_connections_per_ip': True,
+    'alert_mask': ALERT_MASK,
+}
+
+def make_torrent(root, files, piece_length=256 * 1024, seed=0):
+    """
+    Write files of deterministic filler bytes under root/<name> and build a torrent for them
+
+    Args:
+        root (str): Directory the torrent's content is written to
+        files (dict): Relative path -> size in bytes; the first path's top directory names the torrent
+        piece_length (int): Piece size in bytes
+        seed (int): Seed for the file contents, so torrents with equal layouts still differ
+
+    Returns:
+        lt.torrent_info: The torrent, with content under root
+    """
+    entries = []
+    for index, (path, size) in enumerate(files.items()):
+        full_path = os.path.join(root, path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, 'wb') as f:
+            block = (f"{seed}:{index}:".encode() * 4096)[:65536]
+            remaining = size
+            while remaining > 0:
+                f.write(block[:remaining])
+                remaining -= len(block)
+        entries.append(lt.create_file_entry(path, size))
+    creator = lt.create_torrent(entries, piece_length)
+    lt.set_piece_hashes(creator, root)
+    return lt.torrent_info(creator.generate())
+
+def start_seeder(info, root, settings=None, upload_limit=0):
+    """
+    Start a session seeding a torrent whose content is already under root, and wait until it seeds
+
+    Args:
+        upload_limit (int): Bytes/s the torrent uploads at most (0 for unlimited); session-wide
+            rate limits do not apply to loopback peers
+
+    Returns:
+        tuple: (session, handle)
+    """
+    session = lt.session(dict(LOCAL_SETTINGS, **(settings or {})))
+    params = lt.add_torrent_params()
+    params.ti = info
+    params.save_path = root
+    params.flags |= lt.torrent_flags.seed_mode
+    handle = session.add_torrent(params)
+    handle.set_upload_limit(upload_limit)
+    # Peers connecting before the queue has started the torrent are refused and only retried much later
+    wait_for(lambda: handle.status().is_seeding and not handle.status().paused)
+    return session, handle
+
+def magnet(info):
+    """Magnet link for a torrent"""
+    return lt.make_magnet_uri(info)
+
+def connect(handle, session):
+    """Point a torrent handle at the peer listening in another local session"""
+    # Peers handed to a torrent the queue has not started yet are dropped
+    wait_for(lambda: not handle.status().paused)
+    handle.connect_peer(('127.0.0.1', session.listen_port()))
+
+def wait_for(predicate, timeout=10.0, interval=0.02):
+    """Poll predicate until it is true or timeout seconds pass; return its last value"""
+    deadline = time.monotonic() + timeout
+    while True:
+        result = predicate()
+        if result or time.monotonic() >= deadline:
+            return result
+        time.sleep(interval)
@@ -0,0 +1,143 @@
+import time
+import tracemalloc
+import pytest
+from io import BytesIO
+from unittest.mock import patch
+
+# No need for sys.path manipulation - conftest.py handles it
+import crawler
+from tests.fake_torznab import make_feed
+
+@pytest.mark.unit
+@pytest.mark.crawler
+def test_search_all_runs_queries_concurrently():
+    """Test that search_all fans out every query/indexer pair in parallel"""
+    calls = []
+
+    def fake_search(query, year=None, limit=100, indexer=None, timeout=None):
+        calls.append((query, year, indexer))
+        time.sleep(0.2)
+        return [{'title': f"{query} {year} {indexer}", 'seeders': 1}]
+
+    with patch('crawler.cached_search', side_effect=fake_search):
+        start = time.monotonic()
+        results = crawler.search_all([("Batman Begins", None), ("Batman Begins", 2005)],
+                                     indexers="1337x,yts", timeout=5)
+        elapsed = time.monotonic() - start
+
+    assert len(calls) == 4
+    assert len(results) == 4
+    # Four 0.2s requests should take about as long as one, not the sum
+    assert elapsed < 0.6, f"Fan-out took {elapsed:.2f}s, expected concurrent execution"
+    # Results are merged in submission order
+    assert results[0]['title'] == "Batman Begins None 1337x"
+
+@pytest.mark.unit
+@pytest.mark.crawler
+def test_search_all_drops_requests_past_deadline():
+    """Test that one slow indexer cannot hold up the merged result list"""
+    def fake_search(query, year=None, limit=100, indexer=None, timeout=None):
+        if indexer == "slow":
+            time.sleep(2)
+        return [{'title': indexer, 'seeders': 1}]
+
+    with patch('crawler.cached_search', side_effect=fake_search):
+        start = time.monotonic()
+        results = crawler.search_all([("Inception", None)], indexers="fast,slow", timeout=0.3)
+        elapsed = time.monotonic() - start
+
+    assert [r['title'] for r in results] == ["fast"]
+    assert elapsed < 1.0
+
+@pytest.mark.unit
+@pytest.mark.crawler
+def test_parse_torznab_streams_compact_records():
+    """Test that parse_torznab yields TorrentResult records from a feed"""
+    feed = (
+        b'<?xml version="1.0" encoding="UTF-8"?>'
+        b'<rss version="2.0" xmlns:torznab="http://torznab.com/schemas/2015/feed"><channel>'
+        b'<item><title>Batman.Begins.2005.1080p.BluRay.x264</title>'
+        b'<link>https://jackett.example/dl/1.torrent</link>'
+        b'<pubDate>Mon, 01 Jan 2024 12:00:00 +0000</pubDate>'
+        b'<torznab:attr name="peers" value="150" />'
+        b'<torznab:attr name="seeders" value="120" />'
+        b'<torznab:attr name="size" value="2147483648" />'
+        b'<torznab:attr name="downloadvolumefactor" value="0" /></item>'
+        b'<item><title>Batman.Begins.2005.720p.WEB</title></item>'
+        b'</channel></rss>'
+    )
+
+    results = list(crawler.parse_torznab(BytesIO(feed)))
+
+    assert len(results) == 2
+    first = results[0]
+    assert first.title == "Batman.Begins.2005.1080p.BluRay.x264"
+    assert first.seeders == 120
+    # Leechers are derived from peers regardless of attribute order
+    assert first.leechers == 30
+    assert first.download_factor == 0.0
+    assert first.formatted_size == "2.00 GB"
+    assert results[1].link == '' and results[1].seeders == 0
+
+@pytest.mark.unit
+@pytest.mark.crawler
+def test_parse_torznab_handles_large_feeds():
+    """Test parsing a large synthetic feed"""
+    results = list(crawler.parse_torznab(BytesIO(make_feed(5000))))
+
+    assert len(results) == 5000
+    assert all(isinstance(r, crawler.TorrentResult) for r in results)
+
+@pytest.mark.unit
+@pytest.mark.crawler
+def test_parse_torznab_memory_does_not_grow_with_feed_size():
+    """Test that parsed items are dropped from the tree, so peak memory is flat"""
+    peaks = []
+    for num_items in (1000, 8000):
+        feed = BytesIO(make_feed(num_items))
+        tracemalloc.start()
+        try:
+            assert sum(1 for _ in crawler.parse_torznab(feed)) == num_items
+            peaks.append(tracemalloc.get_traced_memory()[1])
+        finally:
+            tracemalloc.stop()
+
+    assert peaks[1] < 2 * peaks[0]
+
+@pytest.mark.unit
+@pytest.mark.crawler
+def test_merge_results_dedupes_and_keeps_freshest_counts():
+    """Test deduplication by infohash with a title+size fallback"""
+    infohash = "958e2487d2db5f41f9c056bb35cf547edf38528f"
+    results = [
+        crawler.TorrentResult(title="Batman Begins 1080p", seeders=10, infohash=infohash, fetched_at=1.0),
+        crawler.TorrentResult(title="Batman.Begins.1080p", seeders=7, infohash=infohash, fetched_at=2.0),
+        crawler.TorrentResult(title="Batman.Begins.2005.720p", size=100, seeders=3),
+        crawler.TorrentResult(title="batman begins 2005 720p", size=100, seeders=4),
+        crawler.TorrentResult(title="batman begins 2005 720p", size=200, seeders=5),
+    ]
+
+    merged = crawler.merge_results(results)
+
+    assert len(merged) == 3
+    by_hash = [r for r in merged if r.infohash == infohash]
+    # The most recently fetched counts win even if they are lower
+    assert by_hash[0].seeders == 7
+    assert crawler.infohash_from_magnet(f"magnet:?xt=urn:btih:{infohash.upper()}&dn=x") == infohash
+    assert crawler.infohash_from_magnet("magnet:?xt=urn:btih:SWHCJB6S3NPUD6OAK25TLT2UP3PTQUUP") == \
+        "958e2487d2db5f41f9c056bb35cf547edf38528f"
+
+@pytest.mark.unit
+@pytest.mark.crawler
+def test_rank_results_yields_top_k_lazily():
+    """Test heap-based top-k and lazy full ranking"""
+    results = [crawler.TorrentResult(title=str(i), seeders=(i * 37) % 101) for i in range(1000)]
+    expected = sorted(results, key=lambda r: r.seeders, reverse=True)
+
+    top = list(crawler.rank_results(results, k=5))
+    assert [r.seeders for r in top] == [r.seeders for r in expected[:5]]
+
+    ranked = crawler.rank_results(iter(results))
+    assert [next(ranked).seeders for _ in range(10)] == [r.seeders for r in expected[:10]]
+    # Ties keep input order
+    assert [r.title for r in crawler.rank_results(results)] == [r.title for r in expected]
@@ -0,0 +1,122 @@
+"""
+Crawler performance suite driven by the local fake Torznab server.
+
+Run with:
+    pytest tests/test_crawler_benchmark.py --benchmark-only
+"""
+import pytest
+from io import BytesIO
+from unittest.mock import patch
+
+pytest.importorskip("pytest_benchmark")
+
+# No need for sys.path manipulation - conftest.py handles it
+import crawler
+from indexer_stats import IndexerTelemetry
+from tests.fake_torznab import FakeTorznabServer, IndexerBehavior, make_feed
+
+@pytest.fixture
+def isolated_crawler():
+    """Disable the result cache and start from empty indexer telemetry"""
+    with patch('crawler.SEARCH_CACHE_TTL', 0), \
+         patch('crawler._indexer_telemetry', IndexerTelemetry()):
+        yield crawler
+
+@pytest.fixture
+def torznab_server(isolated_crawler):
+    """Factory starting a fake Jackett and pointing the crawler at it"""
+    servers = []
+
+    def start(indexers=None, default=None):
+        server = FakeTorznabServer(indexers, default).start()
+        servers.append(server)
+        patcher = patch('crawler.JACKETT_URL', server.url)
+        patcher.start()
+        return server
+
+    yield start
+    patch.stopall()
+    for server in servers:
+        server.stop()
+
+@pytest.mark.crawler
+@pytest.mark.slow
+@pytest.mark.benchmark(group="parse")
+@pytest.mark.parametrize("num_items", [100, 1000, 10000])
+def test_parse_throughput(benchmark, num_items):
+    """Items/second of the streaming Torznab parser"""
+    feed = make_feed(num_items)
+
+    results = benchmark(lambda: list(crawler.parse_torznab(BytesIO(feed))))
+
+    assert len(results) == num_items
+    benchmark.extra_info["items"] = num_items
+
+@pytest.mark.crawler
+@pytest.mark.slow
+@pytest.mark.benchmark(group="search_movie")
+@pytest.mark.parametrize("num_items", [100, 1000])
+def test_search_movie_throughput(benchmark, torznab_server, num_items):
+    """Single search_movie round trip, including HTTP and parsing"""
+    torznab_server(default=IndexerBehavior(items=num_items))
+
+    results = benchmark(crawler.search_movie, "Batman Begins", limit=num_items, use_cache=False)
+
+    assert len(results) == num_items
+
+@pytest.mark.crawler
+@pytest.mark.slow
+@pytest.mark.benchmark(group="main")
+def test_main_latency_tracks_slowest_indexer(benchmark, torznab_server):
+    """End-to-end main() over several indexers costs about one slow request, not the sum"""
+    latency = 0.2
+    torznab_server(default=IndexerBehavior(items=200, latency=latency))
+
+    with patch('crawler.INDEXERS', "1337x,yts,rarbg"), patch('builtins.print'):
+        benchmark.pedantic(crawler.main, rounds=3, iterations=1)
+
+    # Six requests (2 query variants x 3 indexers) run concurrently
+    if benchmark.enabled:
+        assert benchmark.stats.stats.max < 3 * latency
+
+@pytest.mark.crawler
+@pytest.mark.slow
+@pytest.mark.benchmark(group="degraded")
+def test_slow_indexer_does_not_block_results(benchmark, torznab_server):
+    """A hanging indexer is cut off at the deadline and the rest are returned"""
+    server = torznab_server(indexers={"slow": IndexerBehavior(items=50, latency=3)},
+                            default=IndexerBehavior(items=50))
+
+    def search():
+        return crawler.search_all([("Batman Begins", None)], indexers="fast,slow", timeout=0.5)
+
+    results = benchmark.pedantic(search, rounds=2, iterations=1)
+
+    assert len(results) == 50
+    if benchmark.enabled:
+        assert benchmark.stats.stats.max < 1.0
+    assert any(indexer == "slow" for indexer, _ in server.requests)
+
+@pytest.mark.crawler
+@pytest.mark.slow
+@pytest.mark.benchmark(group="degraded")
+def test_failing_indexer_is_recorded_and_skipped(benchmark, torznab_server):
+    """Errors are absorbed, recorded in telemetry and eventually scheduled away"""
+    torznab_server(indexers={"broken": IndexerBehavior(status=500)},
+                   default=IndexerBehavior(items=20))
+
+    def search():
+        return crawler.search_all([("Batman Begins", None)], indexers="ok,broken", timeout=2)
+
+    rounds = 6
+    results = benchmark.pedantic(search, rounds=rounds, iterations=1)
+    if not benchmark.enabled:
+        # A disabled benchmark runs search() once; the telemetry needs every round's failure
+        for _ in range(rounds - 1):
+            search()
+
+    assert len(results) == 20
+    telemetry = crawler.get_indexer_telemetry()
+    scheduled, skipped = telemetry.schedule(["ok", "broken"], deadline=2)
+    assert skipped == ["broken"]
+    assert telemetry.snapshot()["broken"]["error_rate"] == 1.0
@@ -13,9 +13,20 @@ import time
 # Set up logging
 logger = logging.getLogger(__name__)
 
+@pytest.fixture
+def isolated_session(tmp_path, monkeypatch):
+    """Keep the shared session's stores out of the working directory and drop the session afterwards"""
+    monkeypatch.setattr(dl, "RESUME_DIR", str(tmp_path / ".resume"))
+    monkeypatch.setattr(dl, "METADATA_DIR", str(tmp_path / ".metadata"))
+    monkeypatch.setattr(dl, "_session_manager", None)
+    try:
+        yield
+    finally:
+        dl.shutdown_session_manager()
+
 @pytest.mark.unit
 @pytest.mark.download
-def test_download_torrent_mock(capsys):
+def test_download_torrent_mock(capsys, isolated_session):
 
     """Test the download_torrent function with mocks"""
     # Mock libtorrent session and handle
@@ -42,6 +53,8 @@ def test_download_torrent_mock(capsys):
     mock_status.total_wanted_done = 1 * 1024 * 1024 * 1024  # 1GB (completed)
     
     mock_handle.status.return_value = mock_status
+    # No resume data to wait for when the fixture shuts the session down
+    mock_handle.is_valid.return_value = False
     mock_session.add_torrent.return_value = mock_handle
     
     # Mock torrent_file and info
@@ -60,6 +73,7 @@ def test_download_torrent_mock(capsys):
     
     # Mock files
     mock_files = MagicMock()
+    mock_files.num_files.return_value = 2
     mock_files.file_path.side_effect = lambda i: f"file{i}.mp4"
     mock_files.file_size.side_effect = lambda i: 500 * 1024 * 1024 if i == 0 else 524 * 1024 * 1024  # 500MB and 524MB
     mock_info.files.return_value = mock_files
@@ -0,0 +1,43 @@
+import tempfile
+
+import pytest
+
+from download import KNOWN_EXTENSIONS
+from file_manifest import FileManifest
+from tests.local_swarm import make_torrent
+
+MB = 1024 * 1024
+
+@pytest.mark.unit
+@pytest.mark.download
+def test_manifest_classifies_files_in_one_pass():
+    """Test that extensions are classified once and drive priorities, counts and skipped types"""
+    paths = ["Show/S01E01.MKV", "Show/S01E01.en.srt", "Show/setup.exe", "Show/info.nfo", "Show/poster.jpg"]
+    sizes = [700 * MB, 40 * 1024, 2 * MB, 900, 200 * 1024]
+    manifest = FileManifest(paths, sizes, KNOWN_EXTENSIONS, name="Show")
+
+    assert len(manifest) == 5
+    assert manifest.total_size == sum(sizes)
+    assert manifest.selected_count == 3
+    assert manifest.priorities() == [4, 4, 0, 0, 4]
+    assert manifest.skipped_extensions() == {".exe", ".nfo"}
+    assert manifest.count_smaller_than(10 * 1024) == 1
+    assert list(manifest.offsets) == [0, 700 * MB, 700 * MB + 40 * 1024, 702 * MB + 40 * 1024, 702 * MB + 40 * 1024 + 900]
+    assert manifest.largest([".srt", ".jpg"]) == 4
+    assert manifest.largest([".avi"]) is None
+
+@pytest.mark.unit
+@pytest.mark.download
+def test_manifest_matches_torrent_layout():
+    """Test that a manifest built from torrent metadata has libtorrent's paths, sizes and offsets"""
+    with tempfile.TemporaryDirectory() as root:
+        info = make_torrent(root, {"Pack/a.mkv": 300 * 1024, "Pack/b.srt": 5000, "Pack/c.mkv": 100 * 1024})
+    manifest = FileManifest.from_torrent_info(info, KNOWN_EXTENSIONS)
+    files = info.files()
+
+    assert manifest.name == "Pack"
+    assert len(manifest) == files.num_files()
+    for i in range(files.num_files()):
+        assert manifest.paths[i] == files.file_path(i)
+        assert manifest.sizes[i] == files.file_size(i)
+        assert manifest.offsets[i] == files.file_offset(i)
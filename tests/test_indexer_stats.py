@@ -0,0 +1,99 @@
+import time
+import threading
+import pytest
+import requests
+from unittest.mock import patch
+
+# No need for sys.path manipulation - conftest.py handles it
+import crawler
+from indexer_stats import IndexerTelemetry
+
+def _seed(telemetry, indexer, latency, count=10, errors=0):
+    for i in range(count):
+        telemetry.record(indexer, latency, results=10, error=i < errors)
+
+@pytest.mark.unit
+@pytest.mark.crawler
+def test_schedule_skips_and_demotes_indexers():
+    """Test that failing indexers are skipped and slow ones queued last"""
+    telemetry = IndexerTelemetry()
+    _seed(telemetry, "fast", 0.2)
+    _seed(telemetry, "slow", 9.0)
+    _seed(telemetry, "broken", 0.1, errors=9)
+
+    scheduled, skipped = telemetry.schedule(["slow", "broken", "new", "fast"], deadline=15)
+
+    assert scheduled == ["new", "fast", "slow"]
+    assert skipped == ["broken"]
+    # Never skip every indexer
+    assert telemetry.schedule(["broken"], deadline=15) == (["broken"], [])
+
+@pytest.mark.unit
+@pytest.mark.crawler
+def test_telemetry_persists_between_runs(tmp_path):
+    """Test that statistics are saved atomically and reloaded warm"""
+    path = str(tmp_path / "indexer_stats.json")
+    telemetry = IndexerTelemetry(path=path)
+    _seed(telemetry, "yts", 0.4, count=6)
+    telemetry.record("yts", 15.0, timed_out=True)
+    telemetry.save()
+
+    reloaded = IndexerTelemetry(path=path)
+    snapshot = reloaded.snapshot()["yts"]
+    assert snapshot["requests"] == 7
+    assert snapshot["timeouts"] == 1
+    assert snapshot["p95"] == 15.0
+    assert sum(snapshot["latency_histogram"].values()) == 7
+
+@pytest.mark.unit
+@pytest.mark.crawler
+def test_search_all_hedges_requests_past_p95():
+    """Test that a fast indexer stuck past its p95 gets a duplicate request"""
+    telemetry = IndexerTelemetry()
+    _seed(telemetry, "fast", 0.1)
+    calls = []
+    lock = threading.Lock()
+
+    def fake_search(query, year=None, limit=100, indexer=None, timeout=None):
+        with lock:
+            calls.append(indexer)
+            first = len(calls) == 1
+        # The first request hangs; the hedged duplicate answers promptly
+        time.sleep(3 if first else 0.05)
+        return [crawler.TorrentResult(title="hedged" if not first else "primary")]
+
+    with patch('crawler._indexer_telemetry', telemetry), \
+         patch('crawler.cached_search', side_effect=fake_search):
+        start = time.monotonic()
+        results = crawler.search_all([("Inception", None)], indexers="fast", timeout=5)
+        elapsed = time.monotonic() - start
+
+    assert [r.title for r in results] == ["hedged"]
+    assert len(calls) == 2
+    assert elapsed < 1.0
+
+@pytest.mark.unit
+@pytest.mark.crawler
+def test_hedged_duplicate_survives_failed_primary():
+    """Test that the duplicate's results are used when the primary request fails after hedging"""
+    telemetry = IndexerTelemetry()
+    _seed(telemetry, "fast", 0.1)
+    calls = []
+    lock = threading.Lock()
+
+    def fake_search(query, year=None, limit=100, indexer=None, timeout=None):
+        with lock:
+            calls.append(indexer)
+            first = len(calls) == 1
+        # The primary fails while the duplicate is still running
+        time.sleep(0.4 if first else 0.8)
+        if first:
+            raise requests.ConnectionError("connection reset")
+        return [crawler.TorrentResult(title="hedged")]
+
+    with patch('crawler._indexer_telemetry', telemetry), \
+         patch('crawler.cached_search', side_effect=fake_search):
+        results = crawler.search_all([("Inception", None)], indexers="fast", timeout=5)
+
+    assert [r.title for r in results] == ["hedged"]
+    assert len(calls) == 2
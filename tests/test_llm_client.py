@@ -0,0 +1,78 @@
+import asyncio
+import pytest
+import openai
+from unittest.mock import MagicMock
+
+# No need for sys.path manipulation - conftest.py handles it
+from llm_client import CircuitBreaker, LLMClientPool, LLMUnavailableError, is_retryable
+
+def _status_error(status, headers=None):
+    response = MagicMock(status_code=status, headers=headers or {})
+    return openai.APIStatusError(f"HTTP {status}", response=response, body=None)
+
+def _pool(**options):
+    options = {"backoff_base": 0.001, "backoff_max": 0.01, **options}
+    return LLMClientPool("http://localhost:8000/v1", "test", **options)
+
+@pytest.mark.unit
+@pytest.mark.seer
+def test_transient_errors_are_retried():
+    """Test that timeouts and overload responses are retried until a success"""
+    pool = _pool(max_retries=3)
+    func = MagicMock(side_effect=[openai.APITimeoutError(request=MagicMock()), _status_error(503), "answer"])
+
+    assert pool.call(func, model="m") == "answer"
+    assert func.call_count == 3
+    stats = pool.stats()
+    assert (stats["requests"], stats["retries"], stats["failures"], stats["in_flight"]) == (3, 2, 2, 0)
+    assert stats["breaker"]["state"] == "closed"
+
+@pytest.mark.unit
+@pytest.mark.seer
+def test_client_errors_are_not_retried():
+    """Test that a 400 is raised immediately and does not count against the server"""
+    pool = _pool()
+    func = MagicMock(side_effect=openai.BadRequestError("bad", response=MagicMock(status_code=400), body=None))
+
+    with pytest.raises(openai.BadRequestError):
+        pool.call(func)
+    assert func.call_count == 1
+    assert not is_retryable(ValueError("nope"))
+    assert pool.stats()["breaker"]["consecutive_failures"] == 0
+
+@pytest.mark.unit
+@pytest.mark.seer
+def test_breaker_opens_fails_fast_and_recovers():
+    """Test that a saturated server trips the breaker, which rejects calls until a probe succeeds"""
+    pool = _pool(max_retries=10, failure_threshold=3, reset_timeout=0.05)
+    func = MagicMock(side_effect=_status_error(429))
+
+    with pytest.raises(openai.APIStatusError):
+        pool.call(func)
+    assert func.call_count == 3
+    with pytest.raises(LLMUnavailableError):
+        pool.call(func)
+    assert func.call_count == 3
+    assert pool.stats()["breaker"]["rejected"] == 1
+
+    asyncio.run(asyncio.sleep(0.06))
+    async def ok():
+        return "answer"
+    assert asyncio.run(pool.call_async(ok)) == "answer"
+    assert pool.stats()["breaker"]["state"] == CircuitBreaker.CLOSED
+
+@pytest.mark.unit
+@pytest.mark.seer
+def test_seer_setup_client_is_shared_and_guarded(monkeypatch):
+    """Test that seer reuses one client per server and routes completions through the pool"""
+    import seer
+
+    completions = MagicMock(side_effect=[_status_error(502), "answer"])
+    monkeypatch.setattr(openai.resources.chat.Completions, "create", lambda self, **kwargs: completions(**kwargs))
+    seer.configure_client_pool("http://127.0.0.1:9/v1", "test", max_retries=1, backoff_base=0.001)
+
+    client = seer.setup_client("http://127.0.0.1:9/v1", "test")
+    assert client is seer.setup_client("http://127.0.0.1:9/v1", "test")
+    assert client.chat.completions.create(model="m", messages=[]) == "answer"
+    assert any(stats["base_url"] == "http://127.0.0.1:9/v1" and stats["retries"] == 1
+               for stats in seer.get_client_pool_stats())
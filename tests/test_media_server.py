@@ -0,0 +1,151 @@
+import json
+import pytest
+import tempfile
+import shutil
+import threading
+import urllib.request
+from unittest.mock import MagicMock, patch
+from urllib.error import HTTPError
+
+# No need for sys.path manipulation - conftest.py handles it
+from media_server import MediaServer, parse_range
+from session_manager import SessionManager
+from tests.local_swarm import LOCAL_SETTINGS, connect, magnet, make_torrent, start_seeder
+
+MB = 1024 * 1024
+
+@pytest.mark.unit
+@pytest.mark.download
+@pytest.mark.parametrize("header, expected", [
+    (None, None),
+    ("bytes=0-99", (0, 99)),
+    ("bytes=100-", (100, 999)),
+    ("bytes=-100", (900, 999)),
+    ("bytes=900-5000", (900, 999)),
+    ("bytes=1000-", False),
+    ("bytes=50-10", False),
+    ("bytes=0-1,5-9", None),
+    ("items=0-1", None),
+])
+def test_parse_range(header, expected):
+    """Test single, open-ended, suffix and unsatisfiable byte ranges"""
+    assert parse_range(header, 1000) == expected
+
+@pytest.mark.unit
+@pytest.mark.download
+def test_starting_a_stream_only_blocks_requests_for_that_file():
+    """Test that a stream being started neither blocks other torrents nor gets started twice"""
+    release = threading.Event()
+    with patch('media_server.TorrentStream') as stream_class:
+        stream_class.return_value.have_range.return_value = False
+        stream_class.return_value.start.side_effect = lambda: release.wait(5)
+        server = MediaServer(MagicMock(), port=0)
+        ready = MagicMock(torrent=MagicMock(infohash="bb" * 20), file_index=0)
+        server.adopt(ready)
+        try:
+            results = []
+            starters = [threading.Thread(target=lambda: results.append(server.stream_for("AA" * 20, 0)))
+                        for _ in range(2)]
+            for thread in starters:
+                thread.start()
+            assert server.stream_for("bb" * 20) is ready
+            assert not results
+            release.set()
+            for thread in starters:
+                thread.join(timeout=5)
+            assert results == [stream_class.return_value] * 2
+            assert stream_class.call_count == 1
+            assert server.stream_for("aa" * 20, 0) is stream_class.return_value
+        finally:
+            release.set()
+            server.stop()
+
+@pytest.mark.unit
+@pytest.mark.download
+def test_send_file_gives_up_when_flushing_fails():
+    """Test that a downloaded piece that cannot be flushed closes the connection instead of spinning"""
+    server = MediaServer(MagicMock(), port=0, piece_timeout=0.01)
+    handler_class = server._server.RequestHandlerClass
+    handler = handler_class.__new__(handler_class)
+    handler.close_connection = False
+    stream = MagicMock()
+    stream.readable_from.return_value = 0
+    stream.wait_for_range.return_value = True
+    try:
+        sender = threading.Thread(target=handler._send_file, args=(stream, 0, 99), daemon=True)
+        sender.start()
+        sender.join(timeout=5)
+        assert not sender.is_alive()
+        assert handler.close_connection
+        assert stream.readable_from.call_count == 2
+    finally:
+        server.stop()
+
+def _get(url, byte_range=None, method="GET"):
+    request = urllib.request.Request(url, method=method)
+    if byte_range:
+        request.add_header("Range", byte_range)
+    with urllib.request.urlopen(request, timeout=30) as response:
+        return response.status, dict(response.headers), response.read()
+
+@pytest.fixture
+def served_torrent():
+    """A 12 MB movie seeded at 3 MB/s, hosted by a manager behind a media server"""
+    root = tempfile.mkdtemp()
+    info = make_torrent(f"{root}/seed", {"Movie/Movie.mkv": 12 * MB, "Movie/Movie.srt": 4500}, seed=7)
+    seeder, _ = start_seeder(info, f"{root}/seed", upload_limit=3 * MB)
+    manager = SessionManager(settings=LOCAL_SETTINGS, update_interval=0.1)
+    infohash = manager.add(magnet(info), f"{root}/downloads", files_wanted=False)
+    connect(manager.handle(infohash), seeder)
+    with open(f"{root}/seed/Movie/Movie.mkv", "rb") as f:
+        content = f.read()
+    try:
+        with MediaServer(manager, port=0, piece_timeout=20) as server:
+            yield server, infohash, content
+    finally:
+        manager.close()
+        shutil.rmtree(root)
+
+@pytest.mark.integration
+@pytest.mark.download
+def test_serves_ranges_of_an_in_progress_download(served_torrent):
+    """Test that concurrent range requests wait for their pieces and return the right bytes"""
+    server, infohash, content = served_torrent
+    url = server.url_for(infohash)
+    start = 9 * MB + 12345
+
+    status, headers, body = _get(url, f"bytes={start}-{start + 99999}")
+    assert status == 206
+    assert headers["Content-Range"] == f"bytes {start}-{start + 99999}/{len(content)}"
+    assert headers["Content-Type"] == "video/x-matroska"
+    assert body == content[start:start + 100000]
+    assert server.manager.handle(infohash).status().progress < 1.0
+    # Other files are served by index (asked for while the swarm still has a use for the connection)
+    status, headers, body = _get(f"{url}/1")
+    assert (status, len(body)) == (200, 4500)
+
+    results = {}
+    def fetch(name, byte_range):
+        results[name] = _get(url, byte_range)
+    threads = [threading.Thread(target=fetch, args=(name, byte_range)) for name, byte_range in
+               [("head", "bytes=0-1048575"), ("tail", "bytes=-65536"), ("all", None)]]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=60)
+
+    assert results["head"][2] == content[:MB]
+    assert results["tail"][2] == content[-65536:]
+    assert results["all"][0] == 200 and results["all"][2] == content
+
+    status, _, body = _get(f"{server.url}/")
+    assert json.loads(body)[0]["url"] == url
+
+    status, headers, body = _get(url, method="HEAD")
+    assert (status, headers["Content-Length"], body) == (200, str(len(content)), b"")
+    with pytest.raises(HTTPError) as error:
+        _get(url, f"bytes={len(content)}-")
+    assert error.value.code == 416
+    with pytest.raises(HTTPError) as error:
+        _get(f"{server.url}/{'0' * 40}")
+    assert error.value.code == 404
@@ -0,0 +1,65 @@
+import os
+import tempfile
+
+import pytest
+
+from file_manifest import FileManifest
+from metadata_store import MetadataStore
+from tests.local_swarm import make_torrent
+
+@pytest.fixture
+def torrent_root():
+    with tempfile.TemporaryDirectory() as root:
+        yield root
+
+@pytest.mark.unit
+@pytest.mark.download
+def test_save_and_load_info_dict(torrent_root):
+    """Test that the info dictionary is cached by infohash and parses back into the same torrent"""
+    info = make_torrent(f"{torrent_root}/seed", {"movie/movie.mkv": 300 * 1024, "movie/movie.srt": 100})
+    infohash = str(info.info_hashes().v1)
+    store = MetadataStore(f"{torrent_root}/metadata")
+
+    assert infohash not in store
+    assert store.save(infohash, info)
+    assert infohash in store
+
+    loaded = store.load(infohash.upper())
+    assert loaded.info_hashes() == info.info_hashes()
+    assert loaded.name() == "movie"
+    assert loaded.total_size() == info.total_size()
+
+@pytest.mark.unit
+@pytest.mark.download
+def test_load_rejects_mismatched_or_corrupt_entries(torrent_root):
+    """Test that entries that do not hash to their infohash are ignored"""
+    info = make_torrent(f"{torrent_root}/seed", {"movie/movie.mkv": 300 * 1024})
+    store = MetadataStore(f"{torrent_root}/metadata")
+    other = "ab" * 20
+    with open(store.path_for(other), "wb") as f:
+        f.write(info.info_section())
+    with open(store.path_for("cd" * 20), "wb") as f:
+        f.write(b"not bencoded")
+
+    assert store.load(other) is None
+    assert store.load("cd" * 20) is None
+    assert store.load("ef" * 20) is None
+    assert not os.path.exists(store.path_for(other) + ".tmp")
+
+@pytest.mark.unit
+@pytest.mark.download
+def test_manifest_is_cached_next_to_the_metadata(torrent_root):
+    """Test that a saved manifest loads back with its files reclassified against the given extensions"""
+    manifest = FileManifest(["show/e01.mkv", "show/e01.srt", "show/info.nfo"], [700, 30, 2], frozenset({".mkv"}),
+                            name="show")
+    store = MetadataStore(f"{torrent_root}/metadata")
+
+    assert store.load_manifest("ab" * 20) is None
+    assert store.save_manifest("ab" * 20, manifest)
+    loaded = store.load_manifest("AB" * 20, frozenset({".mkv", ".srt"}))
+
+    assert (loaded.name, loaded.paths, list(loaded.offsets)) == ("show", manifest.paths, [0, 700, 730])
+    assert loaded.priorities() == [4, 4, 0]
+    with open(store.manifest_path_for("cd" * 20), "w") as f:
+        f.write('{"paths": ["a"]}')
+    assert store.load_manifest("cd" * 20) is None
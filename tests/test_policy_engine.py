@@ -0,0 +1,143 @@
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock
+
+import libtorrent as lt
+import pytest
+
+import policy_engine
+from policy_engine import BandwidthWindow, PolicyEngine
+from session_manager import ManagedTorrent, SessionManager
+from tests.local_swarm import LOCAL_SETTINGS, connect, magnet, make_torrent, start_seeder, wait_for
+
+KB = 1024
+
+def _torrent(infohash, state=lt.torrent_status.downloading, uploaded=0, size=100 * KB, seeded=0):
+    torrent = ManagedTorrent(infohash, None, "./downloads")
+    torrent.handle = MagicMock()
+    torrent.last_status = MagicMock(state=state, all_time_upload=uploaded, total_wanted=size,
+                                    seeding_duration=timedelta(seconds=seeded))
+    torrent.last_status.name = infohash
+    return torrent
+
+@pytest.fixture
+def manager():
+    manager = MagicMock()
+    manager.session.get_peer_class.return_value = {'label': 'global', 'upload_limit': 0, 'download_limit': 0}
+    manager.hosted_torrents.return_value = []
+    return manager
+
+@pytest.mark.unit
+@pytest.mark.download
+def test_schedule_sets_global_peer_class_limits(manager):
+    """Test that the matching time-of-day window overrides the base global limits"""
+    night = BandwidthWindow.parse("23:00", "07:00", upload_limit=0, download_limit=0)
+    evening = BandwidthWindow.parse("18:00", "23:00", upload_limit=100 * KB, download_limit=500 * KB)
+    policy = PolicyEngine(manager, upload_limit=50 * KB, download_limit=200 * KB, schedule=[night, evening])
+
+    assert policy.global_limits(datetime(2026, 1, 1, 2, 30)) == (0, 0)
+    assert policy.global_limits(datetime(2026, 1, 1, 19, 0)) == (100 * KB, 500 * KB)
+    assert policy.global_limits(datetime(2026, 1, 1, 12, 0)) == (50 * KB, 200 * KB)
+
+    policy.set_schedule([])
+    policy.set_global_limits(upload_limit=10 * KB)
+    peer_class = manager.session.set_peer_class.call_args.args[1]
+    assert manager.session.set_peer_class.call_args.args[0] == lt.session.global_peer_class_id
+    assert (peer_class['upload_limit'], peer_class['download_limit']) == (10 * KB, 200 * KB)
+
+@pytest.mark.unit
+@pytest.mark.download
+def test_watched_torrent_gets_priority(manager):
+    """Test that other torrents are capped at the background limits only while something is watched"""
+    stream, seeding = _torrent("aa" * 20), _torrent("bb" * 20, state=lt.torrent_status.seeding)
+    manager.hosted_torrents.return_value = [stream, seeding]
+    policy = PolicyEngine(manager, background_upload_limit=32 * KB, background_download_limit=0)
+    policy.set_torrent_limits("BB" * 20, upload_limit=100 * KB)
+    seeding.handle.set_upload_limit.assert_called_with(100 * KB)
+
+    with policy.watch(stream.infohash):
+        assert policy.watching == {stream.infohash}
+        assert policy.torrent_limits(stream.infohash) == (0, 0)
+        seeding.handle.set_upload_limit.assert_called_with(32 * KB)
+        seeding.handle.set_download_limit.assert_called_with(0)
+
+    assert policy.watching == set()
+    seeding.handle.set_upload_limit.assert_called_with(100 * KB)
+
+@pytest.mark.unit
+@pytest.mark.download
+def test_seeding_targets_retire_torrents(manager):
+    """Test that torrents past the ratio or seed time target are retired, unless watched"""
+    by_ratio = _torrent("aa" * 20, state=lt.torrent_status.seeding, uploaded=250 * KB)
+    by_time = _torrent("bb" * 20, state=lt.torrent_status.seeding, seeded=7200)
+    watched = _torrent("cc" * 20, state=lt.torrent_status.seeding, uploaded=500 * KB)
+    downloading = _torrent("dd" * 20, uploaded=500 * KB)
+    manager.hosted_torrents.return_value = [by_ratio, by_time, watched, downloading]
+    policy = PolicyEngine(manager)
+    policy.start_watching(watched.infohash)
+
+    policy.set_seed_targets(seed_ratio=2.0, seed_time=3600)
+    assert policy.retired == {by_ratio.infohash, by_time.infohash}
+    assert [call.args[0] for call in manager.pause.call_args_list] == [by_ratio.infohash, by_time.infohash]
+
+    policy.set_seed_targets(seed_ratio=2.0)
+    assert manager.pause.call_count == 2
+
+    with pytest.raises(ValueError):
+        PolicyEngine(manager, retire="delete")
+
+@pytest.mark.unit
+@pytest.mark.download
+def test_schedule_and_removals_tracked_without_torrent_events(manager, monkeypatch):
+    """Test that windows switch on the engine's timer and removed torrents are forgotten"""
+    clock = [datetime(2026, 1, 1, 12, 0)]
+    class FakeDateTime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return clock[0]
+    monkeypatch.setattr(policy_engine, "datetime", FakeDateTime)
+    first, second = _torrent("aa" * 20), _torrent("bb" * 20)
+    manager.hosted_torrents.return_value = [first, second]
+    evening = BandwidthWindow.parse("18:00", "23:00", upload_limit=100 * KB)
+    policy = PolicyEngine(manager, upload_limit=50 * KB, schedule=[evening], interval=0.02)
+    try:
+        assert manager.session.set_peer_class.call_args.args[1]['upload_limit'] == 50 * KB
+        clock[0] = datetime(2026, 1, 1, 19, 0)
+        assert wait_for(lambda: manager.session.set_peer_class.call_args.args[1]['upload_limit'] == 100 * KB,
+                        timeout=5)
+
+        policy.set_torrent_limits(second.infohash, upload_limit=10 * KB)
+        manager.hosted_torrents.return_value = [first]
+        policy.set_torrent_limits(second.infohash, upload_limit=20 * KB)
+        second.handle.set_upload_limit.assert_called_with(10 * KB)
+        assert set(policy._applied) == {first.infohash}
+    finally:
+        policy.close()
+    assert not policy._thread.is_alive()
+
+@pytest.fixture
+def swarm():
+    root = tempfile.mkdtemp()
+    try:
+        yield root
+    finally:
+        shutil.rmtree(root)
+
+@pytest.mark.integration
+@pytest.mark.download
+def test_finished_torrent_is_retired(swarm):
+    """Test that a torrent reaching its seed ratio target is paused by the alert loop"""
+    info = make_torrent(f"{swarm}/seed", {"clip/clip.mkv": 2 * 1024 * KB})
+    seeder, _ = start_seeder(info, f"{swarm}/seed")
+    manager = SessionManager(settings=LOCAL_SETTINGS, update_interval=0.1)
+    policy = PolicyEngine(manager, seed_ratio=0.0)
+    try:
+        infohash = manager.add(magnet(info), f"{swarm}/downloads")
+        connect(manager.handle(infohash), seeder)
+        assert manager.wait_until_finished(infohash, timeout=10)
+        assert wait_for(lambda: manager.status(infohash)["state"] == "paused", timeout=5)
+        assert policy.retired == {infohash}
+    finally:
+        policy.close()
+        manager.close()
@@ -0,0 +1,58 @@
+import os
+import json
+import pytest
+
+# No need for sys.path manipulation - conftest.py handles it
+from prompt_registry import PromptRegistry, PromptError
+
+@pytest.fixture
+def prompts_file(tmp_path):
+    path = tmp_path / "prompts.yaml"
+    path.write_text(open("prompts.yaml").read())
+    return path
+
+@pytest.mark.unit
+@pytest.mark.seer
+def test_registry_builds_stable_few_shot_prefix(prompts_file):
+    """Test that every request starts with the same system + few-shot messages"""
+    registry = PromptRegistry(str(prompts_file))
+
+    first = registry.movie_messages("Inception")
+    second = registry.movie_messages("The Matrix")
+
+    assert [m["role"] for m in first] == ["system", "user", "assistant", "user"]
+    assert json.dumps(first[:-1]) == json.dumps(second[:-1])
+    assert json.loads(first[2]["content"]) == {"title": "Wall-E", "year": 2008}
+    assert first[-1]["content"].endswith('"Inception"\n')
+    assert registry.reloads == 1
+
+@pytest.mark.unit
+@pytest.mark.seer
+def test_registry_reloads_only_when_file_changes(prompts_file):
+    """Test mtime-based reloads and that invalid edits keep the previous prompts"""
+    registry = PromptRegistry(str(prompts_file))
+    version = registry.version
+    for _ in range(10):
+        registry.movie_messages("Inception")
+    assert registry.reloads == 1
+
+    prompts_file.write_text(prompts_file.read_text().replace("helpful assistant", "precise assistant"))
+    os.utime(prompts_file, ns=(0, 10**18))
+    assert "precise assistant" in registry.system_prompt
+    assert registry.version != version
+    assert registry.reloads == 2
+
+    # Broken template: unknown placeholder
+    prompts_file.write_text("retrieve_movie_year: 'Find {film}'\n")
+    os.utime(prompts_file, ns=(0, 2 * 10**18))
+    assert "precise assistant" in registry.system_prompt
+    assert registry.reloads == 2
+
+@pytest.mark.unit
+@pytest.mark.seer
+def test_registry_rejects_invalid_prompts_on_first_load(tmp_path):
+    """Test validation of required templates"""
+    path = tmp_path / "prompts.yaml"
+    path.write_text("system_prompt: hello\n")
+    with pytest.raises(PromptError):
+        PromptRegistry(str(path))
@@ -0,0 +1,46 @@
+import os
+import tempfile
+
+import libtorrent as lt
+import pytest
+
+from resume_store import ResumeStore
+
+INFOHASH = "ab" * 20
+
+@pytest.fixture
+def store():
+    with tempfile.TemporaryDirectory() as root:
+        yield ResumeStore(os.path.join(root, "resume"))
+
+@pytest.mark.unit
+@pytest.mark.download
+def test_save_and_load_round_trip(store):
+    """Test that resume data is written atomically and read back by infohash"""
+    params = lt.parse_magnet_uri(f"magnet:?xt=urn:btih:{INFOHASH}&dn=movie")
+    params.save_path = "/data/movies"
+
+    assert store.save(INFOHASH.upper(), params)
+    assert os.listdir(store.directory) == [f"{INFOHASH}.fastresume"]
+
+    loaded = store.load(INFOHASH)
+    assert str(loaded.info_hashes.v1) == INFOHASH
+    assert loaded.save_path == "/data/movies"
+    assert loaded.name == "movie"
+
+@pytest.mark.unit
+@pytest.mark.download
+def test_load_all_skips_unreadable_entries(store):
+    """Test that corrupt files and stray files are ignored and removed entries are forgotten"""
+    store.save(INFOHASH, lt.parse_magnet_uri(f"magnet:?xt=urn:btih:{INFOHASH}"))
+    with open(store.path_for("cd" * 20), "wb") as f:
+        f.write(b"not bencoded")
+    with open(os.path.join(store.directory, "notes.txt"), "w") as f:
+        f.write("ignored")
+
+    assert [infohash for infohash, _ in store.load_all()] == [INFOHASH]
+    assert store.load("ef" * 20) is None
+
+    store.remove(INFOHASH)
+    store.remove(INFOHASH)
+    assert store.infohashes() == ["cd" * 20]
@@ -0,0 +1,52 @@
+import pytest
+import numpy as np
+
+# No need for sys.path manipulation - conftest.py handles it
+import scoring
+from crawler import TorrentResult
+
+NOW = 1_704_110_400.0  # 2024-01-01 12:00 UTC
+
+@pytest.mark.unit
+@pytest.mark.crawler
+def test_parse_release_name():
+    """Test release-name attribute extraction"""
+    info = scoring.parse_release_name("Batman.Begins.2005.2160p.UHD.BluRay.REMUX.HDR.HEVC-FGT")
+    assert info == scoring.ReleaseInfo(2160, 'x265', 'remux', True, 'FGT')
+
+    info = scoring.parse_release_name("Batman Begins 2005 HDCAM XviD")
+    assert info.source == 'cam' and info.resolution == 0
+
+@pytest.mark.unit
+@pytest.mark.crawler
+def test_scoring_prefers_quality_over_raw_seeders():
+    """Test that a well-seeded CAM and an oversized remux lose to a sane 1080p release"""
+    pub_date = "Mon, 01 Jan 2024 12:00:00 +0000"
+    cam = TorrentResult(title="Batman.Begins.2005.HDCAM.x264-NoGroup", size=1400 * 1024**2,
+                        seeders=4000, leechers=100, pub_date=pub_date)
+    remux = TorrentResult(title="Batman.Begins.2005.1080p.BluRay.REMUX.AVC-FGT", size=80 * 1024**3,
+                          seeders=400, leechers=20, pub_date=pub_date)
+    bluray = TorrentResult(title="Batman.Begins.2005.1080p.BluRay.x264-SPARKS", size=8 * 1024**3,
+                           seeders=300, leechers=20, pub_date=pub_date)
+
+    ranked = scoring.top_scored([cam, remux, bluray], k=3, runtime_minutes=140, now=NOW)
+
+    assert [result for _, result in ranked] == [bluray, remux, cam]
+
+@pytest.mark.unit
+@pytest.mark.crawler
+def test_scoring_weights_are_configurable():
+    """Test that weights change the ranking and unknown keys are ignored"""
+    results = [
+        TorrentResult(title="Movie.2005.480p.DVDRip.XviD", size=700 * 1024**2, seeders=5000),
+        TorrentResult(title="Movie.2005.1080p.BluRay.x264", size=8 * 1024**3, seeders=5),
+    ]
+    seeders_only = scoring.ScoringWeights.from_dict({field: 0 for field in vars(scoring.ScoringWeights())})
+    seeders_only.seeders = 1.0
+
+    default_scores = scoring.score_results(results, now=NOW)
+    seeder_scores = scoring.score_results(results, weights=seeders_only, now=NOW)
+
+    assert np.argmax(default_scores) == 1
+    assert np.argmax(seeder_scores) == 0
+    assert scoring.ScoringWeights.from_dict({'bogus': 1}) == scoring.ScoringWeights()
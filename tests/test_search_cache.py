@@ -0,0 +1,71 @@
+import time
+import pytest
+from unittest.mock import MagicMock, patch
+
+# No need for sys.path manipulation - conftest.py handles it
+import crawler
+from search_cache import SearchCache, make_cache_key
+
+def _results():
+    return [crawler.TorrentResult(title="Batman.Begins.2005.1080p", size=2 * 1024**3, seeders=50, leechers=5)]
+
+@pytest.mark.unit
+@pytest.mark.crawler
+def test_cache_key_is_normalized():
+    """Test that equivalent searches share a cache key"""
+    assert make_cache_key("  Batman   BEGINS ", 2005, 100, "yts,1337x") == \
+        make_cache_key("batman begins", "2005", 100, "1337x, yts")
+    assert make_cache_key("batman begins", None) != make_cache_key("batman begins", 2005)
+
+@pytest.mark.unit
+@pytest.mark.crawler
+def test_cache_persists_to_disk(tmp_path):
+    """Test that repeat lookups hit the cache, including from a fresh process"""
+    path = str(tmp_path / "cache.sqlite3")
+    fetch = MagicMock(return_value=_results())
+    key = make_cache_key("Batman Begins", 2005)
+
+    cache = SearchCache(path=path, ttl=60, record_type=crawler.TorrentResult)
+    cache.get_or_fetch(key, fetch)
+    cache.get_or_fetch(key, fetch)
+    assert fetch.call_count == 1
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+    cache.close()
+
+    # A new cache over the same file is warm from the start
+    reopened = SearchCache(path=path, ttl=60, record_type=crawler.TorrentResult)
+    results = reopened.get_or_fetch(key, fetch)
+    assert fetch.call_count == 1
+    assert results == _results()
+    reopened.close()
+
+@pytest.mark.unit
+@pytest.mark.crawler
+def test_cache_serves_stale_while_revalidating():
+    """Test that stale entries are returned immediately and refreshed in the background"""
+    cache = SearchCache(ttl=0.05, stale_ttl=60)
+    key = make_cache_key("Inception")
+    cache.put(key, [{'title': 'old'}])
+    time.sleep(0.1)
+
+    refreshed = [{'title': 'new'}]
+    results = cache.get_or_fetch(key, lambda: refreshed)
+    assert results == [{'title': 'old'}]
+
+    deadline = time.monotonic() + 2
+    while cache.get(key)[0] != refreshed and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert cache.get(key)[0] == refreshed
+    assert cache.stats()['stale_hits'] == 1 and cache.stats()['refreshes'] == 1
+
+@pytest.mark.unit
+@pytest.mark.crawler
+def test_search_movie_does_not_cache_failures():
+    """Test that a failed Jackett request is not cached"""
+    fetch = MagicMock(side_effect=[crawler.requests.ConnectionError("down"), _results()])
+    with patch('crawler._search_cache', SearchCache(ttl=60, record_type=crawler.TorrentResult)), \
+         patch('crawler.fetch_torznab', fetch):
+        assert crawler.search_movie("Batman Begins") == []
+        assert crawler.search_movie("Batman Begins") == _results()
+        assert crawler.search_movie("Batman Begins") == _results()
+    assert fetch.call_count == 2
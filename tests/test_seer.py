@@ -2,9 +2,15 @@ import pytest
 import json
 import sys
 import os
+import re
+import time
+import asyncio
 from io import StringIO
+from unittest.mock import MagicMock
 
+import resolution_cache
 import seer
+from resolution_cache import ResolutionCache
 
 @pytest.mark.integration
 @pytest.mark.seer
@@ -47,4 +53,281 @@ def test_seer_with_inception():
         
     finally:
         # Reset stdout
-        sys.stdout = sys.__stdout__
\ No newline at end of file
+        sys.stdout = sys.__stdout__
+
+def _mock_client(*contents):
+    """OpenAI client mock returning the given completion contents in order"""
+    client = MagicMock()
+    client.chat.completions.create.side_effect = [
+        MagicMock(choices=[MagicMock(message=MagicMock(content=content))]) for content in contents
+    ]
+    return client
+
+@pytest.mark.unit
+@pytest.mark.seer
+def test_get_movie_info_uses_resolution_cache(tmp_path):
+    """Test that repeat and equivalent queries are answered from the cache"""
+    seer.configure_resolution_cache(str(tmp_path / "seer_cache.sqlite3"))
+    client = _mock_client('{"title": "Batman Begins", "year": 2005}')
+
+    first = seer.get_movie_info("Batman Begins", client, "test-model")
+    second = seer.get_movie_info("  batman begins!! ", client, "test-model")
+
+    assert first == second == {"title": "Batman Begins", "year": 2005}
+    assert client.chat.completions.create.call_count == 1
+    assert seer.get_resolution_cache().stats()["hits"] == 1
+
+    # A fresh process over the same file is warm
+    seer.configure_resolution_cache(str(tmp_path / "seer_cache.sqlite3"))
+    assert seer.get_movie_info("BATMAN BEGINS", client, "test-model")["year"] == 2005
+    assert client.chat.completions.create.call_count == 1
+
+@pytest.mark.unit
+@pytest.mark.seer
+def test_resolution_cache_invalidated_when_prompts_change(tmp_path, monkeypatch):
+    """Test that editing prompts.yaml drops cached answers, and errors are never cached"""
+    prompts_path = tmp_path / "prompts.yaml"
+    prompts_path.write_text(open("prompts.yaml").read())
+    monkeypatch.setattr(seer, "DEFAULT_PROMPTS_PATH", str(prompts_path))
+    seer.configure_resolution_cache(None)
+    client = _mock_client(
+        'not json at all', 'still not json',
+        '{"title": "Inception", "year": 2010}',
+        '{"title": "Inception", "year": 2010}',
+    )
+
+    assert "error" in seer.get_movie_info("Inception", client, "test-model")
+    assert seer.get_movie_info("Inception", client, "test-model")["year"] == 2010
+    assert seer.get_movie_info("Inception", client, "test-model")["year"] == 2010
+    assert client.chat.completions.create.call_count == 3
+
+    prompts_path.write_text(prompts_path.read_text() + "\n# tweaked\n")
+    os.utime(prompts_path, ns=(0, 10**18))
+    assert seer.get_movie_info("Inception", client, "test-model")["year"] == 2010
+    assert client.chat.completions.create.call_count == 4
+
+@pytest.mark.unit
+@pytest.mark.seer
+def test_fix_reply_is_validated(tmp_path):
+    """Test that a fix reply without an integer year is reported as an error and not cached"""
+    seer.configure_resolution_cache(str(tmp_path / "seer_cache.sqlite3"))
+    client = _mock_client('no answer here', '{"title": "Heat", "year": "unknown"}')
+
+    movie_data = seer.get_movie_info("Heat", client, "test-model")
+
+    assert "after fix attempt" in movie_data["error"]
+    assert seer.get_resolution_cache().get("Heat", "test-model", seer.prompt_version()) is None
+
+@pytest.mark.unit
+@pytest.mark.seer
+def test_resolution_cache_memory_hits_keep_entries_on_disk(tmp_path, monkeypatch):
+    """Test that entries served from memory count as recently used when the disk tier evicts"""
+    clock = iter(range(1, 100))
+    monkeypatch.setattr(resolution_cache.time, "time", lambda: next(clock))
+    path = str(tmp_path / "seer_cache.sqlite3")
+    cache = ResolutionCache(path, max_entries=2)
+    cache.put("Heat", "test-model", "v1", {"title": "Heat", "year": 1995})
+    cache.put("Alien", "test-model", "v1", {"title": "Alien", "year": 1979})
+    assert cache.get("Heat", "test-model", "v1")["year"] == 1995
+    cache.put("Ronin", "test-model", "v1", {"title": "Ronin", "year": 1998})
+    cache.close()
+
+    cache = ResolutionCache(path, max_entries=2)
+    assert cache.get("Heat", "test-model", "v1")["year"] == 1995
+    assert cache.get("Alien", "test-model", "v1") is None
+    cache.close()
+
+class _FakeAsyncClient:
+    """Async OpenAI client stand-in answering every request after a delay"""
+
+    def __init__(self, delay=0.1):
+        self.delay = delay
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.requests = []
+        self.chat = MagicMock()
+        self.chat.completions.create = self.create
+
+    async def create(self, model, messages, **kwargs):
+        self.requests.append(messages)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.in_flight -= 1
+        prompt = messages[-1]["content"]
+        if "### User inputs" in prompt:
+            names = re.findall(r'^\d+\. "(.*)"$', prompt, re.M)
+            content = json.dumps({"results": [{"title": name.title(), "year": 2000} for name in names]})
+        else:
+            name = re.findall(r'"(.*)"', prompt)[-1]
+            content = json.dumps({"title": name.title(), "year": 2000})
+        return MagicMock(choices=[MagicMock(message=MagicMock(content=content))])
+
+@pytest.mark.unit
+@pytest.mark.seer
+def test_resolve_many_bounded_concurrency_and_streaming():
+    """Test that titles resolve concurrently up to the limit and stream back as JSON lines"""
+    seer.configure_resolution_cache(None)
+    seer.get_resolution_cache().put("cached one", "test-model", seer.prompt_version(),
+                                    {"title": "Cached One", "year": 1999})
+    client = _FakeAsyncClient(delay=0.1)
+    titles = ["cached one"] + [f"movie {i}" for i in range(20)]
+    output = StringIO()
+
+    start = time.monotonic()
+    results = asyncio.run(seer.run_batch(titles, client, "test-model", concurrency=5,
+                                         pack_size=1, use_cache=True, output=output))
+    elapsed = time.monotonic() - start
+
+    assert client.max_in_flight == 5
+    assert len(client.requests) == 20
+    # 20 requests at 5 in flight take ~4 rounds, not 20
+    assert elapsed < 1.0
+    lines = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert lines[0] == {"query": "cached one", "index": 0, "title": "Cached One", "year": 1999}
+    assert sorted(line["index"] for line in lines) == list(range(21))
+    assert len(results) == 21
+
+@pytest.mark.unit
+@pytest.mark.seer
+def test_resolve_many_packs_titles_into_one_completion():
+    """Test packing several titles into a single structured completion"""
+    client = _FakeAsyncClient(delay=0)
+
+    async def collect():
+        return [r async for r in seer.resolve_many_async(
+            [f"film {i}" for i in range(7)], client, "test-model", pack_size=3, use_cache=False)]
+
+    results = sorted(asyncio.run(collect()), key=lambda r: r["index"])
+
+    assert len(client.requests) == 3
+    assert [r["title"] for r in results] == [f"Film {i}" for i in range(7)]
+
+@pytest.mark.unit
+@pytest.mark.seer
+@pytest.mark.parametrize("content", [
+    '```json\n{"title": "Inception", "year": 2010}\n```',
+    'Sure! Here is the movie: {"title": "Inception", "year": 2010} Let me know if you need more.',
+    "{'title': 'Inception', 'year': '2010'}",
+    'title: "Inception", year: 2010',
+])
+def test_repair_movie_json(content):
+    """Test local repair of fenced, prose-wrapped and single-quoted answers"""
+    assert seer.repair_movie_json(content) == {"title": "Inception", "year": 2010}
+
+@pytest.mark.unit
+@pytest.mark.seer
+def test_local_repair_avoids_fix_round_trip(monkeypatch):
+    """Test that repairable output never triggers the LLM fix request"""
+    monkeypatch.setattr(seer, "_resolution_paths", seer.Counter())
+    client = _mock_client('Here you go:\n```json\n{"title": "Inception", "year": 2010}\n```')
+
+    movie_data = seer.get_movie_info("Inception", client, "test-model", use_cache=False)
+
+    assert movie_data == {"title": "Inception", "year": 2010}
+    assert client.chat.completions.create.call_count == 1
+    assert seer.get_resolution_path_stats() == {"repaired": 1, "llm_fix_rate": 0.0}
+
+@pytest.mark.unit
+@pytest.mark.seer
+def test_structured_output_requested_and_dropped_when_rejected(monkeypatch):
+    """Test that the JSON schema is sent, and omitted after the server rejects it"""
+    monkeypatch.setattr(seer, "_rejected_response_formats", set())
+    client = MagicMock()
+    ok = MagicMock(choices=[MagicMock(message=MagicMock(content='{"title": "Inception", "year": 2010}'))])
+    rejected = seer.openai.BadRequestError("response_format not supported",
+                                           response=MagicMock(status_code=400), body=None)
+    client.chat.completions.create.side_effect = [rejected, ok, ok]
+
+    assert seer.get_movie_info("Inception", client, "test-model", use_cache=False)["year"] == 2010
+    assert seer.get_movie_info("Inception", client, "test-model", use_cache=False)["year"] == 2010
+
+    calls = client.chat.completions.create.call_args_list
+    assert calls[0].kwargs["response_format"]["json_schema"]["schema"] == seer.MOVIE_JSON_SCHEMA
+    assert calls[0].kwargs["max_tokens"] == seer.MOVIE_MAX_TOKENS
+    assert "response_format" not in calls[1].kwargs
+    assert "response_format" not in calls[2].kwargs
+
+class _FakeStream:
+    """Streamed completion stand-in that records how far it was consumed"""
+
+    def __init__(self, pieces):
+        self.pieces = pieces
+        self.consumed = 0
+        self.closed = False
+
+    def __iter__(self):
+        for piece in self.pieces:
+            self.consumed += 1
+            yield MagicMock(choices=[MagicMock(delta=MagicMock(content=piece))])
+
+    def close(self):
+        self.closed = True
+
+@pytest.mark.unit
+@pytest.mark.seer
+def test_movie_stream_parser_handles_split_chunks():
+    """Test that objects split across chunks, with braces inside strings, are found once closed"""
+    parser = seer.MovieStreamParser()
+    pieces = ['Sure! {"tit', 'le": "Se7en {director', "'s cut}\", ", '"year": 19', '95}', ' Enjoy the film!']
+    results = [parser.feed(piece) for piece in pieces]
+    assert results[:4] == [None] * 4
+    assert results[4] == {"title": "Se7en {director's cut}", "year": 1995}
+    assert parser.leading_text
+
+@pytest.mark.unit
+@pytest.mark.seer
+def test_streaming_stops_generation_after_valid_answer(monkeypatch):
+    """Test that the stream is closed as soon as a valid object arrives, and timings are recorded"""
+    monkeypatch.setattr(seer, "STREAM_COMPLETIONS", True)
+    stream = _FakeStream(['{"title": ', '"Heat", ', '"year": 1995}', '\n\nHeat is a crime', ' thriller'] * 10)
+    client = MagicMock()
+    client.chat.completions.create.return_value = stream
+
+    assert seer.get_movie_info("heat", client, "test-model", use_cache=False) == {"title": "Heat", "year": 1995}
+    assert client.chat.completions.create.call_args.kwargs["stream"] is True
+    assert stream.consumed == 3
+    assert stream.closed
+    stats = seer.get_stream_stats()
+    assert stats["stopped_early"] >= 1
+    assert stats["ttft_p50"] is not None and stats["answer_p50"] is not None
+
+@pytest.mark.unit
+@pytest.mark.seer
+def test_streaming_falls_back_to_fix_request(monkeypatch):
+    """Test that a stream without a valid object goes through the usual repair/fix path"""
+    monkeypatch.setattr(seer, "STREAM_COMPLETIONS", True)
+    client = MagicMock()
+    client.chat.completions.create.side_effect = [
+        _FakeStream(["I think you mean ", "the 1995 film Heat."]),
+        MagicMock(choices=[MagicMock(message=MagicMock(content='{"title": "Heat", "year": 1995}'))]),
+    ]
+
+    assert seer.get_movie_info("heat", client, "test-model", use_cache=False) == {"title": "Heat", "year": 1995}
+    assert client.chat.completions.create.call_count == 2
+
+class _FakeAsyncStream(_FakeStream):
+    async def __aiter__(self):
+        for chunk in _FakeStream.__iter__(self):
+            yield chunk
+
+    async def close(self):
+        self.closed = True
+
+@pytest.mark.unit
+@pytest.mark.seer
+def test_async_streaming_stops_generation_after_valid_answer(monkeypatch):
+    """Test early termination on the batch (async) path"""
+    monkeypatch.setattr(seer, "STREAM_COMPLETIONS", True)
+    stream = _FakeAsyncStream(['{"title": "Heat", "year": 1995}', ' and more prose'] * 5)
+
+    async def create(**kwargs):
+        return stream
+
+    client = MagicMock()
+    client.chat.completions.create = create
+    movie_data = asyncio.run(seer.resolve_with_llm_async("heat", client, "test-model"))
+    assert movie_data == {"title": "Heat", "year": 1995}
+    assert stream.consumed == 1 and stream.closed
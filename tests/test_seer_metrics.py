@@ -0,0 +1,102 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+# No need for sys.path manipulation - conftest.py handles it
+import seer
+from seer_metrics import SeerMetrics
+
+def _completion(content, prompt_tokens=120, completion_tokens=12):
+    usage = MagicMock(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+    return MagicMock(choices=[MagicMock(message=MagicMock(content=content))], usage=usage)
+
+@pytest.fixture
+def metrics(monkeypatch):
+    registry = SeerMetrics()
+    monkeypatch.setattr(seer, "_metrics", registry)
+    seer.configure_resolution_cache(None)
+    return registry
+
+@pytest.mark.unit
+@pytest.mark.seer
+def test_prometheus_text_format():
+    """Test counter and cumulative histogram rendering"""
+    registry = SeerMetrics()
+    registry.inc("seer_resolutions_total", model='m"1', prompt_version="v", path="direct")
+    registry.observe("seer_llm_request_seconds", 0.2, model="m", prompt_version="v", purpose="resolve")
+    registry.observe("seer_llm_request_seconds", 3.0, model="m", prompt_version="v", purpose="resolve")
+
+    text = registry.prometheus_text()
+    assert "# TYPE seer_resolutions_total counter" in text
+    assert 'seer_resolutions_total{model="m\\"1",path="direct",prompt_version="v"} 1' in text
+    assert 'seer_llm_request_seconds_bucket{model="m",prompt_version="v",purpose="resolve",le="0.25"} 1' in text
+    assert 'seer_llm_request_seconds_bucket{model="m",prompt_version="v",purpose="resolve",le="+Inf"} 2' in text
+    assert 'seer_llm_request_seconds_count{model="m",prompt_version="v",purpose="resolve"} 2' in text
+
+@pytest.mark.unit
+@pytest.mark.seer
+def test_resolutions_record_tokens_paths_and_cache(metrics):
+    """Test token, fix-path and cache metrics, plus per-request traces, for get_movie_info"""
+    traces = []
+    metrics.add_listener(traces.append)
+    client = MagicMock()
+    client.chat.completions.create.side_effect = [
+        _completion("The film is Heat, 1995."),
+        _completion('{"title": "Heat", "year": 1995}', prompt_tokens=80, completion_tokens=10),
+    ]
+
+    assert seer.get_movie_info("heat", client, "test-model") == {"title": "Heat", "year": 1995}
+    assert seer.get_movie_info("Heat!", client, "test-model") == {"title": "Heat", "year": 1995}
+
+    assert metrics.value("seer_llm_requests_total", purpose="resolve", outcome="ok") == 1
+    assert metrics.value("seer_llm_requests_total", purpose="fix", outcome="ok") == 1
+    assert metrics.value("seer_prompt_tokens_total", model="test-model") == 200
+    assert metrics.value("seer_completion_tokens_total") == 22
+    assert metrics.value("seer_resolutions_total", path="llm_fix") == 1
+    assert metrics.value("seer_resolutions_total", path="cache") == 1
+    assert metrics.value("seer_cache_lookups_total", result="miss") == 1
+    assert metrics.value("seer_cache_lookups_total", result="hit") == 1
+
+    first, second = traces
+    assert (first["query"], first["path"], first["llm_calls"], first["prompt_tokens"]) == ("heat", "llm_fix", 2, 200)
+    assert first["prompt_version"] == seer.prompt_version()
+    assert (second["path"], second["llm_calls"], second["title"]) == ("cache", 0, "Heat")
+
+@pytest.mark.unit
+@pytest.mark.seer
+def test_failed_llm_calls_are_counted(metrics):
+    """Test that errors are recorded as failed requests and resolutions"""
+    client = MagicMock()
+    client.chat.completions.create.side_effect = RuntimeError("server down")
+
+    assert "error" in seer.get_movie_info("heat", client, "test-model", use_cache=False)
+    assert metrics.value("seer_llm_requests_total", outcome="error") == 1
+    assert metrics.value("seer_resolutions_total", path="failed") == 1
+
+def _resolve_packed(client, names):
+    async def collect():
+        return [r async for r in seer.resolve_many_async(names, client, "test-model", pack_size=len(names))]
+    return sorted(asyncio.run(collect()), key=lambda r: r["index"])
+
+@pytest.mark.unit
+@pytest.mark.seer
+def test_packed_answers_are_validated_and_counted(metrics):
+    """Test that packed answers are validated like single ones and packed failures are counted"""
+    client = MagicMock()
+    client.chat.completions.create = AsyncMock(side_effect=[
+        _completion('{"results": [{"title": "Heat", "year": "1995"}, {"title": "Alien", "year": "unknown"}]}'),
+        _completion('{"title": "Alien", "year": 1979}'),
+        RuntimeError("server down"),
+        _completion('{"title": "Ronin", "year": 1998}'),
+        _completion('{"title": "Fargo", "year": 1996}'),
+    ])
+
+    results = _resolve_packed(client, ["heat", "alien"])
+    assert [(r["title"], r["year"]) for r in results] == [("Heat", 1995), ("Alien", 1979)]
+    assert seer.get_resolution_cache().get("heat", "test-model", seer.prompt_version()) == {"title": "Heat", "year": 1995}
+    assert metrics.value("seer_llm_requests_total", purpose="packed", outcome="ok") == 1
+    assert client.chat.completions.create.call_args_list[0].kwargs["response_format"]["json_schema"]["name"] == "movies"
+
+    results = _resolve_packed(client, ["ronin", "fargo"])
+    assert [r["year"] for r in results] == [1998, 1996]
+    assert metrics.value("seer_llm_requests_total", purpose="packed", outcome="error") == 1
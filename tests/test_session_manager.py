@@ -0,0 +1,204 @@
+import os
+import pytest
+import tempfile
+import shutil
+import threading
+from unittest.mock import patch, MagicMock
+
+# No need for sys.path manipulation - conftest.py handles it
+import libtorrent as lt
+from metadata_store import MetadataStore
+from resume_store import ResumeStore
+from session_manager import ALERT_MASK, PROFILES, SessionManager, TorrentLimitError, profile_settings
+from tests.local_swarm import LOCAL_SETTINGS, connect, magnet, make_torrent, start_seeder, wait_for
+
+def _params(infohash):
+    params = MagicMock()
+    params.info_hashes.has_v1.return_value = True
+    params.info_hashes.v1 = infohash
+    return params
+
+@pytest.fixture
+def mock_manager():
+    session = MagicMock()
+    session.add_torrent.side_effect = lambda params: MagicMock(name=params.info_hashes.v1)
+    with patch('libtorrent.session', return_value=session), patch('os.makedirs'):
+        yield SessionManager(max_torrents=2, max_pending=1)
+
+@pytest.mark.unit
+@pytest.mark.download
+def test_admission_queue_and_registry(mock_manager):
+    """Test that torrents beyond max_torrents wait for a slot and duplicates are not re-added"""
+    first = mock_manager.add(_params("AA" * 20))
+    second = mock_manager.add(_params("bb" * 20))
+    third = mock_manager.add(_params("cc" * 20))
+
+    assert first == "aa" * 20
+    assert mock_manager.add(_params("aa" * 20)) == first
+    assert mock_manager.session.add_torrent.call_count == 2
+    assert mock_manager.handle(third) is None
+    assert mock_manager.status(third)["state"] == "pending"
+    assert mock_manager.flush(third, timeout=1) is False
+    with pytest.raises(TorrentLimitError):
+        mock_manager.add(_params("dd" * 20))
+
+    mock_manager.remove(first)
+    assert mock_manager.handle(third) is not None
+    assert mock_manager.session.add_torrent.call_count == 3
+    with pytest.raises(KeyError):
+        mock_manager.get(first)
+
+    mock_manager.pause(second)
+    handle = mock_manager.handle(second)
+    handle.unset_flags.assert_called_once_with(lt.torrent_flags.auto_managed)
+    handle.pause.assert_called_once()
+
+@pytest.mark.unit
+@pytest.mark.download
+def test_wait_returns_for_failed_torrent(mock_manager):
+    """Test that waits on a failed torrent return at once, even after later progress updates"""
+    infohash = mock_manager.add(_params("ee" * 20))
+    handle = mock_manager.handle(infohash)
+    mock_manager._on_torrent_error(MagicMock(handle=handle, message=lambda: "disk full"))
+    mock_manager._on_state_update(MagicMock(status=[MagicMock(handle=handle, state=lt.torrent_status.downloading)]))
+
+    result = []
+    waiter = threading.Thread(target=lambda: result.append(mock_manager.wait_until_finished(infohash)), daemon=True)
+    waiter.start()
+    waiter.join(timeout=5)
+    assert result == [False]
+    assert mock_manager.get(infohash).finished.is_set()
+
+@pytest.mark.unit
+@pytest.mark.download
+@pytest.mark.parametrize("profile", list(PROFILES))
+def test_profiles_keep_alert_mask_and_queue_limits(profile):
+    """Test that every profile applies its settings but keeps the consumed alerts and the manager's queue sizes"""
+    with patch('libtorrent.session') as session:
+        SessionManager(profile=profile, active_downloads=2, active_seeds=3, settings={'connections_limit': 42})
+    settings = session.call_args.args[0]
+
+    assert settings['alert_mask'] == ALERT_MASK
+    assert (settings['active_downloads'], settings['active_seeds'], settings['active_limit']) == (2, 3, 5)
+    assert settings['connections_limit'] == 42
+    for name, value in profile_settings(profile).items():
+        if name != 'connections_limit':
+            assert settings[name] == value
+
+@pytest.mark.unit
+@pytest.mark.download
+def test_unknown_profile_is_rejected():
+    """Test that a misspelled profile name fails with the valid choices"""
+    with pytest.raises(ValueError, match="low-memory"):
+        SessionManager(profile="low_memory")
+
+@pytest.fixture
+def swarm():
+    root = tempfile.mkdtemp()
+    seeds = []
+    try:
+        def seed(files, seed=0):
+            info = make_torrent(f"{root}/seed", files, seed=seed)
+            seeds.append(start_seeder(info, f"{root}/seed"))
+            return info, seeds[-1][0]
+        yield root, seed
+    finally:
+        shutil.rmtree(root)
+
+@pytest.mark.integration
+@pytest.mark.download
+def test_manager_downloads_from_local_swarm(swarm):
+    """Test that one session downloads several torrents and reports their status"""
+    root, seed = swarm
+    manager = SessionManager(settings=LOCAL_SETTINGS)
+    sources = [seed({f"movie{i}/movie{i}.mkv": 2 * 1024 * 1024}, seed=i) for i in range(3)]
+
+    infohashes = []
+    for info, seeder in sources:
+        infohash = manager.add(magnet(info), f"{root}/downloads")
+        connect(manager.handle(infohash), seeder)
+        infohashes.append(infohash)
+
+    assert wait_for(lambda: all(manager.status(h)["state"] == "seeding" for h in infohashes), timeout=20)
+    assert [status["name"] for status in manager.torrents()] == ["movie0", "movie1", "movie2"]
+    manager.remove(infohashes[0])
+    assert len(manager.torrents()) == 2
+
+@pytest.mark.integration
+@pytest.mark.download
+def test_alert_loop_reports_events(swarm):
+    """Test that metadata, progress and completion arrive as events from the alert loop"""
+    root, seed = swarm
+    manager = SessionManager(settings=LOCAL_SETTINGS, update_interval=0.1)
+    info, seeder = seed({"film/film.mkv": 4 * 1024 * 1024})
+    events = []
+    manager.subscribe(lambda event, torrent: events.append((event, torrent.infohash)))
+
+    infohash = manager.add(magnet(info), f"{root}/downloads")
+    connect(manager.handle(infohash), seeder)
+    try:
+        assert manager.wait_for_metadata(infohash, timeout=10)
+        assert manager.wait_until_finished(infohash, timeout=10)
+        assert manager.running
+        assert wait_for(lambda: manager.torrents()[0]["state"] == "seeding")
+    finally:
+        manager.close()
+
+    names = [event for event, key in events if key == infohash]
+    assert names.index("metadata") < names.index("finished")
+    assert "progress" in names
+    assert not manager.running
+
+@pytest.mark.integration
+@pytest.mark.download
+def test_resume_store_restores_torrents(swarm):
+    """Test that a new session restored from saved resume data seeds again without the swarm"""
+    root, seed = swarm
+    store = ResumeStore(f"{root}/resume")
+    manager = SessionManager(settings=LOCAL_SETTINGS, resume_store=store)
+    info, seeder = seed({"show/show.mkv": 3 * 1024 * 1024})
+    infohash = manager.add(magnet(info), f"{root}/downloads")
+    connect(manager.handle(infohash), seeder)
+    assert manager.wait_until_finished(infohash, timeout=10)
+    manager.close()
+    assert store.infohashes() == [infohash]
+
+    # No peers to fetch metadata from: everything comes from the resume data and the files on disk
+    restored = SessionManager(settings=LOCAL_SETTINGS, resume_store=store)
+    try:
+        assert [status["infohash"] for status in restored.torrents()] == [infohash]
+        assert restored.status(infohash)["has_metadata"]
+        assert restored.status(infohash)["save_path"] == f"{root}/downloads"
+        assert wait_for(lambda: restored.status(infohash)["state"] == "seeding", timeout=5)
+
+        restored.remove(infohash)
+        assert store.infohashes() == []
+    finally:
+        restored.close()
+
+@pytest.mark.integration
+@pytest.mark.download
+def test_prefetch_caches_metadata(swarm):
+    """Test that prefetch fetches several torrents' metadata at once and later adds start with it"""
+    root, seed = swarm
+    store = MetadataStore(f"{root}/metadata")
+    # A single download slot: prefetching must not be held up by the queue
+    manager = SessionManager(settings=LOCAL_SETTINGS, active_downloads=1, metadata_store=store)
+    sources = [seed({f"cut{i}/cut{i}.mkv": 1024 * 1024}, seed=i) for i in range(3)]
+    links = [f"{magnet(info)}&x.pe=127.0.0.1:{seeder.listen_port()}" for info, seeder in sources]
+    try:
+        infos = manager.prefetch(links, timeout=10)
+        assert [info.name() for info in infos.values()] == ["cut0", "cut1", "cut2"]
+        assert manager.torrents() == []
+        assert not os.path.exists(f"{root}/downloads/cut0")
+    finally:
+        manager.close()
+
+    # No peers this time: the metadata comes from the cache
+    cached = SessionManager(settings=LOCAL_SETTINGS, metadata_store=store)
+    try:
+        infohash = cached.add(magnet(sources[1][0]), f"{root}/downloads")
+        assert cached.wait_for_metadata(infohash, timeout=1)
+        assert cached.handle(infohash).torrent_file().total_size() == 1024 * 1024
+    finally:
+        cached.close()
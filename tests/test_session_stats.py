@@ -0,0 +1,83 @@
+import json
+import shutil
+import tempfile
+import urllib.error
+import urllib.request
+
+import pytest
+
+from session_manager import SessionManager
+from session_stats import SessionStatsExporter, format_progress, metric_name, render_prometheus
+from tests.local_swarm import LOCAL_SETTINGS, connect, magnet, make_torrent, start_seeder, wait_for
+
+STATUS = {
+    'infohash': "ab" * 20, 'name': 'Show "Pilot"', 'state': 'downloading', 'progress': 0.25,
+    'download_rate': 2000, 'upload_rate': 0, 'num_peers': 3, 'num_seeds': 1,
+    'total_wanted': 4000, 'total_wanted_done': 1000,
+}
+
+@pytest.mark.unit
+@pytest.mark.download
+def test_render_prometheus():
+    """Test that counters, gauges and per-torrent state render as Prometheus text"""
+    snapshot = {
+        'session': {'net.recv_redundant_bytes': 512, 'disk.queued_disk_jobs': 4, 'dht.dht_nodes': 120},
+        'torrents': [STATUS, {'infohash': "cd" * 20, 'name': None, 'state': 'pending'}],
+    }
+    text = render_prometheus(snapshot)
+
+    assert metric_name('net.recv_redundant_bytes') == 'libtorrent_net_recv_redundant_bytes_total'
+    assert "# TYPE libtorrent_net_recv_redundant_bytes_total counter\nlibtorrent_net_recv_redundant_bytes_total 512\n" in text
+    assert "# TYPE libtorrent_disk_queued_disk_jobs gauge\nlibtorrent_disk_queued_disk_jobs 4\n" in text
+    assert "libtorrent_dht_dht_nodes 120\n" in text
+    labels = f'infohash="{"ab" * 20}",name="Show \\"Pilot\\"",state="downloading"'
+    assert f"seer2seed_torrent_progress{{{labels}}} 0.25\n" in text
+    assert "seer2seed_torrents 2\n" in text
+    assert "cd" * 20 not in text
+
+@pytest.mark.unit
+@pytest.mark.download
+def test_format_progress():
+    """Test the one-line progress shown while downloading"""
+    assert format_progress(STATUS) == "Status: downloading | Progress: 25.00% | Download speed: 2.00 KB/s | Peers: 3"
+
+@pytest.fixture
+def swarm():
+    root = tempfile.mkdtemp()
+    try:
+        yield root
+    finally:
+        shutil.rmtree(root)
+
+@pytest.mark.integration
+@pytest.mark.download
+def test_exporter_serves_session_and_torrent_metrics(swarm):
+    """Test that snapshots reach the metrics endpoint and the JSON-lines file"""
+    info = make_torrent(f"{swarm}/seed", {"clip/clip.mkv": 2 * 1024 * 1024})
+    seeder, _ = start_seeder(info, f"{swarm}/seed")
+    manager = SessionManager(settings=LOCAL_SETTINGS, update_interval=0.1)
+    exporter = SessionStatsExporter(manager, interval=0.2, jsonl_path=f"{swarm}/stats.jsonl", port=0)
+    try:
+        infohash = manager.add(magnet(info), f"{swarm}/downloads")
+        connect(manager.handle(infohash), seeder)
+        assert manager.wait_until_finished(infohash, timeout=10)
+        # describe() reads the batched updates, which trail the finished event by up to update_interval
+        assert wait_for(lambda: manager.describe(infohash)["state"] == "seeding", timeout=5)
+        exporter.start()
+        snapshot = exporter.collect(timeout=5)
+        assert snapshot["session"]["net.recv_payload_bytes"] >= 2 * 1024 * 1024
+
+        with urllib.request.urlopen(exporter.url) as response:
+            text = response.read().decode()
+        assert "libtorrent_net_recv_payload_bytes_total" in text
+        assert f'seer2seed_torrent_progress{{infohash="{infohash}",name="clip",state="seeding"}} 1.0' in text
+        with pytest.raises(urllib.error.HTTPError):
+            urllib.request.urlopen(exporter.url.replace("/metrics", "/other"))
+    finally:
+        exporter.stop()
+        manager.close()
+
+    with open(f"{swarm}/stats.jsonl") as f:
+        records = [json.loads(line) for line in f]
+    assert records and records[-1]["torrents"][0]["infohash"] == infohash
+    assert "disk.queued_disk_jobs" in records[-1]["session"]
@@ -0,0 +1,58 @@
+import pytest
+import tempfile
+import shutil
+
+# No need for sys.path manipulation - conftest.py handles it
+from file_manifest import FileManifest
+from session_manager import SessionManager
+from streaming import TorrentStream, pick_main_file
+from tests.local_swarm import LOCAL_SETTINGS, connect, magnet, make_torrent, start_seeder, wait_for
+
+MB = 1024 * 1024
+
+@pytest.mark.unit
+@pytest.mark.download
+def test_pick_main_file():
+    """Test that the largest video file is chosen over larger non-video files"""
+    paths = ["Movie/sample.mkv", "Movie/Movie.2005.mkv", "Movie/extras.iso", "Movie/Movie.srt"]
+    sizes = [50 * MB, 1400 * MB, 4000 * MB, 1 * MB]
+    manifest = FileManifest(paths, sizes)
+
+    assert pick_main_file(manifest) == 1
+    assert pick_main_file(manifest, extensions=[".avi"]) is None
+
+@pytest.fixture
+def slow_swarm():
+    """A 12 MB movie seeded at 3 MB/s, so a full download takes about four seconds"""
+    root = tempfile.mkdtemp()
+    info = make_torrent(f"{root}/seed", {"Movie/Movie.mkv": 12 * MB, "Movie/Movie.nfo": 2000})
+    seeder, _ = start_seeder(info, f"{root}/seed", upload_limit=3 * MB)
+    manager = SessionManager(settings=LOCAL_SETTINGS, update_interval=0.1)
+    try:
+        infohash = manager.add(magnet(info), f"{root}/downloads", files_wanted=False)
+        connect(manager.handle(infohash), seeder)
+        assert manager.wait_for_metadata(infohash, timeout=10)
+        yield manager, infohash
+    finally:
+        manager.close()
+        shutil.rmtree(root)
+
+@pytest.mark.integration
+@pytest.mark.download
+def test_stream_is_playable_before_download_completes(slow_swarm):
+    """Test that head and tail arrive first and that a seek pulls the window forward"""
+    manager, infohash = slow_swarm
+    stream = TorrentStream(manager, infohash, ready_bytes=1 * MB, tail_bytes=512 * 1024, window_bytes=2 * MB)
+    assert stream.path.endswith("Movie.mkv")
+
+    stream.start()
+    assert stream.wait_ready(timeout=10)
+    assert stream.time_to_first_frame is not None
+    assert manager.handle(infohash).status().progress < 0.5
+
+    stream.seek(8 * MB)
+    assert wait_for(lambda: stream.have_range(8 * MB, 1 * MB), timeout=10)
+    assert not stream.have_range(2 * MB, 6 * MB)
+    assert manager.wait_until_finished(infohash, timeout=20)
+    assert manager.handle(infohash).file_priorities()[1] == 0
+    stream.close()
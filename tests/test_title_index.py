@@ -0,0 +1,93 @@
+import gzip
+import pytest
+
+# No need for sys.path manipulation - conftest.py handles it
+from title_index import TitleIndex, build_index, normalize_title, read_imdb_titles
+
+BASICS = """tconst\ttitleType\tprimaryTitle\toriginalTitle\tisAdult\tstartYear\tendYear\truntimeMinutes\tgenres
+tt0372784\tmovie\tBatman Begins\tBatman Begins\t0\t2005\t\\N\t140\tAction
+tt1375666\tmovie\tInception\tInception\t0\t2010\t\\N\t148\tAction
+tt0087182\tmovie\tDune\tDune\t0\t1984\t\\N\t137\tAction
+tt1160419\tmovie\tDune: Part One\tDune\t0\t2021\t\\N\t155\tAction
+tt0211915\tmovie\tAmélie\tLe fabuleux destin d'Amélie Poulain\t0\t2001\t\\N\t122\tComedy
+tt8579674\tmovie\t1917\t1917\t0\t2019\t\\N\t119\tDrama
+tt0910970\tmovie\tWALL·E\tWALL·E\t0\t2008\t\\N\t98\tAnimation
+tt0000001\tshort\tInception\tInception\t0\t1999\t\\N\t5\tShort
+tt9999999\tmovie\tInceptio\tInceptio\t0\t2015\t\\N\t90\tDrama
+"""
+RATINGS = """tconst\taverageRating\tnumVotes
+tt0372784\t8.2\t1600000
+tt1375666\t8.8\t2600000
+tt0087182\t6.3\t300000
+tt1160419\t8.0\t950000
+tt0211915\t8.3\t800000
+tt8579674\t8.2\t700000
+tt0910970\t8.4\t1200000
+tt9999999\t5.0\t12
+"""
+
+@pytest.fixture
+def title_index(tmp_path):
+    basics = tmp_path / "title.basics.tsv.gz"
+    with gzip.open(basics, "wt", encoding="utf-8") as file:
+        file.write(BASICS)
+    ratings = tmp_path / "title.ratings.tsv"
+    ratings.write_text(RATINGS, encoding="utf-8")
+    assert build_index(read_imdb_titles(str(basics), str(ratings)), str(tmp_path / "index")) == 8
+    return TitleIndex(str(tmp_path / "index"))
+
+@pytest.mark.unit
+@pytest.mark.seer
+def test_normalize_title_folds_accents_and_punctuation():
+    """Test that equivalent spellings share a key"""
+    assert normalize_title("Amélie") == "amelie"
+    assert normalize_title("  Batman: BEGINS!! ") == "batman begins"
+    assert normalize_title("Fast & Furious") == "fast and furious"
+
+@pytest.mark.unit
+@pytest.mark.seer
+@pytest.mark.parametrize("query,expected", [
+    ("Batman Begins", ("Batman Begins", 2005)),
+    ("batman begins (2005)", ("Batman Begins", 2005)),
+    ("inception", ("Inception", 2010)),
+    ("Le Fabuleux Destin d'Amelie Poulain", ("Amélie", 2001)),
+    ("1917", ("1917", 2019)),
+    ("Dune 1984", ("Dune", 1984)),
+    ("Dune 2021", ("Dune: Part One", 2021)),
+    ("Batmn Begins", ("Batman Begins", 2005)),
+    ("wall e", ("WALL·E", 2008)),
+])
+def test_lookup_resolves_confidently(title_index, query, expected):
+    """Test exact, aliased, year-qualified and misspelled lookups"""
+    match = title_index.lookup(query)
+    assert match is not None and match.confident
+    assert (match.title, match.year) == expected
+
+@pytest.mark.unit
+@pytest.mark.seer
+@pytest.mark.parametrize("query", [
+    "Dune",  # remake with comparable popularity: ambiguous without a year
+    "Inceptio",  # exact title, but too obscure to trust over the famous near-miss
+    "the pixar movie about a robot cleaning up earth",
+])
+def test_lookup_defers_to_llm_when_unsure(title_index, query):
+    """Test that ambiguous and descriptive queries are not marked confident"""
+    match = title_index.lookup(query)
+    assert match is None or not match.confident
+
+@pytest.mark.unit
+@pytest.mark.seer
+def test_seer_skips_llm_on_confident_index_match(title_index, tmp_path):
+    """Test that get_movie_info answers from the index without calling the LLM"""
+    from unittest.mock import MagicMock
+    import seer
+
+    seer.configure_resolution_cache(None)
+    seer._title_index = title_index
+    try:
+        client = MagicMock()
+        assert seer.get_movie_info("Batman Begins (2005)", client, "test-model") == {
+            "title": "Batman Begins", "year": 2005}
+        client.chat.completions.create.assert_not_called()
+    finally:
+        seer.configure_title_index(None)
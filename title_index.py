@@ -0,0 +1,329 @@
+import os
+import re
+import csv
+import gzip
+import json
+import math
+import logging
+import argparse
+import unicodedata
+from array import array
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+INDEX_FORMAT_VERSION = 1
+DEFAULT_TITLE_TYPES = ('movie', 'tvMovie')
+
+# Trigram alphabet: space, a-z, 0-9 -> 37 symbols, 37**3 possible trigrams
+_ALPHABET = {char: i for i, char in enumerate(' abcdefghijklmnopqrstuvwxyz0123456789')}
+NUM_TRIGRAMS = len(_ALPHABET) ** 3
+
+TRAILING_YEAR_PATTERN = re.compile(r'^(.*?)[\s(\[,-]*((?:18|19|20)\d{2})[)\]]?\s*$')
+
+class TitleMatch(NamedTuple):
+    """A catalog entry matched to a query."""
+    title: str
+    year: int
+    votes: int
+    score: float
+    confident: bool
+
+def normalize_title(text: str) -> str:
+    """Fold accents, case and punctuation: "Amélie (Le Fabuleux...)" -> "amelie le fabuleux"."""
+    text = unicodedata.normalize('NFKD', text)
+    text = ''.join(char for char in text if not unicodedata.combining(char)).lower()
+    return ' '.join(re.findall(r'[a-z0-9]+', text.replace('&', ' and ')))
+
+def title_trigrams(key: str) -> List[int]:
+    """Return the distinct trigram IDs of a normalized title, padded with spaces."""
+    padded = f" {key} "
+    codes = [_ALPHABET[char] for char in padded]
+    return sorted({(codes[i] * 37 + codes[i + 1]) * 37 + codes[i + 2] for i in range(len(codes) - 2)})
+
+def _open_tsv(path: str) -> Iterator[Dict[str, str]]:
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8', newline='') as file:
+        yield from csv.DictReader(file, delimiter='\t', quoting=csv.QUOTE_NONE)
+
+def read_imdb_titles(basics_path: str, ratings_path: Optional[str] = None,
+                     title_types: Iterable[str] = DEFAULT_TITLE_TYPES) -> Iterator[Tuple[str, List[str], int, int]]:
+    """
+    Read movies from IMDb's title.basics TSV (and optionally title.ratings for vote counts).
+
+    Yields:
+        (display title, [alternative titles], year, votes) tuples
+    """
+    votes: Dict[str, int] = {}
+    if ratings_path:
+        for row in _open_tsv(ratings_path):
+            votes[row['tconst']] = int(row['numVotes'])
+
+    title_types = set(title_types)
+    for row in _open_tsv(basics_path):
+        if row['titleType'] not in title_types or row['startYear'] == '\\N':
+            continue
+        if row.get('isAdult') == '1':
+            continue
+        aliases = [row['originalTitle']] if row['originalTitle'] != row['primaryTitle'] else []
+        yield row['primaryTitle'], aliases, int(row['startYear']), votes.get(row['tconst'], 0)
+
+def build_index(entries: Iterable[Tuple[str, List[str], int, int]], out_dir: str) -> int:
+    """
+    Build a title index directory from (title, aliases, year, votes) entries.
+
+    Layout (all arrays are .npy files opened memory-mapped):
+      titles.bin / title_offsets   UTF-8 display titles, one per movie
+      years, votes                 per-movie attributes
+      keys.bin / key_offsets       normalized lookup keys (titles and aliases), sorted
+      key_movie                    movie each key belongs to
+      trigram_offsets / postings   CSR map from trigram ID to key IDs
+
+    Returns:
+        Number of movies indexed
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    titles = bytearray()
+    title_offsets = array('Q', [0])
+    years = array('h')
+    votes = array('I')
+    keys: List[Tuple[str, int]] = []
+
+    for title, aliases, year, vote_count in entries:
+        movie_id = len(years)
+        titles += title.encode('utf-8')
+        title_offsets.append(len(titles))
+        years.append(year)
+        votes.append(min(vote_count, 2**32 - 1))
+        for name in {normalize_title(name) for name in [title, *aliases]}:
+            if name:
+                keys.append((name, movie_id))
+
+    keys.sort()
+    key_blob = bytearray()
+    key_offsets = array('Q', [0])
+    key_movie = array('I')
+    trigram_ids = array('I')
+    trigram_keys = array('I')
+    for key_id, (name, movie_id) in enumerate(keys):
+        key_blob += name.encode('ascii')
+        key_offsets.append(len(key_blob))
+        key_movie.append(movie_id)
+        grams = title_trigrams(name)
+        trigram_ids.extend(grams)
+        trigram_keys.extend([key_id] * len(grams))
+
+    trigram_ids_np = np.frombuffer(trigram_ids, dtype=np.uint32)
+    order = np.argsort(trigram_ids_np, kind='stable')
+    postings = np.frombuffer(trigram_keys, dtype=np.uint32)[order]
+    trigram_offsets = np.zeros(NUM_TRIGRAMS + 1, dtype=np.uint64)
+    np.cumsum(np.bincount(trigram_ids_np, minlength=NUM_TRIGRAMS), out=trigram_offsets[1:])
+
+    with open(os.path.join(out_dir, 'titles.bin'), 'wb') as file:
+        file.write(titles)
+    with open(os.path.join(out_dir, 'keys.bin'), 'wb') as file:
+        file.write(key_blob)
+    arrays = {
+        'title_offsets': np.frombuffer(title_offsets, dtype=np.uint64),
+        'years': np.frombuffer(years, dtype=np.int16),
+        'votes': np.frombuffer(votes, dtype=np.uint32),
+        'key_offsets': np.frombuffer(key_offsets, dtype=np.uint64),
+        'key_movie': np.frombuffer(key_movie, dtype=np.uint32),
+        'trigram_offsets': trigram_offsets,
+        'postings': postings,
+    }
+    for name, values in arrays.items():
+        np.save(os.path.join(out_dir, f'{name}.npy'), values)
+    with open(os.path.join(out_dir, 'meta.json'), 'w') as file:
+        json.dump({'version': INDEX_FORMAT_VERSION, 'movies': len(years), 'keys': len(keys)}, file)
+
+    logger.info(f"Indexed {len(years)} movies under {len(keys)} keys in {out_dir}")
+    return len(years)
+
+def _map_bytes(path: str) -> np.ndarray:
+    # np.memmap refuses empty files
+    if os.path.getsize(path) == 0:
+        return np.zeros(0, dtype=np.uint8)
+    return np.memmap(path, dtype=np.uint8, mode='r')
+
+class TitleIndex:
+    """
+    Memory-mapped movie title index with exact and trigram-fuzzy lookup.
+
+    Exact matches on the normalized title are found by binary search over
+    the sorted keys; otherwise candidates sharing the query's rarest
+    trigrams are scored by trigram (Jaccard) similarity. Ambiguous titles
+    are settled by the year in the query, if any, and then by IMDb vote
+    count. Only matches that are clearly better than the alternatives are
+    marked confident.
+    """
+
+    def __init__(self, index_dir: str, min_votes: int = 1000, min_similarity: float = 0.6,
+                 dominance: float = 5.0, max_postings: int = 50_000, shortlist: int = 32):
+        """
+        Args:
+            index_dir: Directory written by build_index
+            min_votes: Votes a match needs to be confident (filters obscure homonyms)
+            min_similarity: Trigram similarity a fuzzy match needs to be confident
+            dominance: How many times more votes the best exact match needs over the runner-up
+            max_postings: Cap on trigram postings scanned for a fuzzy lookup
+            shortlist: Candidates rescored on their full trigram sets
+        """
+        with open(os.path.join(index_dir, 'meta.json'), 'r') as file:
+            meta = json.load(file)
+        if meta.get('version') != INDEX_FORMAT_VERSION:
+            raise ValueError(f"Unsupported title index version {meta.get('version')} in {index_dir}")
+
+        self.min_votes = min_votes
+        self.min_similarity = min_similarity
+        self.dominance = dominance
+        self.max_postings = max_postings
+        self.shortlist = shortlist
+        self.num_movies = meta['movies']
+
+        def load(name: str) -> np.ndarray:
+            return np.load(os.path.join(index_dir, f'{name}.npy'), mmap_mode='r')
+
+        self._titles = _map_bytes(os.path.join(index_dir, 'titles.bin'))
+        self._keys = _map_bytes(os.path.join(index_dir, 'keys.bin'))
+        self._title_offsets = load('title_offsets')
+        self._years = load('years')
+        self._votes = load('votes')
+        self._key_offsets = load('key_offsets')
+        self._key_movie = load('key_movie')
+        self._trigram_offsets = load('trigram_offsets')
+        self._postings = load('postings')
+        self._num_keys = len(self._key_movie)
+
+    def __len__(self) -> int:
+        return self.num_movies
+
+    def lookup(self, query: str) -> Optional[TitleMatch]:
+        """
+        Resolve a query to the best catalog entry.
+
+        Returns:
+            The best match (check .confident before trusting it), or None if nothing is similar
+        """
+        key = normalize_title(query)
+        if not key:
+            return None
+
+        # Titles ending in a number ("1917", "Blade Runner 2049") are tried verbatim first
+        movies = self._exact(key)
+        if movies:
+            return self._pick_exact(movies, None)
+
+        match = TRAILING_YEAR_PATTERN.match(query.strip())
+        title_part = normalize_title(match.group(1)) if match else ''
+        if not title_part:
+            return self._fuzzy(key, None)
+        year = int(match.group(2))
+        movies = self._exact(title_part)
+        if movies:
+            return self._pick_exact(movies, year)
+        return self._fuzzy(title_part, year)
+
+    def _key(self, key_id: int) -> str:
+        return bytes(self._keys[int(self._key_offsets[key_id]):int(self._key_offsets[key_id + 1])]).decode('ascii')
+
+    def _title(self, movie_id: int) -> str:
+        start, end = int(self._title_offsets[movie_id]), int(self._title_offsets[movie_id + 1])
+        return bytes(self._titles[start:end]).decode('utf-8')
+
+    def _exact(self, key: str) -> List[int]:
+        low, high = 0, self._num_keys
+        while low < high:
+            mid = (low + high) // 2
+            if self._key(mid) < key:
+                low = mid + 1
+            else:
+                high = mid
+        movies = []
+        while low < self._num_keys and self._key(low) == key:
+            movies.append(int(self._key_movie[low]))
+            low += 1
+        return sorted(set(movies))
+
+    def _pick_exact(self, movies: List[int], year: Optional[int]) -> TitleMatch:
+        if year is not None:
+            near = [m for m in movies if abs(int(self._years[m]) - year) <= 1]
+            if near:
+                best = max(near, key=lambda m: (int(self._years[m]) == year, int(self._votes[m])))
+                return self._match(best, 1.0, True)
+
+        ranked = sorted(movies, key=lambda m: int(self._votes[m]), reverse=True)
+        best_votes = int(self._votes[ranked[0]])
+        runner_up = int(self._votes[ranked[1]]) if len(ranked) > 1 else 0
+        confident = best_votes >= self.min_votes and best_votes >= self.dominance * runner_up
+        return self._match(ranked[0], 1.0, confident)
+
+    def _fuzzy(self, key: str, year: Optional[int]) -> Optional[TitleMatch]:
+        grams = title_trigrams(key)
+        spans = sorted(((int(self._trigram_offsets[g]), int(self._trigram_offsets[g + 1])) for g in grams),
+                       key=lambda span: span[1] - span[0])
+        # Gather candidates from the rarest trigrams, stopping before common ones blow the budget
+        chunks = []
+        scanned = 0
+        for start, end in spans:
+            if start == end:
+                continue
+            if scanned and scanned + (end - start) > self.max_postings:
+                break
+            chunks.append(self._postings[start:end])
+            scanned += end - start
+        if not chunks:
+            return None
+
+        candidates, hits = np.unique(np.concatenate(chunks), return_counts=True)
+        shortlist = candidates[np.argsort(-hits, kind='stable')[:self.shortlist]]
+
+        # Rescore the shortlist on all trigrams, not just the scanned ones
+        query_grams = set(grams)
+        scored = []
+        for key_id in shortlist:
+            key_grams = set(title_trigrams(self._key(int(key_id))))
+            similarity = len(query_grams & key_grams) / len(query_grams | key_grams)
+            movie = int(self._key_movie[key_id])
+            score = similarity + 0.1 * math.log10(int(self._votes[movie]) + 1) / 7
+            if year is not None and abs(int(self._years[movie]) - year) <= 1:
+                score += 0.1
+            scored.append((score, similarity, movie))
+        scored.sort(reverse=True)
+
+        best_score, best_similarity, movie = scored[0]
+        runner_up = next((score for score, _, other in scored[1:] if other != movie), None)
+        margin = best_score - runner_up if runner_up is not None else 1.0
+        confident = (best_similarity >= self.min_similarity and margin >= 0.05
+                     and int(self._votes[movie]) >= self.min_votes)
+        return self._match(movie, best_similarity, confident)
+
+    def _match(self, movie_id: int, score: float, confident: bool) -> TitleMatch:
+        return TitleMatch(self._title(movie_id), int(self._years[movie_id]), int(self._votes[movie_id]),
+                          score, confident)
+
+def main():
+    """Build or query a title index from the command line."""
+    parser = argparse.ArgumentParser(description='Build or query the offline movie title index.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build = subparsers.add_parser('build', help='Build an index from IMDb title.basics.tsv(.gz)')
+    build.add_argument('basics', help='Path to title.basics.tsv or title.basics.tsv.gz')
+    build.add_argument('out_dir', help='Directory to write the index to')
+    build.add_argument('--ratings', help='Path to title.ratings.tsv(.gz), for popularity weighting')
+    query = subparsers.add_parser('query', help='Look up titles in an index')
+    query.add_argument('index_dir', help='Directory written by build')
+    query.add_argument('titles', nargs='+', help='Titles to look up')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    if args.command == 'build':
+        build_index(read_imdb_titles(args.basics, args.ratings), args.out_dir)
+    else:
+        index = TitleIndex(args.index_dir)
+        for title in args.titles:
+            print(f"{title!r}: {index.lookup(title)}")
+
+if __name__ == "__main__":
+    main()